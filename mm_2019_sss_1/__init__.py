@@ -5,6 +5,11 @@ MolSSI Sumemr School Final Project.
 
 # Add imports here
 from .mc import MC
+from .ensemble import MCEnsemble
+from .replica_exchange import ReplicaExchange
+from .parallel import CheckerboardMC
+from .trajectory import TrajectoryReader, TrajectoryWriter
+from .formats import DCDReader, DCDWriter, PDBReader, PDBWriter, XYZReader, XYZWriter
 
 # Handle versioneer
 from ._version import get_versions
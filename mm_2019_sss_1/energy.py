@@ -1,4 +1,13 @@
+import warnings
 import numpy as np
+from . import kernels
+from .geom import _append
+from .neighbor import ShellList, VerletList
+from .potentials import get_potential
+
+# largest number of float64 arrays, each one value per pair, alive at once while a potential evaluates the energies
+# and virials of the pairs within the cutoff
+POTENTIAL_TEMPORARIES = 4
 
 
 class Energy:
@@ -13,19 +22,91 @@ class Energy:
             Cutoff distance for the potential.
         cutoff2 : integer or float
             Square of the cutoff distance.
+        potential : PairPotential
+            Pair potential of the system. See 'potentials.POTENTIALS' for the registered ones.
+        neighbor_method : string, either 'all', 'cell' or 'verlet'
+            How the partners of a particle are found. 'all' scans every particle, 'cell' only scans the 27 cells
+            of the cell list owned by Geom surrounding the particle, 'verlet' scans the Verlet list of the particle.
+        skin : integer or float
+            Skin distance of the Verlet lists.
+        volume_skin : integer or float
+            Half width of the shell of pairs around the cutoff tracked for volume moves.
+        block_memory : integer
+            Memory ceiling in bytes for the temporaries of the blocked pairwise kernel.
+        backend : string, either 'numpy' or 'numba'
+            Implementation of the energy kernels.
+        particle_energies : numpy array (N) or None
+            Interaction energy of every particle with the rest of the system, maintained across accepted moves once
+            initialize_particle_energies has been called.
+        particle_virials : numpy array (N) or None
+            Sum of the pair virials -r du/dr of every particle with the rest of the system, maintained alongside
+            particle_energies.
+        n_pairs_visited : integer
+            Number of candidate partners visited by the energy evaluations bounded by a largest accepted energy,
+            which stop as soon as the bound is exceeded.
     
     Methods
     -------
-        lennard_jones_potential: 
-            Calculate Lennard-Jones Potential of particles.
+        pair_energy :
+            Calculate the pair energies of the selected potential from the squares of the pair distances.
+        lennard_jones_potential :
+            Alias of pair_energy.
         get_particle_energy : 
             Calculate the energy of a particle with the remaining particles in the system.
+        get_delta_energy :
+            Calculate the energy change of moving a particle from its old position to a proposed one.
+        get_delta_energy_collective :
+            Calculate the energy change of moving a set of particles at once.
         calculate_total_pair_energy :
-            Calculate total pair energy between particles i and j, iterated through all particle pairs in the system.
+            Calculate total pair energy between particles i and j, over all the particle pairs in the system.
+        calculate_position_energies :
+            Calculate the interaction energies of test particles at many positions with every particle.
+        calculate_total_virial :
+            Calculate the total pair virial over all the particle pairs in the system.
         calculate_tail_correction :
-            Calculate tail correction for Lennard-Jones potential.
+            Calculate tail correction for the pair potential.
+        calculate_pressure_tail_correction :
+            Calculate the tail correction of the pressure for the pair potential.
+        initialize_particle_energies :
+            Calculate the interaction energy and virial of every particle and start maintaining them across accepted
+            moves.
+        get_total_pair_energy :
+            Get the total pair energy from the per-particle energies.
+        get_total_virial :
+            Get the total pair virial from the per-particle virials.
+        update_particle :
+            Move a particle after an accepted move, keeping the neighbor structures up to date.
+        update_particles :
+            Move a set of particles after an accepted collective move.
+        build_shell_list :
+            Build the shell list of the pairs near the cutoff used by volume moves.
+        get_volume_delta_energy :
+            Calculate the energy and virial changes of scaling the box and all the coordinates to a new box length.
+        scale_volume :
+            Scale the box and all the coordinates after an accepted volume move.
+        get_insertion_energy :
+            Calculate the energy and virial changes of inserting a particle at a position.
+        get_insertion_energies :
+            Calculate the interaction energies of test particles at many positions with the system, in one pass.
+        get_deletion_energy :
+            Get the energy and virial changes of removing a particle.
+        insert_particle :
+            Insert a particle after an accepted insertion move.
+        remove_particle :
+            Remove a particle after an accepted deletion move.
+        get_n_rebuilds :
+            Get the number of times the Verlet lists have been built.
     """
-    def __init__(self, Geom, cutoff):
+    def __init__(self,
+                 Geom,
+                 cutoff,
+                 neighbor_method='all',
+                 skin=0.5,
+                 volume_skin=0.3,
+                 block_memory=2**20,
+                 backend='numpy',
+                 potential='lj',
+                 potential_params=None):
         """
         The constructor for Geom class.
 
@@ -34,32 +115,155 @@ class Energy:
             Geom : class
                 Class for operations regarding simulation geometry and configuration. See 'class Geom help' for details.
             cutoff : integer or float
-                Cutoff distance for the potential.
+                Cutoff distance for the potential. Ignored by potentials with a fixed cutoff such as 'wca'.
+            neighbor_method : string, either 'all', 'cell' or 'verlet', default to 'all'
+                How the partners of a particle are found. With 'cell', a cell list sized from the cutoff is built
+                on Geom.
+                With 'verlet', every particle keeps a list of the partners within cutoff + skin.
+            skin : integer or float, default to 0.5
+                Skin distance of the Verlet lists. Only used with neighbor_method='verlet'.
+            volume_skin : integer or float, default to 0.3
+                Half width of the shell of pairs around the cutoff tracked to find the pairs crossing the cutoff in
+                volume moves. Only used by get_volume_delta_energy.
+            block_memory : integer, default to 2**20 (1 MiB)
+                Memory ceiling in bytes for the temporaries of the blocked pairwise kernel used for total energies.
+            backend : string, either 'numpy' or 'numba', default to 'numpy'
+                Implementation of the energy kernels. 'numba' uses compiled loops fusing the distance and potential
+                calculations, and falls back to 'numpy' with a warning if Numba is not installed.
+            potential : string or PairPotential, default to 'lj'
+                Pair potential, either a name registered in potentials.POTENTIALS ('lj', 'lj_shifted',
+                'lj_shifted_force', 'wca', 'mie' or 'yukawa') or a PairPotential instance.
+            potential_params : dict, optional
+                Parameters of the registered potential, for example {'epsilon': 1.0, 'sigma': 1.0}.
         """
 
         self.Geom = Geom
-        self.cutoff = cutoff
+        self.potential = get_potential(potential, cutoff, **(potential_params or {}))
+        self.cutoff = self.potential.cutoff
         self.cutoff2 = self.cutoff**2
+        self.neighbor_method = neighbor_method
+        self.skin = skin
+        self.volume_skin = volume_skin
+        self.block_memory = block_memory
+        self._verlet = None
+        self._shell = None
+        self._volume_trial = None
+        self._insertion_trial = None
+        self._energy_storage = None
+        self._virial_storage = None
+        self.particle_energies = None
+        self.particle_virials = None
+        self._trial = None
+        self.n_pairs_visited = 0
+        self._near2, self._far_bound = self.potential.energy_minimum()
+        # pairs beyond the cutoff contribute nothing, so no candidate lowers the energy by more than this
+        self._far_bound = min(self._far_bound, 0.0)
+
+        if backend == 'numba' and not kernels.numba_available:
+            warnings.warn("Numba is not installed, falling back to the 'numpy' backend.")
+            backend = 'numpy'
+        elif backend not in ('numpy', 'numba'):
+            raise ValueError("backend must be either 'numpy' or 'numba'")
+        self.backend = backend
+        if backend == 'numba':
+            self._kernel = self.potential.numba_kernel()
+
+        if neighbor_method == 'cell':
+            self.Geom.build_cell_list(self.cutoff)
+        elif neighbor_method == 'verlet':
+            self._verlet = VerletList(self.Geom, self.cutoff, self.skin)
+        elif neighbor_method != 'all':
+            raise ValueError("neighbor_method must be either 'all', 'cell' or 'verlet'")
+
+    def pair_energy(self, rij2):
+        """
+        Calculate the pair energies of the selected potential from the squares of the pair distances.
+
+        Parameters
+        ----------
+        rij2 : float or numpy array
+            The square of the distance between particles i and j.
+
+        Returns
+        -------
+        energy : float or numpy array
+            Pair energy of every distance.
+        """
+
+        return self.potential.energy(rij2)
 
     def lennard_jones_potential(self, rij2):
         """
-        Calculate Lennard-Jones Potential of particles.
+        Alias of pair_energy, which evaluates the selected potential whether it is Lennard-Jones or not.
 
         Parameters
         ----------
-        rij2 : float or integer
+        rij2 : float or numpy array
             The square of the distance between particles i and j.
 
         Returns
         -------
-        LJ: float
-            Value of LJ potential.
+        LJ: float or numpy array
+            Pair energy of every distance.
+        """
+
+        return self.pair_energy(rij2)
+
+    def _get_partners(self, i_particle, r_i):
+        """
+        Get the indices of the particles that may interact with particle i placed at r_i.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle, or -1 for a particle not in the system yet, which has no Verlet list.
+        r_i : numpy array (3)
+            Current or trial position of the particle.
+
+        Returns
+        -------
+        partners : numpy array or None
+            Indices of the candidate partners, never including i_particle, or None if every other particle has to
+            be scanned.
+        """
+
+        if self.neighbor_method == 'cell':
+            partners = self.Geom.cell_list.get_neighbors(r_i)
+            return partners[partners != i_particle]
+        elif self.neighbor_method == 'verlet' and i_particle >= 0:
+            return self._verlet.get_neighbors(i_particle, r_i)
+        return None
+
+    def _call_kernel(self, kernel, i_particle, r_i, partners, coordinates, bounds=()):
+        """
+        Call a compiled single-particle kernel of the 'numba' backend.
+
+        Parameters
+        ----------
+        kernel : function
+            Either kernels.particle_energy, kernels.pair_terms or kernels.bounded_pair_terms.
+        i_particle : integer
+            Index of the particle.
+        r_i : numpy array (3)
+            Current or trial position of the particle.
+        partners : numpy array or None
+            Indices of the candidate partners, or None to scan every other particle.
+        coordinates : numpy array (N x 3)
+            Coordinates of all the particles.
+        bounds : tuple, default to ()
+            Extra arguments of kernels.bounded_pair_terms, passed before the potential.
+
+        Returns
+        -------
+        result : float or tuple
+            Output of the kernel.
         """
 
-        sig_by_r6 = np.power(1 / rij2, 3)
-        sig_by_r12 = np.power(sig_by_r6, 2)
-        LJ = 4.0 * (sig_by_r12 - sig_by_r6)
-        return LJ
+        scan_all = partners is None
+        if scan_all:
+            partners = np.empty(0, dtype=np.intp)
+        return kernel(np.asarray(r_i, dtype=coordinates.dtype), coordinates, i_particle, partners, scan_all,
+                      float(self.Geom.box_length), float(self.cutoff2), *bounds, self._kernel)
 
     def get_particle_energy(self, i_particle, coordinates):
         """
@@ -72,6 +276,10 @@ class Energy:
         i_particle : integer, atom whose energy with the rest of the system is calculated
               Atom index (0-based) in the numpy array.
 
+        With neighbor_method 'cell' or 'verlet' the partners are looked up in the neighbor structures of the
+        system, so coordinates must be Geom.coordinates. Only particle i_particle may have moved since they were
+        last updated with update_particle.
+
         Returns
         -------
         e_total : float
@@ -79,38 +287,453 @@ class Energy:
         """
 
         r_i = coordinates[i_particle]
-        rij2 = self.Geom.minimum_image_distance(r_i, coordinates)
-        red = np.delete(rij2, i_particle)
-        pot = self.lennard_jones_potential(red[red < self.cutoff2])
-        e_total = pot.sum()
+        partners = self._get_partners(i_particle, r_i)
+        if self.backend == 'numba':
+            return self._call_kernel(kernels.particle_energy, i_particle, r_i, partners, coordinates)
+
+        if partners is None:
+            rij2 = self.Geom.minimum_image_distance(r_i, coordinates)
+            red = np.delete(rij2, i_particle)
+        else:
+            red = self.Geom.minimum_image_distance(r_i, coordinates[partners])
+        pot = self.potential.energy(red[red < self.cutoff2])
+        e_total = pot.sum(dtype=np.float64)
         return e_total
 
-    def calculate_total_pair_energy(self):
+    def _get_pair_terms(self, i_particle, r_i, max_energy=None):
         """
-        Calculate total pair energy between particles i and j, iterated through all particle pairs in the system.
+        Calculate the interaction energies and virials of particle i placed at r_i with each of its partners within
+        the cutoff.
+
+        If max_energy is given, the candidate partners are visited nearest first where the neighbor structures
+        allow it, and the evaluation stops as soon as the energy of the pairs visited so far, plus the lowest
+        possible energy of every candidate left, is above max_energy. With a cell list the candidates are visited
+        one shell of cells at a time, starting with the cell of r_i, and the compiled kernel of the 'numba'
+        backend checks the bound after every candidate. Without a cell list the NumPy backend computes every
+        distance at once and only evaluates the pairs on the repulsive side of the potential minimum first.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle, or -1 for a particle not in the system yet.
+        r_i : numpy array (3)
+            Current or trial position of the particle.
+        max_energy : float, optional
+            Largest energy of the particle worth evaluating in full.
+
+        Returns
+        -------
+        terms : tuple or None
+            None if the energy of the particle is known to exceed max_energy, otherwise (partners, pair_energies,
+            pair_virials): the indices of the particles within the cutoff of r_i, and the interaction energy and
+            pair virial of particle i with each of them.
+        """
+
+        bounded = max_energy is not None and np.isfinite(self._far_bound)
+        if bounded and self.neighbor_method == 'cell' and self.backend == 'numpy':
+            return self._get_bounded_pair_terms_by_cell(i_particle, r_i, max_energy)
+        partners = self._get_partners(i_particle, r_i)
+        if self.backend == 'numba':
+            if bounded:
+                bounds = (float(self._far_bound), float(max_energy))
+                *terms, rejected, n_visited = self._call_kernel(kernels.bounded_pair_terms, i_particle, r_i,
+                                                                partners, self.Geom.coordinates, bounds)
+                self.n_pairs_visited += n_visited
+                return None if rejected else tuple(terms)
+            return self._call_kernel(kernels.pair_terms, i_particle, r_i, partners, self.Geom.coordinates)
+
+        if partners is None:
+            rij2 = self.Geom.minimum_image_distance(r_i, self.Geom.coordinates)
+            if i_particle >= 0:
+                rij2[i_particle] = np.inf
+            if bounded:
+                self.n_pairs_visited += len(rij2) - (i_particle >= 0)
+            partners = np.flatnonzero(rij2 < self.cutoff2)
+            rij2 = rij2[partners]
+        else:
+            rij2 = self.Geom.minimum_image_distance(r_i, self.Geom.coordinates[partners])
+            if bounded:
+                self.n_pairs_visited += len(rij2)
+            in_range = rij2 < self.cutoff2
+            partners = partners[in_range]
+            rij2 = rij2[in_range]
+        if bounded:
+            near = rij2 < self._near2
+            e_near = self.potential.energy(rij2[near]).sum(dtype=np.float64)
+            if e_near + (len(rij2) - np.count_nonzero(near)) * self._far_bound > max_energy:
+                return None
+        pair_energies, pair_virials = self.potential.energy_and_virial(rij2)
+        return partners, pair_energies, pair_virials
+
+    def _get_bounded_pair_terms_by_cell(self, i_particle, r_i, max_energy):
+        """
+        Calculate the pair terms of particle i placed at r_i from the cell list, the cell of r_i first and then the
+        cells around it, stopping as soon as the energy is bound to exceed max_energy.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle, or -1 for a particle not in the system yet.
+        r_i : numpy array (3)
+            Current or trial position of the particle.
+        max_energy : float
+            Largest energy of the particle worth evaluating in full.
+
+        Returns
+        -------
+        terms : tuple or None
+            None if the energy of the particle is known to exceed max_energy, otherwise (partners, pair_energies,
+            pair_virials) as returned by _get_pair_terms.
+        """
+
+        cell_list = self.Geom.cell_list
+        candidates = cell_list.cells[cell_list.neighbor_cells[cell_list.cell_index(r_i)]]
+        valid = (candidates >= 0) & (candidates != i_particle)
+        # the cell of r_i first, then the cells around it in a single vectorised pass
+        n_home = np.count_nonzero(valid[0])
+        candidates = candidates[valid]
+        e_seen = 0.0
+        terms = []
+        for start, end in [(0, n_home), (n_home, len(candidates))]:
+            shell = candidates[start:end]
+            rij2 = self.Geom.minimum_image_distance(r_i, self.Geom.coordinates[shell])
+            self.n_pairs_visited += len(shell)
+            in_range = rij2 < self.cutoff2
+            pair_energies, pair_virials = self.potential.energy_and_virial(rij2[in_range])
+            e_seen += pair_energies.sum(dtype=np.float64)
+            if e_seen + (len(candidates) - end) * self._far_bound > max_energy:
+                return None
+            terms.append((shell[in_range], pair_energies, pair_virials))
+        return tuple(np.concatenate(arrays) for arrays in zip(*terms))
+
+    def get_delta_energy(self, i_particle, old_coordinate, new_coordinate, virial=False, max_delta_e=None):
+        """
+        Calculate the energy change of moving a particle from its old position to a proposed one.
+
+        Both positions are compared against a single gather of the partner coordinates, and Geom.coordinates is
+        left untouched, so a rejected move needs no clean-up. Once the per-particle energies are maintained, the
+        old energy is read from them and only the proposed position is evaluated, stopping early if the energy
+        change is bound to exceed max_delta_e.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle being moved.
+        old_coordinate : numpy array (3)
+            Current position of the particle.
+        new_coordinate : numpy array (3)
+            Proposed position of the particle.
+        virial : Boolean, default to False
+            Whether to also return the change of the virial, computed in the same pass as the energy.
+        max_delta_e : float, optional
+            Largest energy change that would be accepted. Only used once the per-particle energies are maintained.
+
+        Returns
+        -------
+        delta_e : float
+            Energy of the particle at the proposed position minus its energy at the old position, or inf if the
+            evaluation stopped early because it exceeds max_delta_e.
+        delta_w : float
+            Virial of the particle at the proposed position minus its virial at the old position, only returned if
+            virial is True.
+        """
+
+        if self.particle_energies is not None:
+            max_energy = None if max_delta_e is None else self.particle_energies[i_particle] + max_delta_e
+            terms = self._get_pair_terms(i_particle, new_coordinate, max_energy)
+            if terms is None:
+                self._trial = None
+                return (np.inf, 0.0) if virial else np.inf
+            partners, pair_energies, pair_virials = terms
+            self._trial = (i_particle, new_coordinate, partners, pair_energies, pair_virials)
+            delta_e = pair_energies.sum(dtype=np.float64) - self.particle_energies[i_particle]
+            if virial:
+                return delta_e, pair_virials.sum(dtype=np.float64) - self.particle_virials[i_particle]
+            return delta_e
+
+        positions = np.array([old_coordinate, new_coordinate])
+        if self.neighbor_method == 'cell':
+            partners = self.Geom.cell_list.get_neighbors(positions)
+            partners = partners[partners != i_particle]
+        else:
+            partners = self._get_partners(i_particle, new_coordinate)
+
+        if self.backend == 'numba':
+            coordinates = self.Geom.coordinates
+            if virial:
+                _, e_old, w_old = self._call_kernel(kernels.pair_terms, i_particle, old_coordinate, partners,
+                                                    coordinates)
+                _, e_new, w_new = self._call_kernel(kernels.pair_terms, i_particle, new_coordinate, partners,
+                                                    coordinates)
+                return e_new.sum() - e_old.sum(), w_new.sum() - w_old.sum()
+            e_old = self._call_kernel(kernels.particle_energy, i_particle, old_coordinate, partners, coordinates)
+            e_new = self._call_kernel(kernels.particle_energy, i_particle, new_coordinate, partners, coordinates)
+            return e_new - e_old
+
+        if partners is None:
+            rij2 = self.Geom.minimum_image_distance(positions[:, None, :], self.Geom.coordinates)
+            rij2[:, i_particle] = np.inf
+        else:
+            rij2 = self.Geom.minimum_image_distance(positions[:, None, :], self.Geom.coordinates[partners])
+        in_range = rij2 < self.cutoff2
+        if virial:
+            e_old, w_old = self.potential.energy_and_virial(rij2[0][in_range[0]])
+            e_new, w_new = self.potential.energy_and_virial(rij2[1][in_range[1]])
+            return (e_new.sum(dtype=np.float64) - e_old.sum(dtype=np.float64),
+                    w_new.sum(dtype=np.float64) - w_old.sum(dtype=np.float64))
+        e_old = self.potential.energy(rij2[0][in_range[0]]).sum(dtype=np.float64)
+        e_new = self.potential.energy(rij2[1][in_range[1]]).sum(dtype=np.float64)
+        delta_e = e_new - e_old
+        return delta_e
+
+    def get_delta_energy_collective(self, indices, old_coordinates, new_coordinates, virial=False):
+        """
+        Calculate the energy change of moving a set of particles at once.
+
+        The pairs between the moved particles and the rest of the system are evaluated in one vectorised kernel over
+        a single gather of the partners of all the old and new positions, and the pairs within the set, which
+        would otherwise be counted twice, are evaluated separately once each. Geom.coordinates is left untouched.
+
+        Parameters
+        ----------
+        indices : numpy array (M)
+            Indices of the particles being moved, all distinct.
+        old_coordinates : numpy array (M x 3)
+            Current positions of the particles.
+        new_coordinates : numpy array (M x 3)
+            Proposed positions of the particles.
+        virial : Boolean, default to False
+            Whether to also return the change of the virial.
+
+        Returns
+        -------
+        delta_e : float
+            Energy of the system with the particles at the proposed positions minus its current energy.
+        delta_w : float
+            Change of the virial, only returned if virial is True.
+        """
+
+        indices = np.asarray(indices)
+        positions = np.stack([old_coordinates, new_coordinates])
+        if self.neighbor_method == 'cell':
+            partners = self.Geom.cell_list.get_neighbors(positions.reshape(-1, 3))
+            partners = partners[~np.isin(partners, indices)]
+        else:
+            others = np.ones(len(self.Geom.coordinates), dtype=bool)
+            others[indices] = False
+            partners = np.flatnonzero(others)
+
+        rij2 = self.Geom.minimum_image_distance(positions[:, :, None, :], self.Geom.coordinates[partners])
+        upper = np.triu_indices(len(indices), 1)
+        rij2_set = self.Geom.minimum_image_distance(positions[:, :, None, :], positions[:, None, :, :])
+        delta = np.zeros(2)
+        for sign, state in [(-1.0, 0), (1.0, 1)]:
+            state_rij2 = np.concatenate([rij2[state].ravel(), rij2_set[state][upper]])
+            energies, virials = self.potential.energy_and_virial(state_rij2[state_rij2 < self.cutoff2])
+            delta += sign * np.array([energies.sum(dtype=np.float64), virials.sum(dtype=np.float64)])
+
+        if virial:
+            return delta[0], delta[1]
+        return delta[0]
+
+    def _block_rij2(self, rows, columns, box_length, rij, image, rij2):
+        """
+        Calculate the squares of the minimum image distances between two sets of positions, one axis at a time,
+        in preallocated buffers, so no other temporary is allocated.
+
+        Both sets may have a leading replica axis, in which case every replica is only compared with itself.
+
+        Parameters
+        ----------
+        rows : numpy array (M x 3) or (R x M x 3)
+            First set of positions.
+        columns : numpy array (C x 3) or (R x C x 3)
+            Second set of positions.
+        box_length : float
+            Length of the periodic box.
+        rij : numpy array (M x C) or (R x M x C)
+            Buffer for one component of the separations.
+        image : numpy array (M x C) or (R x M x C)
+            Buffer for the periodic images of one component of the separations.
+        rij2 : numpy array (M x C) or (R x M x C)
+            Buffer for the result.
+
+        Returns
+        -------
+        rij2 : numpy array (M x C) or (R x M x C)
+            Square of the minimum image distance of every pair, in the rij2 buffer.
+        """
+
+        rij2.fill(0.0)
+        for axis in range(3):
+            np.subtract(rows[..., :, None, axis], columns[..., None, :, axis], out=rij)
+            np.divide(rij, box_length, out=image)
+            np.rint(image, out=image)
+            image *= box_length
+            rij -= image
+            rij *= rij
+            rij2 += rij
+        return rij2
+
+    def _calculate_pair_energy_blocks(self, per_particle=False, virial=False, coordinates=None, box_length=None):
+        """
+        Sum the pair energies over the upper triangle of the pair matrix, one block of rows at a time.
+
+        Each block holds rows i0:i1 against columns i0:N, so the temporaries never exceed block_memory and every
+        pair is computed once. Coordinates with a leading replica axis hold independent systems in the same box,
+        whose blocks are computed together and summed separately.
+
+        Parameters
+        ----------
+        per_particle : Boolean, default to False
+            Whether to also accumulate the interaction energy of every particle.
+        virial : Boolean, default to False
+            Whether to also sum the pair virials, in the same pass as the energies.
+        coordinates : numpy array (N x 3) or (K x N x 3), optional
+            Coordinates to evaluate instead of Geom.coordinates, optionally of K replicas.
+        box_length : float, optional
+            Box length to use instead of Geom.box_length.
+
+        Returns
+        -------
+        e_total : float or numpy array (K)
+            Sum of all the pair energies within the cutoff distance, of every replica if coordinates has a replica
+            axis.
+        particle_energies : numpy array (N) or (K x N) or None
+            Interaction energy of every particle, if per_particle is True.
+        w_total : float or numpy array (K)
+            Sum of all the pair virials within the cutoff distance, only returned if virial is True.
+        particle_virials : numpy array (N) or (K x N) or None
+            Virial of every particle if per_particle is True, only returned if virial is True.
+        """
+
+        coordinates = self.Geom.coordinates if coordinates is None else coordinates
+        box_length = self.Geom.box_length if box_length is None else box_length
+        replicas = coordinates.ndim == 3
+        if not replicas:
+            coordinates = coordinates[None]
+        n_replicas, num_particles = coordinates.shape[:2]
+
+        if self.backend == 'numba':
+            sums = [kernels.total_pair_energy(replica, float(box_length), float(self.cutoff2), self._kernel)
+                    for replica in coordinates]
+            e_total, w_total, particle_energies, particle_virials = [np.array(values) for values in zip(*sums)]
+            if not per_particle:
+                particle_energies = particle_virials = None
+        else:
+            # rij, its periodic image and rij2 in the coordinate precision and the cutoff and upper triangle masks
+            # for every pair of the block, plus, when every pair is within the cutoff, the gathered rij2, the
+            # temporaries of the potential and, for the per-replica and per-particle sums, the replica, row and
+            # column indices and their offsets
+            by_index = per_particle or n_replicas > 1
+            bytes_per_pair = (4 * coordinates.itemsize + 2 + 8 * POTENTIAL_TEMPORARIES +
+                              4 * np.dtype(np.intp).itemsize * by_index)
+            e_total = np.zeros(n_replicas)
+            w_total = np.zeros(n_replicas)
+            particle_energies = np.zeros((n_replicas, num_particles)) if per_particle else None
+            particle_virials = np.zeros((n_replicas, num_particles)) if per_particle and virial else None
+
+            # buffers shared by all the blocks, sized for the largest one
+            max_pairs = max(self.block_memory // bytes_per_pair, n_replicas * num_particles)
+            rij_buffer = np.empty(max_pairs, dtype=coordinates.dtype)
+            image_buffer = np.empty(max_pairs, dtype=coordinates.dtype)
+            rij2_buffer = np.empty(max_pairs, dtype=coordinates.dtype)
+            in_range_buffer = np.empty(max_pairs, dtype=bool)
+            upper_buffer = np.empty(max_pairs, dtype=bool)
+
+            i0 = 0
+            while i0 < num_particles:
+                n_columns = num_particles - i0
+                n_rows = int(min(n_columns, max(1, self.block_memory // (bytes_per_pair * n_replicas * n_columns))))
+                shape = (n_replicas, n_rows, n_columns)
+                size = n_replicas * n_rows * n_columns
+                rij2 = self._block_rij2(coordinates[:, i0:i0 + n_rows], coordinates[:, i0:], box_length,
+                                        rij_buffer[:size].reshape(shape), image_buffer[:size].reshape(shape),
+                                        rij2_buffer[:size].reshape(shape))
+                in_range = np.less(rij2, self.cutoff2, out=in_range_buffer[:size].reshape(shape))
+                in_range &= np.less.outer(np.arange(n_rows), np.arange(n_columns),
+                                          out=upper_buffer[:n_rows * n_columns].reshape(shape[1:]))
+                if virial:
+                    pot, vir = self.potential.energy_and_virial(rij2[in_range])
+                else:
+                    pot = self.potential.energy(rij2[in_range])
+                if by_index:
+                    replica, rows, columns = np.nonzero(in_range)
+                if n_replicas == 1:
+                    e_total += pot.sum(dtype=np.float64)
+                    if virial:
+                        w_total += vir.sum(dtype=np.float64)
+                else:
+                    e_total += np.bincount(replica, weights=pot, minlength=n_replicas)
+                    if virial:
+                        w_total += np.bincount(replica, weights=vir, minlength=n_replicas)
+                if per_particle:
+                    # index of every particle among the columns i0:N of all the replicas
+                    offsets = replica * n_columns
+                    rows += offsets
+                    columns += offsets
+                    block = (n_replicas, n_columns)
+                    for indices in (rows, columns):
+                        particle_energies[:, i0:] += np.bincount(indices, weights=pot,
+                                                                 minlength=n_replicas * n_columns).reshape(block)
+                        if virial:
+                            particle_virials[:, i0:] += np.bincount(indices, weights=vir,
+                                                                    minlength=n_replicas * n_columns).reshape(block)
+                i0 += n_rows
+
+        if not replicas:
+            e_total, w_total = e_total[0], w_total[0]
+            particle_energies = None if particle_energies is None else particle_energies[0]
+            particle_virials = None if particle_virials is None else particle_virials[0]
+        if virial:
+            return e_total, particle_energies, w_total, particle_virials
+        return e_total, particle_energies
+
+    def calculate_total_pair_energy(self, coordinates=None, box_length=None):
+        """
+        Calculate total pair energy between particles i and j, over all the particle pairs in the system.
+
+        Every pair is computed once, by a NumPy kernel working on blocks of rows of the upper triangle of the pair
+        matrix whose temporaries stay below block_memory bytes.
 
         Parameters
         ---------
-        coordinates : array
-            X, Y, Z coordinates of each particle in the system.
-        cutoff2 : integer or float
-            Square of the cutoff distance.
+        coordinates : numpy array (N x 3) or (K x N x 3), optional
+            X, Y, Z coordinates of each particle to use instead of Geom.coordinates, optionally of K independent
+            replicas of the system.
+        box_length : float, optional
+            Box length to use instead of Geom.box_length.
 
         Returns
         -------
-        e_total : float
-            Sum of all the pair energies between particles in the system that are within the cutoff distance.
+        e_total : float or numpy array (K)
+            Sum of all the pair energies between particles in the system that are within the cutoff distance, of
+            every replica if coordinates has a replica axis.
+        """
+
+        e_total, _ = self._calculate_pair_energy_blocks(coordinates=coordinates, box_length=box_length)
+        return e_total
+
+    def calculate_total_virial(self):
+        """
+        Calculate the total pair virial over all the particle pairs in the system.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        w_total : float
+            Sum of the pair virials -r du/dr between particles in the system that are within the cutoff distance.
         """
 
-        e_total = 0.0
-        particle_count = len(self.Geom.coordinates)
-        for i_particle in range(particle_count):
-            e_total += self.get_particle_energy(i_particle, self.Geom.coordinates)
-        return e_total / 2
+        _, _, w_total, _ = self._calculate_pair_energy_blocks(virial=True)
+        return w_total
 
     def calculate_tail_correction(self):
         """
-        Calculate tail correction for Lennard-Jones potential.
+        Calculate tail correction for the pair potential.
 
         Parameters
         ----------
@@ -127,9 +750,533 @@ class Energy:
             Tail correction for num_particles in box of a given volume.
         """
 
-        num_particles = self.Geom.num_particles
-        sig_by_cutoff3 = np.power(1.0 / self.cutoff, 3)
-        sig_by_cutoff9 = np.power(sig_by_cutoff3, 3)
-        e_correction = sig_by_cutoff9 - 3.0 * sig_by_cutoff3
-        e_correction *= 8.0 / 9.0 * np.pi * num_particles / self.Geom.volume * num_particles
-        return e_correction
+        return self.potential.tail_correction(self.Geom.num_particles, self.Geom.volume)
+
+    def calculate_pressure_tail_correction(self):
+        """
+        Calculate the tail correction of the pressure for the pair potential.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        p_correction : float
+            Tail correction of the pressure for num_particles in box of a given volume.
+        """
+
+        return self.potential.pressure_tail_correction(self.Geom.num_particles, self.Geom.volume)
+
+    def initialize_particle_energies(self):
+        """
+        Calculate the interaction energy and virial of every particle and start maintaining them across accepted
+        moves.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        particle_energies : numpy array (N)
+            Interaction energy of every particle with the rest of the system.
+        """
+
+        _, self.particle_energies, _, self.particle_virials = self._calculate_pair_energy_blocks(per_particle=True,
+                                                                                                 virial=True)
+        self._trial = None
+        return self.particle_energies
+
+    def get_total_pair_energy(self):
+        """
+        Get the total pair energy from the per-particle energies.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        e_total : float
+            Half the sum of the per-particle energies, since each pair is counted once for each of its particles.
+        """
+
+        if self.particle_energies is None:
+            raise ValueError("Per-particle energies have not been initialized!")
+        return 0.5 * self.particle_energies.sum()
+
+    def get_total_virial(self):
+        """
+        Get the total pair virial from the per-particle virials.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        w_total : float
+            Half the sum of the per-particle virials, since each pair is counted once for each of its particles.
+        """
+
+        if self.particle_virials is None:
+            raise ValueError("Per-particle energies have not been initialized!")
+        return 0.5 * self.particle_virials.sum()
+
+    def update_particle(self, i_particle, new_coordinate):
+        """
+        Move a particle after an accepted move, keeping the neighbor structures up to date.
+
+        The Verlet lists are built again once some particle has moved more than half the skin since their last build.
+        If the per-particle energies and virials are maintained, the moved particle and every partner whose pair
+        term changed are updated, reusing the pair terms of the last trial move when it proposed this position.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle to move.
+        new_coordinate : numpy array (3)
+            New position of the particle.
+
+        Returns
+        -------
+        None
+        """
+
+        if self.particle_energies is not None:
+            old_partners, old_pair_energies, old_pair_virials = self._get_pair_terms(i_particle,
+                                                                                     self.Geom.coordinates[i_particle])
+            if (self._trial is not None and self._trial[0] == i_particle
+                    and np.array_equal(self._trial[1], new_coordinate)):
+                new_partners, new_pair_energies, new_pair_virials = self._trial[2:]
+            else:
+                new_partners, new_pair_energies, new_pair_virials = self._get_pair_terms(i_particle, new_coordinate)
+            self.particle_energies[old_partners] -= old_pair_energies
+            self.particle_energies[new_partners] += new_pair_energies
+            self.particle_energies[i_particle] = new_pair_energies.sum(dtype=np.float64)
+            self.particle_virials[old_partners] -= old_pair_virials
+            self.particle_virials[new_partners] += new_pair_virials
+            self.particle_virials[i_particle] = new_pair_virials.sum(dtype=np.float64)
+            self._trial = None
+
+        self.Geom.move_particle(i_particle, new_coordinate)
+        if self._shell is not None:
+            self._shell.update(i_particle, new_coordinate)
+        if self._verlet is not None:
+            self._verlet.update(i_particle, new_coordinate)
+            if self._verlet.needs_rebuild():
+                self._verlet.build()
+
+    def update_particles(self, indices, new_coordinates):
+        """
+        Move a set of particles after an accepted collective move.
+
+        The particles are moved one at a time with update_particle, so the per-particle energies, the cell list and
+        the Verlet lists stay consistent at every intermediate step.
+
+        Parameters
+        ----------
+        indices : numpy array (M)
+            Indices of the particles to move.
+        new_coordinates : numpy array (M x 3)
+            New positions of the particles.
+
+        Returns
+        -------
+        None
+        """
+
+        for i_particle, new_coordinate in zip(indices, new_coordinates):
+            self.update_particle(i_particle, new_coordinate)
+
+    def _scale_power_sums(self, energies, virials, scale):
+        """
+        Rescale energies and virials made of the two inverse-power terms of the potential to distances scaled by a
+        factor.
+
+        With u(r) = c1 r^-p1 + c2 r^-p2, the energy is E = T1 + T2 and the virial W = p1 T1 + p2 T2, where T1 and T2
+        are the sums of the two terms, so both sums are recovered from E and W and scaled by scale^-p1 and scale^-p2.
+
+        Parameters
+        ----------
+        energies : float or numpy array
+            Energies made of pairs within the cutoff.
+        virials : float or numpy array
+            Virials of the same pairs.
+        scale : float
+            Factor scaling every distance.
+
+        Returns
+        -------
+        energies : float or numpy array
+            Energies of the same pairs at the scaled distances.
+        virials : float or numpy array
+            Virials of the same pairs at the scaled distances.
+        """
+
+        (_, p1), (_, p2) = self.potential.power_terms()
+        first = (virials - p2 * energies) / (p1 - p2)
+        second = energies - first
+        first = first * scale**-p1
+        second = second * scale**-p2
+        return first + second, p1 * first + p2 * second
+
+    def build_shell_list(self):
+        """
+        Build the shell list of the pairs near the cutoff used by volume moves, replacing any existing one.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        shell : ShellList
+            The shell list, see neighbor.ShellList.
+        """
+
+        self._shell = ShellList(self.Geom, self.cutoff, self.volume_skin)
+        return self._shell
+
+    def get_volume_delta_energy(self, box_length, total_pair_energy, total_virial):
+        """
+        Calculate the energy and virial changes of scaling the box and all the coordinates to a new box length.
+
+        For potentials made of two inverse powers (see PairPotential.power_terms), the current total energy and
+        virial are rescaled in O(1), and only the pairs crossing the cutoff are evaluated. Those are found among the
+        pairs of a shell list around the cutoff, built on the first call and again once particles have moved too
+        far. Other potentials, and volume changes too large for the shell, evaluate every pair of the scaled
+        configuration. Geom is left untouched, so a rejected move needs no clean-up.
+
+        Parameters
+        ----------
+        box_length : float
+            Proposed length of the box.
+        total_pair_energy : float
+            Current sum of all the pair energies within the cutoff distance.
+        total_virial : float
+            Current sum of all the pair virials within the cutoff distance.
+
+        Returns
+        -------
+        delta_e : float
+            Total pair energy of the scaled configuration minus total_pair_energy.
+        delta_w : float
+            Total pair virial of the scaled configuration minus total_virial.
+        """
+
+        scale = box_length / self.Geom.box_length
+        crossing = None
+        if self.potential.power_terms() is not None:
+            if self._shell is None:
+                self.build_shell_list()
+            crossing = self._shell.get_crossing_pairs(box_length)
+            if crossing is None:
+                self._shell.build()
+                crossing = self._shell.get_crossing_pairs(box_length)
+
+        if crossing is None:
+            e_new, _, w_new, _ = self._calculate_pair_energy_blocks(virial=True,
+                                                                    coordinates=self.Geom.coordinates * scale,
+                                                                    box_length=box_length)
+            self._volume_trial = (box_length, None)
+            return e_new - total_pair_energy, w_new - total_virial
+
+        pairs_i, pairs_j, rij2 = crossing
+        scaled_rij2 = rij2 * scale**2
+        if scale > 1.0:
+            # pairs leaving the cutoff, whose rescaled terms have to be removed
+            crossed = (rij2 < self.cutoff2) & (scaled_rij2 >= self.cutoff2)
+            sign = -1.0
+        else:
+            # pairs entering the cutoff
+            crossed = (rij2 >= self.cutoff2) & (scaled_rij2 < self.cutoff2)
+            sign = 1.0
+        pair_energies, pair_virials = self.potential.energy_and_virial(scaled_rij2[crossed])
+        pair_energies = sign * pair_energies.astype(np.float64)
+        pair_virials = sign * pair_virials.astype(np.float64)
+        e_new, w_new = self._scale_power_sums(total_pair_energy, total_virial, scale)
+        e_new += pair_energies.sum()
+        w_new += pair_virials.sum()
+        self._volume_trial = (box_length, (pairs_i[crossed], pairs_j[crossed], pair_energies, pair_virials))
+        return e_new - total_pair_energy, w_new - total_virial
+
+    def scale_volume(self, box_length):
+        """
+        Scale the box and all the coordinates after an accepted volume move.
+
+        If the per-particle energies and virials are maintained, they are rescaled and corrected with the pairs
+        crossing the cutoff found by the last call to get_volume_delta_energy for this box length, or calculated
+        again otherwise. The cell list and Verlet lists are built again for the new box, while the shell list,
+        tracked in units of the box length, stays valid.
+
+        Parameters
+        ----------
+        box_length : float
+            New length of the box.
+
+        Returns
+        -------
+        None
+        """
+
+        scale = box_length / self.Geom.box_length
+        crossing = None
+        if self._volume_trial is not None and self._volume_trial[0] == box_length:
+            crossing = self._volume_trial[1]
+        self.Geom.scale_box(box_length)
+
+        if self.particle_energies is not None:
+            if crossing is None:
+                self.initialize_particle_energies()
+            else:
+                pairs_i, pairs_j, pair_energies, pair_virials = crossing
+                num_particles = len(self.particle_energies)
+                self.particle_energies, self.particle_virials = self._scale_power_sums(self.particle_energies,
+                                                                                       self.particle_virials, scale)
+                for pairs in (pairs_i, pairs_j):
+                    self.particle_energies += np.bincount(pairs, weights=pair_energies, minlength=num_particles)
+                    self.particle_virials += np.bincount(pairs, weights=pair_virials, minlength=num_particles)
+        if self._verlet is not None:
+            self._verlet.build()
+        self._volume_trial = None
+        self._trial = None
+
+    def get_insertion_energy(self, position):
+        """
+        Calculate the energy and virial changes of inserting a particle at a position.
+
+        Parameters
+        ----------
+        position : numpy array (3)
+            Proposed position of the new particle.
+
+        Returns
+        -------
+        delta_e : float
+            Interaction energy of the new particle with the rest of the system.
+        delta_w : float
+            Virial of the new particle with the rest of the system.
+        """
+
+        partners, pair_energies, pair_virials = self._get_pair_terms(-1, position)
+        self._insertion_trial = (position, partners, pair_energies, pair_virials)
+        return pair_energies.sum(dtype=np.float64), pair_virials.sum(dtype=np.float64)
+
+    def calculate_position_energies(self, positions, coordinates=None, box_length=None, exclude=None):
+        """
+        Calculate the interaction energies of test particles at many positions with every particle, in blocks of
+        positions whose temporaries stay below block_memory.
+
+        The test particles do not interact with each other. Positions and coordinates with a leading replica axis
+        hold independent systems in the same box, and the test particles of a replica only interact with its own
+        particles.
+
+        Parameters
+        ----------
+        positions : numpy array (M x 3) or (K x M x 3)
+            Positions of the test particles, optionally of K replicas.
+        coordinates : numpy array (N x 3) or (K x N x 3), optional
+            Coordinates of the particles to use instead of Geom.coordinates, with a replica axis if positions has one.
+        box_length : float, optional
+            Box length to use instead of Geom.box_length.
+        exclude : numpy array (K) of integers, optional
+            Index of a particle of every replica left out of its energies, such as the particle being moved. Only
+            used with a replica axis.
+
+        Returns
+        -------
+        energies : numpy array (M) or (K x M)
+            Interaction energy of a particle at each position.
+        """
+
+        coordinates = self.Geom.coordinates if coordinates is None else coordinates
+        box_length = self.Geom.box_length if box_length is None else box_length
+        replicas = positions.ndim == 3
+        if not replicas:
+            positions, coordinates = positions[None], coordinates[None]
+        n_replicas, n_positions = positions.shape[:2]
+        num_particles = coordinates.shape[1]
+        energies = np.zeros((n_replicas, n_positions))
+        if num_particles == 0 or n_positions == 0:
+            return energies if replicas else energies[0]
+
+        # rij, its periodic image and rij2 in the coordinate precision and the mask for every pair of the block,
+        # plus, when every pair is within the cutoff, the gathered rij2, the temporaries of the potential and the
+        # row and column indices
+        bytes_per_pair = 4 * coordinates.itemsize + 1 + 8 * POTENTIAL_TEMPORARIES + 2 * np.dtype(np.intp).itemsize
+        # a block holds n_rows positions of a single replica, or all the positions of n_block replicas
+        rows_per_block = int(max(1, self.block_memory // (bytes_per_pair * num_particles)))
+        n_rows = min(rows_per_block, n_positions)
+        n_block = max(1, rows_per_block // n_positions)
+        shape = (min(n_block, n_replicas), n_rows, num_particles)
+        buffers = [np.empty(shape, dtype=coordinates.dtype) for i_buffer in range(3)]
+
+        for k0 in range(0, n_replicas, n_block):
+            k1 = min(k0 + n_block, n_replicas)
+            for p0 in range(0, n_positions, n_rows):
+                p1 = min(p0 + n_rows, n_positions)
+                rij2 = self._block_rij2(positions[k0:k1, p0:p1], coordinates[k0:k1], box_length,
+                                        *[buffer[:k1 - k0, :p1 - p0] for buffer in buffers])
+                if exclude is not None:
+                    rij2[np.arange(k1 - k0), :, exclude[k0:k1]] = np.inf
+                in_range = rij2 < self.cutoff2
+                rows = np.nonzero(in_range.reshape(-1, num_particles))[0]
+                block_energies = np.bincount(rows, weights=self.potential.energy(rij2[in_range]),
+                                             minlength=(k1 - k0) * (p1 - p0))
+                energies[k0:k1, p0:p1] = block_energies.reshape(k1 - k0, p1 - p0)
+        return energies if replicas else energies[0]
+
+    def get_insertion_energies(self, positions):
+        """
+        Calculate the interaction energies of test particles at many positions with the system, in one pass.
+
+        The test particles do not interact with each other and the system is left untouched. With a cell list on
+        Geom, the test particles are grouped by cell, and every group is compared in one vectorised kernel with the
+        particles of the cells surrounding it. Otherwise, the energies are calculated by
+        calculate_position_energies.
+
+        Parameters
+        ----------
+        positions : numpy array (M x 3)
+            Positions of the test particles.
+
+        Returns
+        -------
+        energies : numpy array (M)
+            Interaction energy of a particle inserted at each position.
+        """
+
+        coordinates = self.Geom.coordinates
+        positions = np.asarray(positions, dtype=coordinates.dtype)
+        energies = np.zeros(len(positions))
+        if len(coordinates) == 0:
+            return energies
+
+        cell_list = self.Geom.cell_list
+        if cell_list is None:
+            return self.calculate_position_energies(positions)
+
+        cells = cell_list.cell_index(positions)
+        order = np.argsort(cells, kind='stable')
+        groups, starts = np.unique(cells[order], return_index=True)
+        for cell, indices in zip(groups, np.split(order, starts[1:])):
+            candidates = cell_list.cells[cell_list.neighbor_cells[cell]]
+            candidates = coordinates[candidates[candidates >= 0]]
+            rij2 = self.Geom.minimum_image_distance(positions[indices, None, :], candidates)
+            in_range = rij2 < self.cutoff2
+            rows = np.nonzero(in_range)[0]
+            energies[indices] = np.bincount(rows, weights=self.potential.energy(rij2[in_range]),
+                                            minlength=len(indices))
+        return energies
+
+    def get_deletion_energy(self, i_particle):
+        """
+        Get the energy and virial changes of removing a particle.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle to remove.
+
+        Returns
+        -------
+        delta_e : float
+            Minus the interaction energy of the particle with the rest of the system.
+        delta_w : float
+            Minus the virial of the particle with the rest of the system.
+        """
+
+        if self.particle_energies is not None:
+            return -self.particle_energies[i_particle], -self.particle_virials[i_particle]
+        _, pair_energies, pair_virials = self._get_pair_terms(i_particle, self.Geom.coordinates[i_particle])
+        return -pair_energies.sum(dtype=np.float64), -pair_virials.sum(dtype=np.float64)
+
+    def insert_particle(self, position):
+        """
+        Insert a particle after an accepted insertion move.
+
+        The new particle takes the next index. The per-particle energies and virials, like the coordinates, are
+        views of larger storage arrays whose capacity doubles when full, and the pair terms of the last call to
+        get_insertion_energy are reused when it proposed this position.
+
+        Parameters
+        ----------
+        position : numpy array (3)
+            Position of the new particle.
+
+        Returns
+        -------
+        i_particle : integer
+            Index of the new particle.
+        """
+
+        if self._verlet is not None:
+            raise ValueError("Particle insertion is not supported with neighbor_method='verlet'.")
+        if self.particle_energies is not None:
+            if self._insertion_trial is not None and np.array_equal(self._insertion_trial[0], position):
+                partners, pair_energies, pair_virials = self._insertion_trial[1:]
+            else:
+                partners, pair_energies, pair_virials = self._get_pair_terms(-1, position)
+            self.particle_energies[partners] += pair_energies
+            self.particle_virials[partners] += pair_virials
+            self.particle_energies, self._energy_storage = _append(self.particle_energies, self._energy_storage,
+                                                                   pair_energies.sum(dtype=np.float64))
+            self.particle_virials, self._virial_storage = _append(self.particle_virials, self._virial_storage,
+                                                                  pair_virials.sum(dtype=np.float64))
+        self._insertion_trial = None
+        self._trial = None
+        self._shell = None
+        return self.Geom.add_particle(position)
+
+    def remove_particle(self, i_particle):
+        """
+        Remove a particle after an accepted deletion move.
+
+        The last particle takes the index of the removed one, in the coordinates, the cell list and the
+        per-particle energies and virials alike.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle to remove.
+
+        Returns
+        -------
+        None
+        """
+
+        if self._verlet is not None:
+            raise ValueError("Particle deletion is not supported with neighbor_method='verlet'.")
+        if self.particle_energies is not None:
+            partners, pair_energies, pair_virials = self._get_pair_terms(i_particle, self.Geom.coordinates[i_particle])
+            self.particle_energies[partners] -= pair_energies
+            self.particle_virials[partners] -= pair_virials
+        last = self.Geom.remove_particle(i_particle)
+        if self.particle_energies is not None:
+            self.particle_energies[i_particle] = self.particle_energies[last]
+            self.particle_virials[i_particle] = self.particle_virials[last]
+            self.particle_energies = self.particle_energies[:last]
+            self.particle_virials = self.particle_virials[:last]
+        self._insertion_trial = None
+        self._trial = None
+        self._shell = None
+
+    def get_n_rebuilds(self):
+        """
+        Get the number of times the Verlet lists have been built.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        n_builds : integer
+            Number of builds of the Verlet lists, 0 if they are not used.
+        """
+
+        if self._verlet is None:
+            return 0
+        return self._verlet.n_builds
@@ -0,0 +1,271 @@
+import numpy as np
+import time
+from .energy import Energy
+from .geom import Geom
+from .potentials import get_potential
+from .rng import RandomStream
+
+
+class MCEnsemble:
+    """
+    A class running K independent Monte Carlo chains of the same system in lockstep.
+
+    The coordinates of all the replicas are stored in a single (K, N, 3) array, and each step moves one particle in
+    every replica with batched minimum image, potential and acceptance kernels over the replica axis, so the Python
+    overhead of a step is shared by all the replicas. Every replica keeps its own energy trace and tunes its own
+    maximum displacement.
+
+    Attributes
+    ----------
+        n_replicas : int
+            Number of independent chains K.
+        num_particles : int
+            Number of particles in each replica.
+        box_length : float
+            Length of the periodic box, the same for every replica.
+        volume : float
+            Volume of the box.
+        coordinates : numpy array (K x N x 3)
+            Coordinates of the particles of every replica.
+        potential : PairPotential
+            Pair potential of the system.
+        max_displacement : numpy array (K)
+            Magnitude of particle displacement for Monte Carlo steps, for each replica.
+        tune_displacement : Boolean
+            If True the magnitude of displacement of each replica is adjusted based on its acceptance rate.
+        performance : float
+            Performance of simulation in seconds / per step of all the replicas.
+
+    Methods
+    -------
+        run :
+            Advance all the chains by a number of steps.
+        get_energy :
+            Get the energy traces of all the replicas.
+        get_acceptance_rate :
+            Get the acceptance rate of every replica over all the steps run so far.
+    """
+    def __init__(self,
+                 n_replicas,
+                 reduced_temp,
+                 max_displacement,
+                 cutoff,
+                 num_particles,
+                 reduced_den,
+                 tune_displacement=True,
+                 potential='lj',
+                 potential_params=None,
+                 block_memory=2**20,
+                 seed=None):
+        """
+        Initialize an ensemble of independent MC simulations.
+
+        Parameters
+        ----------
+        n_replicas : int
+            Number of independent chains K.
+        reduced_temp : float
+            Reduced temperature at which the simulations will run.
+        max_displacement : float
+            Initial maximum trial move displacement in each dimension, shared by all the replicas.
+        cutoff : float
+            Cutoff distance for energy calculation.
+        num_particles : int
+            Number of particles in each replica.
+        reduced_den : float
+            Reduced density of the system.
+        tune_displacement : Boolean, default to True
+            Whether to tune the maximum displacement of each replica based on its acceptance probability.
+        potential : string or PairPotential, default to 'lj'
+            Pair potential, either a registered name or a PairPotential instance.
+        potential_params : dict, optional
+            Parameters of the registered potential, for example {'epsilon': 1.0, 'sigma': 1.0}.
+        block_memory : integer, default to 2**20 (1 MiB)
+            Memory ceiling in bytes for the temporaries of the blocked energy kernels.
+        seed : integer, numpy SeedSequence or None, default to None
+            Seed of the random number stream shared by all the replicas.
+
+        Returns
+        -------
+        None
+        """
+
+        if reduced_den < 0.0 or reduced_temp < 0.0:
+            raise ValueError("reduced temperature and density must be greater than zero.")
+
+        self.beta = 1. / float(reduced_temp)
+        self.n_replicas = n_replicas
+        self.num_particles = num_particles
+        self.tune_displacement = tune_displacement
+        self.max_displacement = np.full(n_replicas, float(max_displacement))
+        self.block_memory = block_memory
+        self.potential = get_potential(potential, cutoff, **(potential_params or {}))
+        self._Energy = Energy(None, cutoff, block_memory=block_memory, potential=self.potential)
+        self._rng = RandomStream(seed)
+
+        geoms = [
+            Geom('random', num_particles=num_particles, reduced_den=reduced_den, rng=self._rng.generator)
+            for _ in range(n_replicas)
+        ]
+        self.box_length = geoms[0].box_length
+        self.volume = geoms[0].volume
+        self.coordinates = np.stack([geom.coordinates for geom in geoms])
+
+        self._n_trials = np.zeros(n_replicas, dtype=np.intp)
+        self._n_accept = np.zeros(n_replicas, dtype=np.intp)
+        self._n_accept_total = np.zeros(n_replicas, dtype=np.intp)
+        self._energy_array = np.zeros((n_replicas, 0))
+        self.current_step = 0
+
+    def _calculate_total_pair_energies(self):
+        """
+        Calculate the total pair energy of every replica over the upper triangle of its pair matrix.
+
+        Blocks of rows of all the replicas are processed at once by the Energy kernel, so the temporaries never
+        exceed block_memory.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        e_total : numpy array (K)
+            Sum of all the pair energies within the cutoff distance, for each replica.
+        """
+
+        return self._Energy.calculate_total_pair_energy(coordinates=self.coordinates, box_length=self.box_length)
+
+    def _step(self):
+        """
+        Attempt one single-particle move in every replica.
+
+        The old and proposed positions of the K moved particles are compared against all the particles of their
+        replica by the blocked Energy kernel, and the acceptance tests of all the replicas are done at once.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        accept : numpy array (K)
+            Whether the move of each replica was accepted.
+        delta_e : numpy array (K)
+            Energy change of the move of each replica.
+        """
+
+        n_replicas, num_particles = self.coordinates.shape[:2]
+        replicas = np.arange(n_replicas)
+        uniforms = self._rng.generator.random((n_replicas, 5))
+        i_particles = (uniforms[:, 0] * num_particles).astype(np.intp)
+        random_displacement = (2.0 * uniforms[:, 1:4] - 1.0) * self.max_displacement[:, None]
+
+        old_coordinates = self.coordinates[replicas, i_particles]
+        new_coordinates = old_coordinates + random_displacement
+        new_coordinates -= self.box_length * np.round(new_coordinates / self.box_length)
+
+        positions = np.stack([old_coordinates, new_coordinates], axis=1)
+        energies = self._Energy.calculate_position_energies(positions, coordinates=self.coordinates,
+                                                            box_length=self.box_length, exclude=i_particles)
+        delta_e = energies[:, 1] - energies[:, 0]
+
+        accept = uniforms[:, 4] < np.exp(-self.beta * np.maximum(delta_e, 0.0))
+        self.coordinates[replicas[accept], i_particles[accept]] = new_coordinates[accept]
+        return accept, delta_e
+
+    def _adjust_displacement(self):
+        """
+        Adjust the maximum trial move displacement of each replica based on its previous acceptance probability.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        acc_rate = self._n_accept / self._n_trials
+        self.max_displacement[acc_rate < 0.38] *= 0.8
+        self.max_displacement[acc_rate > 0.42] *= 1.2
+        self._n_trials[:] = 0
+        self._n_accept[:] = 0
+
+    def run(self, n_steps, freq):
+        """
+        Advance all the chains by a number of steps.
+
+        Parameters
+        ----------
+        n_steps : int
+            The number of steps for this simulation, each moving one particle in every replica.
+        freq : int
+            The frequency to tune the displacements and print the mean energy over the replicas.
+
+        Returns
+        -------
+        None
+        """
+
+        tail_correction = self.potential.tail_correction(self.num_particles, self.volume)
+        total_pair_energy = self._calculate_total_pair_energies()
+        if self.current_step == 0:
+            trace = np.zeros((self.n_replicas, n_steps + 1))
+            trace[:, 0] = (total_pair_energy + tail_correction) / self.num_particles
+        else:
+            trace = np.zeros((self.n_replicas, n_steps))
+        self._energy_array = np.concatenate([self._energy_array, trace], axis=1)
+
+        start = time.time()
+        for i_step in range(1, n_steps + 1):
+            self.current_step += 1
+            accept, delta_e = self._step()
+            total_pair_energy[accept] += delta_e[accept]
+            self._n_trials += 1
+            self._n_accept += accept
+            self._n_accept_total += accept
+            self._energy_array[:, self.current_step] = (total_pair_energy + tail_correction) / self.num_particles
+
+            if np.mod(i_step + 1, freq) == 0:
+                mean_energy = self._energy_array[:, self.current_step].mean()
+                print(f"Step: {self.current_step + 1} | Mean energy: {round(mean_energy, 5)}")
+                if self.tune_displacement:
+                    self._adjust_displacement()
+        self.performance = (time.time() - start) / n_steps
+        print(f"Performance: {round(1000*self.performance, 5)} seconds / 1000 steps of {self.n_replicas} replicas")
+
+    def get_energy(self):
+        """
+        Get the energy traces of all the replicas.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        2d Numpy array (K x steps) of the energy per particle of every replica at every step.
+        """
+
+        if (self._energy_array.shape[1] == 0):
+            raise ValueError("Simulation has not started running!")
+        return self._energy_array
+
+    def get_acceptance_rate(self):
+        """
+        Get the acceptance rate of every replica over all the steps run so far.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        1d Numpy array (K) of acceptance rates.
+        """
+
+        if (self.current_step == 0):
+            raise ValueError("Simulation has not started running!")
+        return self._n_accept_total / self.current_step
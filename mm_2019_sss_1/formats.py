@@ -0,0 +1,725 @@
+import collections
+import itertools
+import os
+import re
+import struct
+import numpy as np
+from .trajectory import MAGIC, TrajectoryReader
+
+# leading bytes of the zip archives written by numpy.savez, such as the checkpoints of MC
+NPZ_MAGIC = b'PK\x03\x04'
+
+# DCD header records: control block, a single 80 character title and the number of atoms, each framed by the
+# record length markers of Fortran unformatted files, without the byte order character
+DCD_CONTROL = 'i4s9if10ii'
+DCD_TITLE = 'ii80si'
+DCD_ATOMS = 'iii'
+DCD_HEADER_SIZE = struct.calcsize('<' + DCD_CONTROL + DCD_TITLE + DCD_ATOMS)
+
+# box of an extended XYZ comment line
+LATTICE = re.compile(r'Lattice="([^"]*)"')
+
+
+def _read_text_configuration(file_name, dtype, chunk_size):
+    """
+    Read a text configuration in a single streaming pass into a preallocated array.
+
+    The first line holds the box dimensions and the second line the number of particles. Every following line holds
+    the coordinates of one particle in its last three columns, optionally preceded by a label or index, as in the
+    sample configurations and the files written by Geom.save_state. The lines are parsed in chunks of chunk_size, so
+    the text of the file is never held in memory at once.
+
+    Parameters
+    ----------
+    file_name : string
+        Name of the configuration file.
+    dtype : numpy dtype
+        Data type of the returned coordinates.
+    chunk_size : integer
+        Number of lines parsed at once.
+
+    Returns
+    -------
+    coordinates : numpy array (N x 3)
+        Coordinates of the particles.
+    box_length : float
+        Length of the box.
+    """
+
+    with open(file_name) as f:
+        box_length = float(f.readline().split()[0])
+        num_particles = int(f.readline().split()[0])
+        coordinates = np.empty((num_particles, 3), dtype=dtype)
+        n_read = 0
+        usecols = None
+        while True:
+            lines = list(itertools.islice(f, chunk_size))
+            if not lines:
+                break
+            if usecols is None:
+                first = next((line.split() for line in lines if line.strip()), None)
+                if first is None:
+                    continue
+                usecols = tuple(range(len(first) - 3, len(first)))
+            block = np.loadtxt(lines, usecols=usecols, dtype=dtype, ndmin=2)
+            if n_read + len(block) > num_particles:
+                raise ValueError('Inconsistent value of number of particles in file!')
+            coordinates[n_read:n_read + len(block)] = block
+            n_read += len(block)
+    if n_read != num_particles:
+        raise ValueError('Inconsistent value of number of particles in file!')
+    return coordinates, box_length
+
+
+def _grow(buffer, num_particles):
+    """
+    Make sure a frame buffer can hold a number of particles, reallocating it only if it is too small.
+
+    Parameters
+    ----------
+    buffer : numpy array (M x 3)
+        Frame buffer.
+    num_particles : integer
+        Number of particles of the next frame.
+
+    Returns
+    -------
+    buffer : numpy array (M x 3)
+        The buffer, or a new buffer with room for at least num_particles particles.
+    """
+
+    if len(buffer) < num_particles:
+        buffer = np.empty((max(num_particles, 2 * len(buffer)), 3), dtype=buffer.dtype)
+    return buffer
+
+
+def _select_frame(frames, frame):
+    """
+    Copy a single frame out of a stream of frames.
+
+    Parameters
+    ----------
+    frames : iterable
+        Stream of (coordinates, box_length) frames, as yielded by the readers of this module.
+    frame : integer
+        Index of the frame, negative indices counting from the end.
+
+    Returns
+    -------
+    coordinates : numpy array (N x 3)
+        Copy of the coordinates of the frame.
+    box_length : float or None
+        Box length of the frame.
+    """
+
+    if frame >= 0:
+        selected = itertools.islice(frames, frame, frame + 1)
+    else:
+        selected = collections.deque(((coordinates.copy(), box_length) for coordinates, box_length in frames),
+                                     maxlen=-frame)
+        if len(selected) < -frame:
+            selected = []
+    for coordinates, box_length in selected:
+        return coordinates.copy(), box_length
+    raise IndexError(f"The file holds no frame {frame}.")
+
+
+class XYZWriter:
+    """
+    A writer appending frames to a multi-frame XYZ file.
+
+    Every frame holds the number of particles, a comment line in the extended XYZ layout giving the box as a
+    Lattice and the corner of the box as an Origin, since the coordinates of this package are centred on zero, and
+    one line per particle with its element and coordinates. The number of particles may change between frames.
+
+    Attributes
+    ----------
+        file_name : string
+            Name of the XYZ file.
+        box_length : float or None
+            Box length written when a frame is given none.
+        element : string
+            Element symbol written for every particle.
+        n_frames : integer
+            Number of frames written by this writer.
+
+    Methods
+    -------
+        write :
+            Append a frame to the file.
+        close :
+            Close the file.
+    """
+    def __init__(self, file_name, box_length=None, element='Ar', append=False):
+        """
+        The constructor for XYZWriter class.
+
+        Parameters
+        ----------
+            file_name : string
+                Name of the XYZ file.
+            box_length : integer, float or None, default to None
+                Box length written when a frame is given none. Without any box length the comment line is left
+                empty.
+            element : string, default to 'Ar'
+                Element symbol written for every particle.
+            append : Boolean, default to False
+                If True, frames are appended to an existing file, otherwise the file is created or overwritten.
+        """
+
+        self.file_name = file_name
+        self.box_length = box_length
+        self.element = element
+        self.n_frames = 0
+        self._file = open(file_name, 'a' if append else 'w')
+
+    def write(self, coordinates, box_length=None):
+        """
+        Append a frame to the file.
+
+        Parameters
+        ----------
+        coordinates : numpy array (N x 3)
+            Coordinates of the particles.
+        box_length : float, optional
+            Box length of the frame, default to the box length of the writer.
+
+        Returns
+        -------
+        None
+        """
+
+        box_length = self.box_length if box_length is None else box_length
+        comment = ''
+        if box_length is not None:
+            origin = -0.5 * box_length
+            comment = (f'Lattice="{box_length} 0.0 0.0 0.0 {box_length} 0.0 0.0 0.0 {box_length}" '
+                       f'Origin="{origin} {origin} {origin}" Properties=species:S:1:pos:R:3')
+        self._file.write(f'{len(coordinates)}\n{comment}\n')
+        np.savetxt(self._file, coordinates, fmt=self.element + ' %.10f %.10f %.10f')
+        self.n_frames += 1
+
+    def close(self):
+        """
+        Close the file.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class XYZReader:
+    """
+    A reader streaming the frames of a multi-frame XYZ file.
+
+    Frames are parsed one at a time into a buffer reused from frame to frame, so a frame yielded by the reader is
+    overwritten by the next one and has to be copied to be kept.
+
+    Attributes
+    ----------
+        file_name : string
+            Name of the XYZ file.
+        dtype : numpy dtype
+            Data type of the yielded coordinates.
+    """
+    def __init__(self, file_name, dtype=np.float64):
+        """
+        The constructor for XYZReader class.
+
+        Parameters
+        ----------
+            file_name : string
+                Name of the XYZ file.
+            dtype : numpy dtype, default to float64
+                Data type of the yielded coordinates.
+        """
+
+        self.file_name = file_name
+        self.dtype = np.dtype(dtype)
+
+    def __iter__(self):
+        buffer = np.empty((0, 3), dtype=self.dtype)
+        with open(self.file_name) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                num_particles = int(line.split()[0])
+                lattice = LATTICE.search(f.readline())
+                box_length = float(lattice.group(1).split()[0]) if lattice else None
+                lines = list(itertools.islice(f, num_particles))
+                if len(lines) < num_particles:
+                    raise ValueError(f"{self.file_name} ends in the middle of a frame.")
+                buffer = _grow(buffer, num_particles)
+                if num_particles > 0:
+                    buffer[:num_particles] = np.loadtxt(lines, usecols=(1, 2, 3), dtype=self.dtype, ndmin=2)
+                yield buffer[:num_particles], box_length
+
+
+class PDBWriter:
+    """
+    A writer appending frames to a minimal multi-model PDB file.
+
+    Every frame is a MODEL holding a CRYST1 record with the cubic box and one HETATM record per particle, with
+    coordinates in the fixed 8.3f columns of the PDB layout. Serial and residue numbers wrap around beyond their
+    column widths. No END record is written, so later runs can append to the file. The number of particles may
+    change between frames.
+
+    Attributes
+    ----------
+        file_name : string
+            Name of the PDB file.
+        box_length : float or None
+            Box length written when a frame is given none.
+        element : string
+            Element symbol written for every particle.
+        n_frames : integer
+            Number of frames written by this writer.
+
+    Methods
+    -------
+        write :
+            Append a frame to the file.
+        close :
+            Close the file.
+    """
+    def __init__(self, file_name, box_length=None, element='Ar', append=False):
+        """
+        The constructor for PDBWriter class.
+
+        Parameters
+        ----------
+            file_name : string
+                Name of the PDB file.
+            box_length : integer, float or None, default to None
+                Box length written when a frame is given none. Without any box length no CRYST1 record is written.
+            element : string, default to 'Ar'
+                Element symbol written for every particle, also used as atom and residue name.
+            append : Boolean, default to False
+                If True, frames are appended to an existing file, otherwise the file is created or overwritten.
+        """
+
+        self.file_name = file_name
+        self.box_length = box_length
+        self.element = element
+        self.n_frames = 0
+        self._file = open(file_name, 'a' if append else 'w')
+        self._atom_format = (f'HETATM%5d {element.upper():<4s} {element.upper():>3s} A%4d    %8.3f%8.3f%8.3f'
+                             f'  1.00  0.00          {element.upper():>2s}')
+
+    def write(self, coordinates, box_length=None):
+        """
+        Append a frame to the file.
+
+        Parameters
+        ----------
+        coordinates : numpy array (N x 3)
+            Coordinates of the particles.
+        box_length : float, optional
+            Box length of the frame, default to the box length of the writer.
+
+        Returns
+        -------
+        None
+        """
+
+        box_length = self.box_length if box_length is None else box_length
+        self.n_frames += 1
+        self._file.write(f'MODEL     {self.n_frames % 10000:4d}\n')
+        if box_length is not None:
+            self._file.write(f'CRYST1{box_length:9.3f}{box_length:9.3f}{box_length:9.3f}  90.00  90.00  90.00 P 1'
+                             f'           1\n')
+        serial = np.arange(1, len(coordinates) + 1)
+        records = np.column_stack([serial % 100000, serial % 10000, coordinates])
+        np.savetxt(self._file, records, fmt=self._atom_format)
+        self._file.write('ENDMDL\n')
+
+    def close(self):
+        """
+        Close the file.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PDBReader:
+    """
+    A reader streaming the models of a PDB file as frames.
+
+    Only the CRYST1, ATOM, HETATM, ENDMDL and END records are read. A file without MODEL records is read as a
+    single frame, and a CRYST1 record holds for the following frames until the next one. Frames are parsed one at a
+    time into a buffer reused from frame to frame, so a frame yielded by the reader is overwritten by the next one
+    and has to be copied to be kept.
+
+    Attributes
+    ----------
+        file_name : string
+            Name of the PDB file.
+        dtype : numpy dtype
+            Data type of the yielded coordinates.
+    """
+    def __init__(self, file_name, dtype=np.float64):
+        """
+        The constructor for PDBReader class.
+
+        Parameters
+        ----------
+            file_name : string
+                Name of the PDB file.
+            dtype : numpy dtype, default to float64
+                Data type of the yielded coordinates.
+        """
+
+        self.file_name = file_name
+        self.dtype = np.dtype(dtype)
+
+    def __iter__(self):
+        buffer = np.empty((0, 3), dtype=self.dtype)
+        box_length = None
+        atoms = []
+        with open(self.file_name) as f:
+            for line in itertools.chain(f, ['END']):
+                record = line[:6].strip()
+                if record == 'CRYST1':
+                    box_length = float(line[6:15])
+                elif record in ('ATOM', 'HETATM'):
+                    atoms.append((line[30:38], line[38:46], line[46:54]))
+                elif record in ('ENDMDL', 'END') and atoms:
+                    buffer = _grow(buffer, len(atoms))
+                    buffer[:len(atoms)] = np.array(atoms, dtype=float)
+                    yield buffer[:len(atoms)], box_length
+                    atoms = []
+
+
+class DCDWriter:
+    """
+    A writer appending frames to a DCD trajectory, in the CHARMM layout read by common visualisation and analysis
+    programs.
+
+    The header is written with the first frame, since it holds the number of particles, and its frame count is
+    updated after every frame. Every frame holds the unit cell, a cube of the box length, and the coordinates in
+    float32. The number of particles cannot change between frames.
+
+    Attributes
+    ----------
+        file_name : string
+            Name of the DCD file.
+        box_length : float or None
+            Box length written when a frame is given none.
+        num_particles : integer or None
+            Number of particles of every frame, None until the first frame of a new file.
+        n_frames : integer
+            Number of frames in the file.
+
+    Methods
+    -------
+        write :
+            Append a frame to the file.
+        close :
+            Close the file.
+    """
+    def __init__(self, file_name, box_length=None, append=False):
+        """
+        The constructor for DCDWriter class.
+
+        Parameters
+        ----------
+            file_name : string
+                Name of the DCD file.
+            box_length : integer, float or None, default to None
+                Box length written when a frame is given none.
+            append : Boolean, default to False
+                If True and the file exists, frames are appended to it, otherwise the file is created or
+                overwritten.
+        """
+
+        self.file_name = file_name
+        self.box_length = box_length
+        if append and os.path.exists(file_name):
+            reader = DCDReader(file_name)
+            if reader.byte_order != '<' or not reader.has_unit_cell:
+                raise ValueError(f"{file_name} was not written by DCDWriter and cannot be appended to.")
+            self.num_particles = reader.num_particles
+            self.n_frames = reader.n_frames
+            self._file = open(file_name, 'r+b')
+            frame_size = _dcd_frame_dtype('<', self.num_particles, True).itemsize
+            self._file.truncate(DCD_HEADER_SIZE + self.n_frames * frame_size)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self.num_particles = None
+            self.n_frames = 0
+            self._file = open(file_name, 'wb')
+
+    def write(self, coordinates, box_length=None):
+        """
+        Append a frame to the file.
+
+        Parameters
+        ----------
+        coordinates : numpy array (N x 3)
+            Coordinates of the particles.
+        box_length : float, optional
+            Box length of the frame, default to the box length of the writer.
+
+        Returns
+        -------
+        None
+        """
+
+        box_length = self.box_length if box_length is None else box_length
+        if box_length is None:
+            raise ValueError("DCD frames need a box length.")
+        if self.num_particles is None:
+            self.num_particles = len(coordinates)
+            self._file.write(_dcd_header(self.num_particles))
+        elif len(coordinates) != self.num_particles:
+            raise ValueError(f"Frames must hold {self.num_particles} particles, got {len(coordinates)}.")
+
+        frame = np.empty((), dtype=_dcd_frame_dtype('<', self.num_particles, True))
+        for field in ('cell', 'x', 'y', 'z'):
+            frame[f'{field}_start'] = frame[f'{field}_end'] = frame[field].nbytes
+        # CHARMM order of the unit cell: a, gamma, b, beta, alpha, c
+        frame['cell'] = [box_length, 90.0, box_length, 90.0, 90.0, box_length]
+        frame['x'], frame['y'], frame['z'] = np.asarray(coordinates).T
+        self._file.write(frame.tobytes())
+        self.n_frames += 1
+
+        self._file.seek(8)
+        self._file.write(struct.pack('<i', self.n_frames))
+        self._file.seek(0, os.SEEK_END)
+
+    def close(self):
+        """
+        Close the file.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _dcd_header(num_particles):
+    """
+    Build the header of a little-endian DCD file with a unit cell in every frame.
+
+    Parameters
+    ----------
+    num_particles : integer
+        Number of particles of every frame.
+
+    Returns
+    -------
+    header : bytes
+        The control, title and atom count records.
+    """
+
+    control_size = struct.calcsize('<' + DCD_CONTROL) - 8
+    # frame count, first step, steps between frames, last step, four unused fields, number of fixed atoms, time
+    # step, unit cell flag, four-dimensional flag, seven unused fields and the CHARMM version
+    control = struct.pack('<' + DCD_CONTROL, control_size, b'CORD', 0, 0, 1, 0, 0, 0, 0, 0, 0, 1.0, 1, 0, 0, 0, 0, 0,
+                          0, 0, 0, 24, control_size)
+    title_size = struct.calcsize('<' + DCD_TITLE) - 8
+    title = struct.pack('<' + DCD_TITLE, title_size, 1, b'Created by mm_2019_sss_1'.ljust(80), title_size)
+    return control + title + struct.pack('<' + DCD_ATOMS, 4, num_particles, 4)
+
+
+def _dcd_frame_dtype(byte_order, num_particles, has_unit_cell):
+    """
+    Build the record type of a single DCD frame, with the record length markers around every block.
+
+    Parameters
+    ----------
+    byte_order : string, either '<' or '>'
+        Byte order of the file.
+    num_particles : integer
+        Number of particles of every frame.
+    has_unit_cell : Boolean
+        Whether the frames start with a unit cell record.
+
+    Returns
+    -------
+    frame_dtype : numpy dtype
+        Structured record type with fields 'cell', 'x', 'y' and 'z', each framed by '<field>_start' and
+        '<field>_end' markers.
+    """
+
+    blocks = [('x', 'f4', (num_particles,)), ('y', 'f4', (num_particles,)), ('z', 'f4', (num_particles,))]
+    if has_unit_cell:
+        blocks.insert(0, ('cell', 'f8', (6,)))
+    fields = []
+    for name, kind, shape in blocks:
+        fields += [(f'{name}_start', byte_order + 'i4'), (name, byte_order + kind, shape),
+                   (f'{name}_end', byte_order + 'i4')]
+    return np.dtype(fields)
+
+
+class DCDReader:
+    """
+    A reader streaming the frames of a DCD trajectory in the CHARMM layout, in either byte order.
+
+    Frames are read one at a time into a buffer reused from frame to frame, so a frame yielded by the reader is
+    overwritten by the next one and has to be copied to be kept. Files with fixed atoms or four-dimensional
+    coordinates are not supported.
+
+    Attributes
+    ----------
+        file_name : string
+            Name of the DCD file.
+        dtype : numpy dtype
+            Data type of the yielded coordinates.
+        byte_order : string, either '<' or '>'
+            Byte order of the file.
+        num_particles : integer
+            Number of particles of every frame.
+        has_unit_cell : Boolean
+            Whether the frames hold a unit cell.
+        n_frames : integer
+            Number of complete frames in the file.
+    """
+    def __init__(self, file_name, dtype=np.float64):
+        """
+        The constructor for DCDReader class.
+
+        Parameters
+        ----------
+            file_name : string
+                Name of the DCD file.
+            dtype : numpy dtype, default to float64
+                Data type of the yielded coordinates.
+        """
+
+        self.file_name = file_name
+        self.dtype = np.dtype(dtype)
+        control_size = struct.calcsize('<' + DCD_CONTROL)
+        atoms_size = struct.calcsize('<' + DCD_ATOMS)
+        with open(file_name, 'rb') as f:
+            header = f.read(control_size + 8)
+            if len(header) < control_size + 8 or header[4:8] != b'CORD':
+                raise ValueError(f"{file_name} is not a DCD file.")
+            self.byte_order = '<' if struct.unpack('<i', header[:4])[0] == 84 else '>'
+            control = struct.unpack_from(self.byte_order + DCD_CONTROL, header)
+            n_fixed, has_unit_cell, has_fourth_dimension = control[10], control[12], control[13]
+            if n_fixed != 0 or has_fourth_dimension != 0:
+                raise ValueError(f"{file_name} has fixed atoms or four-dimensional coordinates, which are not "
+                                 f"supported.")
+            title_size = struct.unpack_from(self.byte_order + 'i', header, control_size)[0]
+            self._offset = control_size + title_size + 8
+            f.seek(self._offset)
+            self.num_particles = struct.unpack(self.byte_order + DCD_ATOMS, f.read(atoms_size))[1]
+        self._offset += atoms_size
+        self.has_unit_cell = bool(has_unit_cell)
+        self._frame_dtype = _dcd_frame_dtype(self.byte_order, self.num_particles, self.has_unit_cell)
+        # an interrupted write may leave an incomplete last frame, which is ignored
+        self.n_frames = (os.path.getsize(file_name) - self._offset) // self._frame_dtype.itemsize
+
+    def __len__(self):
+        return self.n_frames
+
+    def __iter__(self):
+        frame = np.empty((), dtype=self._frame_dtype)
+        buffer = np.empty((self.num_particles, 3), dtype=self.dtype)
+        with open(self.file_name, 'rb') as f:
+            f.seek(self._offset)
+            for i_frame in range(self.n_frames):
+                f.readinto(frame)
+                buffer[:, 0], buffer[:, 1], buffer[:, 2] = frame['x'], frame['y'], frame['z']
+                yield buffer, float(frame['cell'][0]) if self.has_unit_cell else None
+
+
+def read_configuration(file_name, dtype=np.float64, frame=-1, chunk_size=65536):
+    """
+    Read the box length and the coordinates of a configuration, recognizing the format from the content of the file.
+
+    Binary trajectories written by TrajectoryWriter and checkpoints written by MC.checkpoint are read directly
+    without parsing any text. DCD files are recognized from their header, and XYZ and PDB files from their .xyz and
+    .pdb extensions, and are streamed up to the requested frame. Any other file is read as a text configuration,
+    see _read_text_configuration.
+
+    Parameters
+    ----------
+    file_name : string
+        Name of the configuration file.
+    dtype : numpy dtype, default to float64
+        Data type of the returned coordinates.
+    frame : integer, default to -1
+        Frame of a trajectory to read, the last frame by default.
+    chunk_size : integer, default to 65536
+        Number of lines of a text configuration parsed at once.
+
+    Returns
+    -------
+    coordinates : numpy array (N x 3)
+        Coordinates of the particles.
+    box_length : float
+        Length of the box.
+    """
+
+    with open(file_name, 'rb') as f:
+        magic = f.read(len(MAGIC))
+
+    extension = os.path.splitext(file_name)[1].lower()
+    if magic[4:8] == b'CORD':
+        frames = DCDReader(file_name, dtype=dtype)
+    elif extension == '.xyz':
+        frames = XYZReader(file_name, dtype=dtype)
+    elif extension == '.pdb':
+        frames = PDBReader(file_name, dtype=dtype)
+    else:
+        frames = None
+    if frames is not None:
+        coordinates, box_length = _select_frame(frames, frame)
+        if box_length is None:
+            raise ValueError(f"Frame {frame} of {file_name} has no box length.")
+        return coordinates, box_length
+
+    if magic == MAGIC:
+        reader = TrajectoryReader(file_name)
+        if reader.n_frames == 0:
+            raise ValueError(f"{file_name} holds no frames.")
+        return np.array(reader.coordinates[frame], dtype=dtype), float(reader.box_lengths[frame])
+
+    if magic.startswith(NPZ_MAGIC):
+        with np.load(file_name) as arrays:
+            if 'geom.coordinates' not in arrays:
+                raise ValueError(f"{file_name} is not a checkpoint written by MC.checkpoint.")
+            return arrays['geom.coordinates'].astype(dtype), float(arrays['geom.box_length'])
+
+    return _read_text_configuration(file_name, np.dtype(dtype), chunk_size)
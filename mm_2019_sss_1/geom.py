@@ -1,4 +1,36 @@
 import numpy as np
+from .formats import read_configuration
+from .neighbor import CellList
+
+
+def _append(array, storage, value):
+    """
+    Append a value to an array held at the start of a larger storage array, doubling the storage when it is full.
+
+    Parameters
+    ----------
+    array : numpy array
+        Array to append to, either a view of the first rows of storage or any other array.
+    storage : numpy array or None
+        Storage array holding array.
+    value : float or numpy array
+        Row to append.
+
+    Returns
+    -------
+    array : numpy array
+        The array with the value appended, a view of the first rows of storage.
+    storage : numpy array
+        Storage array, reallocated with twice the length if it was full or did not hold array.
+    """
+
+    n_rows = len(array)
+    if storage is None or array.base is not storage or len(storage) == n_rows:
+        grown = np.empty((max(2 * n_rows, 1),) + array.shape[1:], dtype=array.dtype)
+        grown[:n_rows] = array
+        storage = grown
+    storage[n_rows] = value
+    return storage[:n_rows + 1], storage
 
 
 class Geom:
@@ -7,8 +39,12 @@ class Geom:
 
     Attributes
     ----------
-        method : string, either 'random' or 'file'
+        method : string, either 'random', 'file' or 'array'
             Method of generating initial state.
+        precision : string, either 'double' or 'mixed'
+            Storage precision of the coordinates, float64 for 'double' and float32 for 'mixed'.
+        dtype : numpy dtype
+            Data type of the coordinates.
         **kwargs : See Below
 
     Keyword Arguments
@@ -19,26 +55,47 @@ class Geom:
             Number of particles to generate.
         box_length : integer or float
             Length of box to generate.
+        rng : numpy Generator
+            Random number generator used to place the particles with method 'random'.
+        frame : integer
+            Frame read from a binary trajectory file.
+        coordinates : numpy array (N x 3)
+            Coordinates of the particles with method 'array'.
 
     Methods
     -------
+        from_arrays :
+            Create a Geom holding given coordinates in a box of given length.
         generate_initial_state :
             Generate initial coordinates of particles in a box either randomly or based on a file.
         minimum_image_distance : 
             Calculate minimum image distance between two particles, i and j.
         wrap :
             Wrap a vector back to periodic box.
+        build_cell_list :
+            Build a cell-list spatial index over the particle coordinates.
+        move_particle :
+            Move a particle to a new position, keeping the cell list up to date.
+        add_particle :
+            Add a particle at the end of the coordinates.
+        remove_particle :
+            Remove a particle, moving the last particle into its place.
+        scale_box :
+            Scale the box and all the coordinates to a new box length.
         save_state :
             Save current simulation state into a txt file. First line is box dimension, second line is number of particles, and the rest are particle coordinates.
     """
-    def __init__(self, method, **kwargs):
+    def __init__(self, method, precision='double', **kwargs):
         """
         The constructor for Geom class.
 
         Parameters
         ----------
-            method : string, either 'random' or 'file'
+            method : string, either 'random', 'file' or 'array'
                 Method of generating initial state.
+            precision : string, either 'double' or 'mixed', default to 'double'
+                Storage precision of the coordinates. With 'mixed' the coordinates are stored in float32, so the
+                distance and potential kernels run in float32, while energies are still accumulated in float64.
             **kwargs : See Below
 
         Keyword Arguments
@@ -49,24 +106,69 @@ class Geom:
                 Number of particles to generate.
             box_length : integer or float
                 Length of box to generate.
+            rng : numpy Generator, optional
+                Random number generator used to place the particles with method 'random'. The global NumPy random
+                state is used if it is not given.
+            frame : integer, optional
+                Frame read from a binary trajectory file with method 'file', default to the last frame.
+            coordinates : numpy array (N x 3)
+                Coordinates of the particles with method 'array', copied in the storage precision.
         """
 
+        if precision == 'double':
+            self.dtype = np.dtype(np.float64)
+        elif precision == 'mixed':
+            self.dtype = np.dtype(np.float32)
+        else:
+            raise ValueError("precision must be either 'double' or 'mixed'")
+        self.precision = precision
+        self.cell_list = None
+        self._storage = None
         self.generate_initial_state(method, **kwargs)
 
+    @classmethod
+    def from_arrays(cls, box_length, coordinates, precision='double'):
+        """
+        Create a Geom holding given coordinates in a box of given length, for example to restore a saved state.
+
+        Parameters
+        ----------
+        box_length : integer or float
+            Length of the periodic box.
+        coordinates : numpy array (N x 3)
+            Coordinates of the particles, copied in the storage precision.
+        precision : string, either 'double' or 'mixed', default to 'double'
+            Storage precision of the coordinates.
+
+        Returns
+        -------
+        geom : Geom
+            Geom holding the coordinates.
+        """
+
+        return cls('array', precision=precision, box_length=box_length, coordinates=coordinates)
+
     def generate_initial_state(self, method, **kwargs):
         """
         Generate initial coordinates of particles in a box either randomly or based on a file.
 
         Parameters
         ----------
-        method : string, either 'random' or 'file'
+        method : string, either 'random', 'file' or 'array'
             Method of generating initial state.
         file_name : string
-            Name of file used to generate initial state.
+            Name of file used to generate initial state, either a text configuration, a binary trajectory written
+            by TrajectoryWriter or a checkpoint written by MC.checkpoint.
         num_particles : integer
             Number of particles to generate.
         box_length : integer or float
             Length of box to generate.
+        rng : numpy Generator, optional
+            Random number generator used to place the particles with method 'random'.
+        frame : integer, optional
+            Frame read from a binary trajectory file, default to the last frame.
+        coordinates : numpy array (N x 3)
+            Coordinates of the particles with method 'array'.
 
         Returns
         -------
@@ -74,26 +176,34 @@ class Geom:
             Array of particle coordinates generated for an initial state
         """
 
-        if method is 'random':
+        if method == 'random':
             if (kwargs['num_particles'] == None or kwargs['reduced_den'] == None):
                 raise ValueError(' "num_particles" and "reduced_den" arguments must be set for method=random!')
             self.num_particles = kwargs['num_particles']
-            self.box_length = np.cbrt(self.num_particles / kwargs['reduced_den'])
+            self.box_length = float(np.cbrt(self.num_particles / kwargs['reduced_den']))
             self.volume = self.box_length**3
-            self.coordinates = (0.5 - np.random.rand(self.num_particles, 3)) * self.box_length
+            if kwargs.get('rng') is not None:
+                uniforms = kwargs['rng'].random((self.num_particles, 3))
+            else:
+                uniforms = np.random.rand(self.num_particles, 3)
+            self.coordinates = ((0.5 - uniforms) * self.box_length).astype(self.dtype)
 
-        elif method is 'file':
-            if (kwargs['file_name'] == None):
+        elif method == 'file':
+            if (kwargs.get('file_name') == None):
                 raise ValueError('"filename" argument must be set for method = file!')
-            file_name = kwargs['file_name']
-            with open(file_name) as f:
-                lines = f.readlines()
-                self.box_length = np.fromstring(lines[0], dtype=float, sep=',')[0]
-                self.volume = self.box_length**3
-                self.num_particles = np.fromstring(lines[1], dtype=float, sep=',')[0]
-            self.coordinates = np.loadtxt(file_name, skiprows=2, usecols=(1, 2, 3))
-            if (self.num_particles != self.coordinates.shape[0]):
-                raise ValueError('Inconsistent value of number of particles in file!')
+            self.coordinates, self.box_length = read_configuration(kwargs['file_name'],
+                                                                   dtype=self.dtype,
+                                                                   frame=kwargs.get('frame', -1))
+            self.volume = self.box_length**3
+            self.num_particles = len(self.coordinates)
+
+        elif method == 'array':
+            if kwargs.get('coordinates') is None or kwargs.get('box_length') is None:
+                raise ValueError('"coordinates" and "box_length" arguments must be set for method = array!')
+            self.coordinates = np.array(kwargs['coordinates'], dtype=self.dtype).reshape(-1, 3)
+            self.box_length = float(kwargs['box_length'])
+            self.volume = self.box_length**3
+            self.num_particles = len(self.coordinates)
 
         else:
             raise TypeError('Method type not recognized.')
@@ -136,6 +246,116 @@ class Geom:
         wrapped_v = v - self.box_length * np.round(v / self.box_length)
         return wrapped_v
 
+    def build_cell_list(self, cell_width):
+        """
+        Build a cell-list spatial index over the particle coordinates.
+
+        Parameters
+        ----------
+        cell_width : integer or float
+            Minimum length of a cell, usually the cutoff distance of the potential.
+
+        Returns
+        -------
+        cell_list : CellList
+            The cell list, also stored as the cell_list attribute.
+        """
+
+        self.cell_list = CellList(self.coordinates, self.box_length, cell_width)
+        return self.cell_list
+
+    def move_particle(self, i_particle, new_coordinate):
+        """
+        Move a particle to a new position, keeping the cell list up to date.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle to move.
+        new_coordinate : numpy array (3)
+            New position of the particle.
+
+        Returns
+        -------
+        None
+        """
+
+        self.coordinates[i_particle, :] = new_coordinate
+        if self.cell_list is not None:
+            self.cell_list.move(i_particle, new_coordinate)
+
+    def add_particle(self, position):
+        """
+        Add a particle at the end of the coordinates.
+
+        The coordinates are a view of the first num_particles rows of a larger storage array, whose capacity
+        doubles when it is full, so an insertion does not reallocate the coordinates.
+
+        Parameters
+        ----------
+        position : numpy array (3)
+            Position of the new particle.
+
+        Returns
+        -------
+        i_particle : integer
+            Index of the new particle.
+        """
+
+        self.coordinates, self._storage = _append(self.coordinates, self._storage, position)
+        i_particle = len(self.coordinates) - 1
+        self.num_particles += 1
+        if self.cell_list is not None:
+            self.cell_list.insert(i_particle, position)
+        return i_particle
+
+    def remove_particle(self, i_particle):
+        """
+        Remove a particle, moving the last particle into its place.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle to remove.
+
+        Returns
+        -------
+        last : integer
+            Former index of the particle now stored at i_particle, equal to i_particle if the last particle was
+            removed.
+        """
+
+        last = len(self.coordinates) - 1
+        if self.cell_list is not None:
+            self.cell_list.delete(i_particle, last)
+        self.coordinates[i_particle] = self.coordinates[last]
+        self.coordinates = self.coordinates[:last]
+        self.num_particles -= 1
+        return last
+
+    def scale_box(self, box_length):
+        """
+        Scale the box and all the coordinates to a new box length.
+
+        The positions relative to the box are unchanged, and the cell list, if any, is built again for the new box
+        with the same minimum cell width.
+
+        Parameters
+        ----------
+        box_length : float
+            New length of the box.
+
+        Returns
+        -------
+        None
+        """
+
+        self.coordinates *= box_length / self.box_length
+        self.box_length = float(box_length)
+        self.volume = self.box_length**3
+        if self.cell_list is not None:
+            self.build_cell_list(self.cell_list.cell_width)
+
     def get_particle_coordinates(self):
         """
         Get the coordinates of all particles in the system.
@@ -0,0 +1,126 @@
+"""
+Compiled energy kernels for the 'numba' backend of Energy.
+
+Numba is an optional dependency: if it is not installed, numba_available is False and Energy falls back to the
+NumPy backend. Every kernel takes the pair potential as a compiled function of the squared distance returning
+the pair energy and virial, so the distance loop and the potential are fused in a single pass without temporaries.
+"""
+
+import numpy as np
+
+try:
+    import numba
+    numba_available = True
+except ImportError:
+    numba = None
+    numba_available = False
+
+
+if numba_available:
+
+    @numba.njit(cache=True)
+    def _minimum_image_distance2(r_i, r_j, box_length):
+        """
+        Square of the minimum image distance between two positions.
+        """
+
+        rij2 = 0.0
+        for axis in range(3):
+            rij = r_i[axis] - r_j[axis]
+            rij -= box_length * np.round(rij / box_length)
+            rij2 += rij * rij
+        return rij2
+
+    @numba.njit
+    def particle_energy(r_i, coordinates, i_particle, partners, scan_all, box_length, cutoff2, potential):
+        """
+        Energy of particle i placed at r_i with its partners, or with every other particle if scan_all is True.
+        """
+
+        e_total = 0.0
+        n_candidates = len(coordinates) if scan_all else len(partners)
+        for k in range(n_candidates):
+            j_particle = k if scan_all else partners[k]
+            if j_particle == i_particle:
+                continue
+            rij2 = _minimum_image_distance2(r_i, coordinates[j_particle], box_length)
+            if rij2 < cutoff2:
+                e_total += potential(rij2)[0]
+        return e_total
+
+    @numba.njit
+    def pair_terms(r_i, coordinates, i_particle, partners, scan_all, box_length, cutoff2, potential):
+        """
+        Partners of particle i placed at r_i within the cutoff and their pair energies and virials, looking at every
+        other particle if scan_all is True.
+        """
+
+        n_candidates = len(coordinates) if scan_all else len(partners)
+        found = np.empty(n_candidates, dtype=np.intp)
+        energies = np.empty(n_candidates)
+        virials = np.empty(n_candidates)
+        n_found = 0
+        for k in range(n_candidates):
+            j_particle = k if scan_all else partners[k]
+            if j_particle == i_particle:
+                continue
+            rij2 = _minimum_image_distance2(r_i, coordinates[j_particle], box_length)
+            if rij2 < cutoff2:
+                found[n_found] = j_particle
+                energies[n_found], virials[n_found] = potential(rij2)
+                n_found += 1
+        return found[:n_found], energies[:n_found], virials[:n_found]
+
+    @numba.njit
+    def bounded_pair_terms(r_i, coordinates, i_particle, partners, scan_all, box_length, cutoff2, far_bound,
+                           max_energy, potential):
+        """
+        Same as pair_terms, but the evaluation stops as soon as the energy of the pairs visited so far, plus
+        far_bound for every candidate left, exceeds max_energy, so the candidates should come nearest first. The
+        last two outputs tell whether it stopped early, in which case the partner arrays are empty, and how many
+        candidates were visited.
+        """
+
+        n_candidates = len(coordinates) if scan_all else len(partners)
+        found = np.empty(n_candidates, dtype=np.intp)
+        energies = np.empty(n_candidates)
+        virials = np.empty(n_candidates)
+        n_found = 0
+        e_seen = 0.0
+        for k in range(n_candidates):
+            j_particle = k if scan_all else partners[k]
+            if j_particle != i_particle:
+                rij2 = _minimum_image_distance2(r_i, coordinates[j_particle], box_length)
+                if rij2 < cutoff2:
+                    found[n_found] = j_particle
+                    energies[n_found], virials[n_found] = potential(rij2)
+                    e_seen += energies[n_found]
+                    n_found += 1
+            if e_seen + (n_candidates - k - 1) * far_bound > max_energy:
+                return found[:0], energies[:0], virials[:0], True, k + 1
+        return found[:n_found], energies[:n_found], virials[:n_found], False, n_candidates
+
+    @numba.njit
+    def total_pair_energy(coordinates, box_length, cutoff2, potential):
+        """
+        Total pair energy and virial over every pair of particles, computed once each, and the energy and virial of
+        every particle.
+        """
+
+        num_particles = len(coordinates)
+        particle_energies = np.zeros(num_particles)
+        particle_virials = np.zeros(num_particles)
+        e_total = 0.0
+        w_total = 0.0
+        for i_particle in range(num_particles - 1):
+            for j_particle in range(i_particle + 1, num_particles):
+                rij2 = _minimum_image_distance2(coordinates[i_particle], coordinates[j_particle], box_length)
+                if rij2 < cutoff2:
+                    pot, vir = potential(rij2)
+                    e_total += pot
+                    w_total += vir
+                    particle_energies[i_particle] += pot
+                    particle_energies[j_particle] += pot
+                    particle_virials[i_particle] += vir
+                    particle_virials[j_particle] += vir
+        return e_total, w_total, particle_energies, particle_virials
@@ -1,8 +1,16 @@
+import contextlib
+import copy
+import json
 import os
 import numpy as np
 import time
 from .geom import Geom
 from .energy import Energy
+from .potentials import get_potential
+from .rng import RandomStream
+from .output import AsyncWriter, SyncWriter
+from .formats import DCDWriter, PDBWriter, XYZWriter
+from .trajectory import TrajectoryWriter
 import matplotlib.pyplot as plt
 
 
@@ -28,8 +36,43 @@ class MC:
             If True the magnitude of displacement is adjusted base on acceptance rate. 
         reduced_den : float
             Reduced density given system density and sigma value. 
+        neighbor_method : string
+            How the energy of a particle finds its partners, either 'all', 'cell' or 'verlet'.
+        skin : float
+            Skin distance of the Verlet neighbor lists.
+        backend : string
+            Implementation of the energy kernels, either 'numpy' or 'numba'.
+        potential : string or PairPotential
+            Pair potential of the system.
+        precision : string
+            Precision of the coordinates and energy kernels, either 'double' or 'mixed'.
+        seed : integer, numpy SeedSequence or None
+            Seed of the random number stream of the simulation.
+        early_rejection : Boolean
+            If True the acceptance test is drawn before the energy evaluation, which stops as soon as the move is
+            bound to be rejected.
+        schedule : string
+            Either 'step', moving a random particle every step, or 'sweep', moving every particle once per sweep.
+        move_mix : dict
+            Relative frequencies of the move types, 'single', 'cluster' and 'subset'.
+        cluster_radius : float
+            Radius of the spatial clusters moved by 'cluster' moves.
+        subset_size : int
+            Number of particles moved by 'subset' moves.
+        reduced_pressure : float or None
+            Reduced pressure of the isothermal-isobaric ensemble, or None for a constant volume.
+        max_volume_change : float
+            Largest change of ln V in a volume move.
+        chemical_potential : float or None
+            Reduced chemical potential of the grand canonical ensemble, or None for a constant number of particles.
+        exchange_probability : float
+            Fraction of the moves that are insertions or deletions in the grand canonical ensemble.
+        widom_interval : int or None
+            Number of steps, or sweeps, between two samples of Widom test-particle insertions.
+        widom_insertions : int
+            Number of test particles inserted in every Widom sample.
         performance : float
-            Performance of simulation in seconds / per step
+            Performance of simulation in seconds / per step, or per sweep if schedule is 'sweep'
 
     Methods
     -------
@@ -37,6 +80,20 @@ class MC:
             Execute the MC simulation and trigger other output related functionality.
         save_snapshot :
             Obtain the current snapshot stored as a Geom object.
+        get_particle_energies :
+            Get the current interaction energy of every particle.
+        checkpoint :
+            Save the full state of the simulation to a binary checkpoint file.
+        from_checkpoint :
+            Restore a simulation saved by checkpoint.
+        get_pressure :
+            Get the current pressure trace.
+        get_volume :
+            Get the current volume trace.
+        get_num_particles :
+            Get the current trace of the number of particles.
+        get_chemical_potential :
+            Get the excess chemical potential estimated from the Widom test-particle insertions.
         plot : 
             Create an energy plot and optionally save it in png format.
     """
@@ -48,16 +105,38 @@ class MC:
                  num_particles=None,
                  file_name=None,
                  tune_displacement=True,
-                 reduced_den=None):
+                 reduced_den=None,
+                 neighbor_method='all',
+                 skin=0.5,
+                 backend='numpy',
+                 potential='lj',
+                 potential_params=None,
+                 precision='double',
+                 seed=None,
+                 early_rejection=False,
+                 schedule='step',
+                 move_mix=None,
+                 cluster_radius=1.2,
+                 subset_size=4,
+                 reduced_pressure=None,
+                 max_volume_change=0.01,
+                 volume_skin=0.3,
+                 chemical_potential=None,
+                 exchange_probability=0.1,
+                 widom_interval=None,
+                 widom_insertions=1000,
+                 coordinates=None,
+                 box_length=None):
         """
         Initialize a MC simulation object
 
         Parameters
         ----------
-        method : string, either 'random' or 'file'
+        method : string, either 'random', 'file' or 'array'
             Method to initialize system.
             random: Randomly create initial configuration.
             file: Initialize system by reading from a file.
+            array: Initialize system from the coordinates and box_length arguments.
         reduced_temp : float
             Reduced temperature at which the simulation will run.
         max_displacement : float
@@ -72,6 +151,72 @@ class MC:
             Reduced density of the system.
         file_name : string, required if method is 'file'
             Name of file from which initial configuration will be read and generated.
+        coordinates : numpy array (N x 3), required if method is 'array'
+            Initial coordinates of the particles.
+        box_length : float, required if method is 'array'
+            Length of the periodic box.
+        neighbor_method : string, either 'all', 'cell' or 'verlet', default to 'all'
+            How the energy of a particle finds its partners. 'cell' keeps a cell list sized from the cutoff, so the
+            cost of a step does not grow with the number of particles. 'verlet' keeps a list of the partners within
+            cutoff + skin for every particle, rebuilt once a particle has moved more than half the skin.
+        skin : float, default to 0.5
+            Skin distance of the Verlet neighbor lists. Only used if neighbor_method is 'verlet'.
+        backend : string, either 'numpy' or 'numba', default to 'numpy'
+            Implementation of the energy kernels. 'numba' is only used if Numba is installed, otherwise the NumPy
+            kernels are used.
+        potential : string or PairPotential, default to 'lj'
+            Pair potential, either a registered name ('lj', 'lj_shifted', 'lj_shifted_force', 'wca', 'mie' or
+            'yukawa') or a PairPotential instance. 'wca' always uses its own cutoff of 2^(1/6) sigma.
+        potential_params : dict, optional
+            Parameters of the registered potential, for example {'epsilon': 1.0, 'sigma': 1.0}.
+        precision : string, either 'double' or 'mixed', default to 'double'
+            With 'mixed', coordinates are stored and distance/potential kernels run in float32, while the total
+            pair energy and the energy trace are still accumulated in float64.
+        seed : integer, numpy SeedSequence or None, default to None
+            Seed of the random number stream used for the initial configuration, the trial moves and the acceptance
+            tests. Two simulations with the same seed and parameters produce identical runs.
+        early_rejection : Boolean, default to False
+            Whether to draw the Metropolis uniform before the energy evaluation and turn it into the largest energy
+            change that can be accepted. The repulsive overlaps of the proposed position are then evaluated first,
+            and the rest of the evaluation is skipped if they already make acceptance impossible. The acceptance
+            probability of every move is unchanged.
+        schedule : string, either 'step' or 'sweep', default to 'step'
+            How the particles to move are chosen. With 'step', a random particle is moved every step. With 'sweep',
+            every step of run is a sweep visiting all the particles once in random order, and the energy trace,
+            acceptance counters, log and displacement tuning are updated once per sweep.
+        move_mix : dict, optional
+            Relative frequencies of the move types, for example {'single': 0.9, 'cluster': 0.1}. 'single' displaces
+            one particle. 'cluster' rigidly translates the particles within cluster_radius of the chosen particle,
+            and is rejected if other particles would end up within cluster_radius of it, so that the reverse move
+            selects the same cluster. 'subset' displaces the chosen particle and subset_size - 1 random others
+            independently. Default to single-particle moves only.
+        cluster_radius : float, default to 1.2
+            Radius of the spatial clusters moved by 'cluster' moves.
+        subset_size : int, default to 4
+            Number of particles moved by 'subset' moves.
+        reduced_pressure : float, optional
+            If given, the simulation samples the isothermal-isobaric ensemble at this reduced pressure. On average
+            one step in num_particles, and once per sweep with schedule 'sweep', is a volume move scaling the box and
+            all the coordinates by a random change of ln V. Default to a constant volume.
+        max_volume_change : float, default to 0.01
+            Largest change of ln V in a volume move.
+        volume_skin : float, default to 0.3
+            Half width of the shell of pairs around the cutoff tracked to find the pairs crossing the cutoff in
+            volume moves.
+        chemical_potential : float, optional
+            If given, the simulation samples the grand canonical ensemble at this reduced chemical potential, with
+            insertions and deletions of particles accepted from the activity z = exp(beta mu). A fraction
+            exchange_probability of the steps are exchange moves, and with schedule 'sweep' every sweep is followed
+            by exchange_probability * N of them. Not supported with neighbor_method 'verlet'. Default to a constant
+            number of particles.
+        exchange_probability : float, default to 0.1
+            Fraction of the moves that are insertions or deletions, each with the same probability.
+        widom_interval : int, optional
+            If given, every widom_interval steps, or sweeps, widom_insertions test particles are inserted at random
+            positions, their insertion energies are calculated in one vectorised pass and the average of their
+            Boltzmann factors is recorded for get_chemical_potential. Default to no test-particle insertions.
+        widom_insertions : int, default to 1000
+            Number of test particles inserted in every Widom sample.
 
         Returns
         -------
@@ -84,21 +229,85 @@ class MC:
         self.max_displacement = max_displacement
         self.tune_displacement = tune_displacement
         self._energy_array = np.array([])
+        self._pressure_array = np.array([])
         self.current_step = 0
+        self.seed = seed
+        self._rng = RandomStream(seed)
+        self.early_rejection = early_rejection
+        if schedule not in ('step', 'sweep'):
+            raise ValueError("schedule must be either 'step' or 'sweep'")
+        self.schedule = schedule
+        self.move_mix = dict(move_mix or {'single': 1.0})
+        if not set(self.move_mix) <= {'single', 'cluster', 'subset'}:
+            raise ValueError("move_mix keys must be 'single', 'cluster' or 'subset'")
+        self._move_types = list(self.move_mix)
+        self._move_cdf = np.cumsum([self.move_mix[move] for move in self._move_types], dtype=float)
+        self._move_cdf /= self._move_cdf[-1]
+        self.cluster_radius = cluster_radius
+        self.subset_size = subset_size
+        self._n_collective_trials = 0
+        self._n_collective_accept = 0
+        self.reduced_pressure = reduced_pressure
+        self.max_volume_change = max_volume_change
+        self._n_volume_trials = 0
+        self._n_volume_accept = 0
+        self._volume_array = np.array([])
+        if chemical_potential is not None and neighbor_method == 'verlet':
+            raise ValueError("The grand canonical ensemble is not supported with neighbor_method='verlet'.")
+        self.chemical_potential = chemical_potential
+        self.exchange_probability = exchange_probability
+        self._n_exchange_trials = 0
+        self._n_exchange_accept = 0
+        self._num_particles_array = np.array([], dtype=np.intp)
+        self.widom_interval = widom_interval
+        self.widom_insertions = widom_insertions
+        self._widom_array = np.array([])
 
         if method == 'random':
-            self._Geom = Geom(method, num_particles=num_particles, reduced_den=reduced_den)
+            self._Geom = Geom(method,
+                              precision=precision,
+                              num_particles=num_particles,
+                              reduced_den=reduced_den,
+                              rng=self._rng.generator)
         elif method == 'file':
-            self._Geom = Geom(method, file_name=file_name)
+            self._Geom = Geom(method, precision=precision, file_name=file_name)
+        elif method == 'array':
+            self._Geom = Geom.from_arrays(box_length, coordinates, precision=precision)
         else:
-            raise ValueError("Method must be either 'file' or 'random'")
+            raise ValueError("Method must be either 'file', 'random' or 'array'")
 
-        if reduced_den < 0.0 or reduced_temp < 0.0:
+        if (reduced_den is not None and reduced_den < 0.0) or reduced_temp < 0.0:
             raise ValueError("reduced temperature and density must be greater than zero.")
 
-        self._Energy = Energy(self._Geom, cutoff)
+        self._Energy = Energy(self._Geom,
+                              cutoff,
+                              neighbor_method=neighbor_method,
+                              skin=skin,
+                              volume_skin=volume_skin,
+                              backend=backend,
+                              potential=potential,
+                              potential_params=potential_params)
 
-    def _accept_or_reject(self, delta_e):
+    def _acceptance_threshold(self):
+        """
+        Draw the Metropolis uniform ahead of a move and turn it into the largest energy change that is accepted.
+
+        Parameters
+        ----------
+        None
+
+        Return
+        ------
+        max_delta_e : float
+            -ln(u) / beta for a uniform u, since u < exp(-beta delta_e) exactly when delta_e < -ln(u) / beta.
+        """
+
+        random_number = self._rng.uniform()
+        if random_number == 0.0:
+            return np.inf
+        return -np.log(random_number) / self.beta
+
+    def _accept_or_reject(self, delta_e, max_delta_e=None):
         """
         Test to decide if move is accepted or rejected given the energy differece between previous and current step
 
@@ -106,6 +315,9 @@ class MC:
         ----------
         delta_e : float
             energy difference between previous and current steps.
+        max_delta_e : float, optional
+            Acceptance threshold drawn beforehand by _acceptance_threshold. If it is not given, the uniform is only
+            drawn for moves raising the energy.
 
         Return
         ------
@@ -113,10 +325,12 @@ class MC:
             If the delta_e passes the criteria, the move is accepted
         """
 
+        if max_delta_e is not None:
+            return delta_e < max_delta_e
         if delta_e < 0.0:
             accept = True
         else:
-            random_number = np.random.rand(1)
+            random_number = self._rng.uniform()
             p_acc = np.exp(-self.beta * delta_e)
             if random_number < p_acc:
                 accept = True
@@ -146,6 +360,284 @@ class MC:
         self._n_trials = 0
         self._n_accept = 0
 
+    def _attempt_move(self, i_particle):
+        """
+        Attempt a random displacement of one particle, moving it if the move is accepted.
+
+        Parameters
+        ----------
+        i_particle : int
+            Index of the particle to move.
+
+        Returns
+        -------
+        accept : Boolean
+            Whether the move was accepted.
+        delta_e : float
+            Energy change of the move.
+        delta_w : float
+            Virial change of the move.
+        """
+
+        random_displacement = self._rng.displacement() * self.max_displacement
+        old_coordinate = self._Geom.coordinates[i_particle, :]
+        proposed_coordinate = self._Geom.wrap(old_coordinate + random_displacement).astype(self._Geom.dtype)
+
+        max_delta_e = self._acceptance_threshold() if self.early_rejection else None
+        delta_e, delta_w = self._Energy.get_delta_energy(i_particle,
+                                                         old_coordinate,
+                                                         proposed_coordinate,
+                                                         virial=True,
+                                                         max_delta_e=max_delta_e)
+        accept = self._accept_or_reject(delta_e, max_delta_e)
+        if accept:
+            self._Energy.update_particle(i_particle, proposed_coordinate)
+        return accept, delta_e, delta_w
+
+    def _cluster_members(self, position):
+        """
+        Find the particles within cluster_radius of a position.
+
+        Parameters
+        ----------
+        position : numpy array (3)
+            Center of the cluster.
+
+        Returns
+        -------
+        indices : numpy array
+            Sorted indices of the particles within cluster_radius of the position.
+        """
+
+        coordinates = self._Geom.coordinates
+        if self._Geom.cell_list is not None and self.cluster_radius <= self._Energy.cutoff:
+            candidates = self._Geom.cell_list.get_neighbors(position)
+        else:
+            candidates = np.arange(len(coordinates))
+        rij2 = self._Geom.minimum_image_distance(position, coordinates[candidates])
+        return np.sort(candidates[rij2 < self.cluster_radius**2])
+
+    def _attempt_collective_move(self, move_type, i_particle):
+        """
+        Attempt a collective displacement of a set of particles, moving them if the move is accepted.
+
+        Parameters
+        ----------
+        move_type : string, either 'cluster' or 'subset'
+            Kind of collective move.
+        i_particle : int
+            Index of the chosen particle, the center of the cluster or the first member of the subset.
+
+        Returns
+        -------
+        accept : Boolean
+            Whether the move was accepted.
+        delta_e : float
+            Energy change of the move.
+        delta_w : float
+            Virial change of the move.
+        """
+
+        self._n_collective_trials += 1
+        num_particles = len(self._Geom.coordinates)
+        if move_type == 'cluster':
+            indices = self._cluster_members(self._Geom.coordinates[i_particle])
+            displacements = self._rng.displacement() * self.max_displacement
+        else:
+            others = self._rng.generator.choice(num_particles - 1, min(self.subset_size, num_particles) - 1,
+                                                replace=False)
+            indices = np.concatenate([[i_particle], others + (others >= i_particle)])
+            displacements = np.array([self._rng.displacement() for _ in indices]) * self.max_displacement
+        old_coordinates = self._Geom.coordinates[indices]
+        new_coordinates = self._Geom.wrap(old_coordinates + displacements).astype(self._Geom.dtype)
+
+        if move_type == 'cluster':
+            center = new_coordinates[np.searchsorted(indices, i_particle)]
+            if not np.all(np.isin(self._cluster_members(center), indices)):
+                return False, 0.0, 0.0
+
+        delta_e, delta_w = self._Energy.get_delta_energy_collective(indices, old_coordinates, new_coordinates,
+                                                                    virial=True)
+        accept = self._accept_or_reject(delta_e)
+        if accept:
+            self._Energy.update_particles(indices, new_coordinates)
+            self._n_collective_accept += 1
+        return accept, delta_e, delta_w
+
+    def _next_move(self, i_particle):
+        """
+        Draw the type of the next move from move_mix and attempt it on a particle.
+
+        Parameters
+        ----------
+        i_particle : int
+            Index of the chosen particle.
+
+        Returns
+        -------
+        accept : Boolean
+            Whether the move was accepted.
+        delta_e : float
+            Energy change of the move.
+        delta_w : float
+            Virial change of the move.
+        """
+
+        if len(self._move_types) == 1:
+            move_type = self._move_types[0]
+        else:
+            move_type = self._move_types[np.searchsorted(self._move_cdf, self._rng.uniform(), side='right')]
+        if move_type == 'single':
+            return self._attempt_move(i_particle)
+        return self._attempt_collective_move(move_type, i_particle)
+
+    def _attempt_volume_move(self, total_pair_energy, total_virial):
+        """
+        Attempt a random change of ln V, scaling the box and all the coordinates if the move is accepted.
+
+        The move is accepted with probability min(1, exp(-beta (delta_U + P delta_V) + (N + 1) ln(V_new / V_old))),
+        where delta_U includes the change of the tail correction.
+
+        Parameters
+        ----------
+        total_pair_energy : float
+            Current sum of all the pair energies.
+        total_virial : float
+            Current sum of all the pair virials.
+
+        Returns
+        -------
+        accept : Boolean
+            Whether the move was accepted.
+        delta_e : float
+            Change of the total pair energy.
+        delta_w : float
+            Change of the total pair virial.
+        """
+
+        self._n_volume_trials += 1
+        ln_volume_change = (2.0 * self._rng.uniform() - 1.0) * self.max_volume_change
+        old_volume = self._Geom.volume
+        new_box_length = float(np.cbrt(old_volume * np.exp(ln_volume_change)))
+        if new_box_length < 2.0 * self._Energy.cutoff:
+            return False, 0.0, 0.0
+        new_volume = new_box_length**3
+
+        delta_e, delta_w = self._Energy.get_volume_delta_energy(new_box_length, total_pair_energy, total_virial)
+        num_particles = self._Geom.num_particles
+        potential = self._Energy.potential
+        delta_tail = (potential.tail_correction(num_particles, new_volume) -
+                      potential.tail_correction(num_particles, old_volume))
+        delta_h = (delta_e + delta_tail + self.reduced_pressure * (new_volume - old_volume) -
+                   (num_particles + 1) * np.log(new_volume / old_volume) / self.beta)
+        accept = self._accept_or_reject(delta_h)
+        if accept:
+            self._Energy.scale_volume(new_box_length)
+            self._n_volume_accept += 1
+        return accept, delta_e, delta_w
+
+    def _attempt_exchange_move(self):
+        """
+        Attempt the insertion of a particle at a random position or the deletion of a random particle, with equal
+        probabilities.
+
+        With the activity z = exp(beta mu), an insertion is accepted with probability
+        min(1, z V / (N + 1) exp(-beta delta_U)) and a deletion with probability min(1, N / (z V) exp(-beta delta_U)),
+        where delta_U includes the change of the tail correction.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        accept : Boolean
+            Whether the move was accepted.
+        delta_e : float
+            Change of the total pair energy.
+        delta_w : float
+            Change of the total pair virial.
+        """
+
+        self._n_exchange_trials += 1
+        num_particles = self._Geom.num_particles
+        volume = self._Geom.volume
+        potential = self._Energy.potential
+        if self._rng.uniform() < 0.5:
+            position = (0.5 * self._Geom.box_length * self._rng.displacement()).astype(self._Geom.dtype)
+            delta_e, delta_w = self._Energy.get_insertion_energy(position)
+            delta_tail = (potential.tail_correction(num_particles + 1, volume) -
+                          potential.tail_correction(num_particles, volume))
+            delta_h = (delta_e + delta_tail - self.chemical_potential -
+                       np.log(volume / (num_particles + 1)) / self.beta)
+            accept = self._accept_or_reject(delta_h)
+            if accept:
+                self._Energy.insert_particle(position)
+        else:
+            if num_particles == 0:
+                return False, 0.0, 0.0
+            i_particle = self._rng.particle_index(num_particles)
+            delta_e, delta_w = self._Energy.get_deletion_energy(i_particle)
+            delta_tail = (potential.tail_correction(num_particles - 1, volume) -
+                          potential.tail_correction(num_particles, volume))
+            delta_h = delta_e + delta_tail + self.chemical_potential - np.log(num_particles / volume) / self.beta
+            accept = self._accept_or_reject(delta_h)
+            if accept:
+                self._Energy.remove_particle(i_particle)
+        if accept:
+            self._n_exchange_accept += 1
+        return accept, delta_e, delta_w
+
+    def _sample_widom(self):
+        """
+        Insert widom_insertions test particles at random positions and record the average of their Boltzmann
+        factors.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        num_particles = self._Geom.num_particles
+        volume = self._Geom.volume
+        uniforms = self._rng.generator.random((self.widom_insertions, 3))
+        positions = ((uniforms - 0.5) * self._Geom.box_length).astype(self._Geom.dtype)
+        energies = self._Energy.get_insertion_energies(positions)
+        potential = self._Energy.potential
+        energies += (potential.tail_correction(num_particles + 1, volume) -
+                     potential.tail_correction(num_particles, volume))
+        self._widom_array = np.append(self._widom_array, np.mean(np.exp(-self.beta * energies)))
+
+    def _density_terms(self):
+        """
+        Calculate the terms of the energy and pressure that only depend on the volume and the number of particles.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        tail_correction : float
+            Tail correction of the energy.
+        pressure_tail_correction : float
+            Tail correction of the pressure.
+        ideal_pressure : float
+            Ideal gas pressure rho T.
+        virial_factor : float
+            Factor 1 / (3 V) turning the pair virial into its pressure contribution.
+        """
+
+        tail_correction = self._Energy.calculate_tail_correction()
+        pressure_tail_correction = self._Energy.calculate_pressure_tail_correction()
+        ideal_pressure = self._Geom.num_particles / self._Geom.volume / self.beta
+        virial_factor = 1.0 / (3.0 * self._Geom.volume)
+        return tail_correction, pressure_tail_correction, ideal_pressure, virial_factor
+
     def get_energy(self):
         """
         Get the current energy trace.
@@ -164,6 +656,100 @@ class MC:
             raise ValueError("Simulation has not started running!")
         return self._energy_array
 
+    def get_pressure(self):
+        """
+        Get the current pressure trace.
+
+        The pressure of every step is the ideal gas term plus the pair virial, P = rho T + W / (3 V), with the
+        tail correction of the potential added.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        1d Numpy array of current pressure trace.
+
+        """
+
+        if (len(self._pressure_array) == 0):
+            raise ValueError("Simulation has not started running!")
+        return self._pressure_array
+
+    def get_volume(self):
+        """
+        Get the current volume trace.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        1d Numpy array of the volume of the box at every step.
+
+        """
+
+        if (len(self._volume_array) == 0):
+            raise ValueError("Simulation has not started running!")
+        return self._volume_array
+
+    def get_num_particles(self):
+        """
+        Get the current trace of the number of particles.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        1d Numpy array of the number of particles at every step.
+
+        """
+
+        if (len(self._num_particles_array) == 0):
+            raise ValueError("Simulation has not started running!")
+        return self._num_particles_array
+
+    def get_chemical_potential(self):
+        """
+        Get the excess chemical potential estimated from the Widom test-particle insertions.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        mu_excess : float
+            -ln(<exp(-beta delta_U)>) / beta, averaged over all the test particles inserted so far.
+
+        """
+
+        if (len(self._widom_array) == 0):
+            raise ValueError("No Widom insertions have been sampled!")
+        return -np.log(np.mean(self._widom_array)) / self.beta
+
+    def get_particle_energies(self):
+        """
+        Get the current interaction energy of every particle.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        1d Numpy array of the interaction energy of each particle with the rest of the system.
+
+        """
+
+        if (self._Energy.particle_energies is None):
+            raise ValueError("Simulation has not started running!")
+        return self._Energy.particle_energies
+
     def get_snapshot(self):
         """
         Obtain the current snapshot stored as a Geom object.
@@ -195,20 +781,196 @@ class MC:
         """
         self._Geom.save_state(file_name)
 
-    def run(self, n_steps, freq, save_dir='./results', save_snaps=False):
+    def _checkpoint_objects(self):
+        """
+        Get the objects holding the state saved in a checkpoint, with the names of their saved attributes.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        objects : dict
+            Maps a prefix to a tuple (object, attribute names), for every object of the simulation that exists.
+        """
+
+        objects = {
+            'mc': (self, [
+                'beta', 'max_displacement', 'current_step', '_n_trials', '_n_accept', '_n_collective_trials',
+                '_n_collective_accept', '_n_volume_trials', '_n_volume_accept', '_n_exchange_trials',
+                '_n_exchange_accept', '_energy_array', '_pressure_array', '_volume_array', '_num_particles_array',
+                '_widom_array'
+            ] + (['freq'] if hasattr(self, 'freq') else [])),
+            'geom': (self._Geom, ['coordinates', 'box_length', 'volume', 'num_particles']),
+            'rng': (self._rng, [
+                '_index_uniforms', '_displacements', '_uniforms', '_next_index', '_next_displacement', '_next_uniform'
+            ]),
+            'cell_list': (self._Geom.cell_list, ['counts', 'cell_of', 'slot_of']),
+            'verlet': (self._Energy._verlet, ['partners', 'offsets', 'reference', 'max_displacement', 'n_builds']),
+            'shell': (self._Energy._shell,
+                      ['pairs_i', 'pairs_j', 'reference', '_inner', '_outer', 'max_displacement', 'n_builds']),
+        }
+        return {prefix: entry for prefix, entry in objects.items() if entry[0] is not None}
+
+    def checkpoint(self, path):
+        """
+        Save the full state of the simulation to a binary checkpoint file.
+
+        The checkpoint holds the settings of the simulation, the coordinates, the state and pre-drawn blocks of the
+        random number stream, the neighbor structures, the counters and the traces, so that a simulation restored
+        with from_checkpoint continues exactly like this one would. Arrays are stored uncompressed in a single .npz
+        container, and the file is written next to path first and then renamed, so an interrupted write never
+        leaves a corrupt checkpoint behind. The pair potential is stored by its registry name and parameters and
+        rebuilt with potentials.get_potential, so the file holds no pickled objects and loading it runs no code
+        from it; potentials outside the registry cannot be checkpointed and raise a ValueError.
+
+        Parameters
+        ----------
+        path : string
+            Name of the checkpoint file.
+
+        Returns
+        -------
+        None
+        """
+
+        bit_generator = self._rng.generator.bit_generator
+        seed_sequence = self._rng.seed_sequence
+        potential = self._Energy.potential
+        metadata = {
+            'settings': {
+                'max_displacement': float(self.max_displacement),
+                'cutoff': float(self._Energy.cutoff),
+                'tune_displacement': self.tune_displacement,
+                'neighbor_method': self._Energy.neighbor_method,
+                'skin': self._Energy.skin,
+                'backend': self._Energy.backend,
+                'precision': self._Geom.precision,
+                'early_rejection': self.early_rejection,
+                'schedule': self.schedule,
+                'move_mix': self.move_mix,
+                'cluster_radius': self.cluster_radius,
+                'subset_size': self.subset_size,
+                'reduced_pressure': self.reduced_pressure,
+                'max_volume_change': self.max_volume_change,
+                'volume_skin': self._Energy.volume_skin,
+                'chemical_potential': self.chemical_potential,
+                'exchange_probability': self.exchange_probability,
+                'widom_interval': self.widom_interval,
+                'widom_insertions': self.widom_insertions,
+            },
+            'rng': {
+                'entropy': seed_sequence.entropy,
+                'spawn_key': list(seed_sequence.spawn_key),
+                'n_children_spawned': seed_sequence.n_children_spawned,
+                'block_size': self._rng.block_size,
+                'bit_generator': bit_generator.state,
+            },
+            'potential': {
+                'name': potential.name,
+                'cutoff': float(potential.cutoff),
+                'parameters': potential.get_parameters(),
+            },
+        }
+        arrays = {'metadata': np.array(json.dumps(metadata))}
+        for prefix, (target, attributes) in self._checkpoint_objects().items():
+            for attribute in attributes:
+                arrays[f'{prefix}.{attribute}'] = np.asarray(getattr(target, attribute))
+
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def from_checkpoint(cls, path):
+        """
+        Restore a simulation saved by checkpoint.
+
+        Parameters
+        ----------
+        path : string
+            Name of the checkpoint file.
+
+        Returns
+        -------
+        sim : MC
+            Simulation in the state it was saved in, whose next run continues bit for bit like the saved one.
+        """
+
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        metadata = json.loads(str(arrays.pop('metadata')))
+        potential = get_potential(metadata['potential']['name'], metadata['potential']['cutoff'],
+                                  **metadata['potential']['parameters'])
+
+        rng = metadata['rng']
+        seed_sequence = np.random.SeedSequence(rng['entropy'],
+                                               spawn_key=tuple(rng['spawn_key']),
+                                               n_children_spawned=rng['n_children_spawned'])
+        sim = cls('array',
+                  reduced_temp=1. / float(arrays['mc.beta']),
+                  coordinates=arrays['geom.coordinates'],
+                  box_length=float(arrays['geom.box_length']),
+                  potential=potential,
+                  seed=seed_sequence,
+                  **metadata['settings'])
+        sim._rng.block_size = rng['block_size']
+        sim._rng.generator.bit_generator.state = rng['bit_generator']
+
+        if sim._Geom.cell_list is not None:
+            sim._Geom.cell_list.restore(arrays['cell_list.counts'], arrays['cell_list.cell_of'],
+                                        arrays['cell_list.slot_of'])
+        if 'shell.pairs_i' in arrays:
+            sim._Energy.build_shell_list()
+        for prefix, (target, attributes) in sim._checkpoint_objects().items():
+            if prefix in ('geom', 'cell_list'):
+                continue
+            for attribute in attributes:
+                key = f'{prefix}.{attribute}'
+                if key in arrays:
+                    value = arrays[key]
+                    setattr(target, attribute, value if value.ndim else value.item())
+        return sim
+
+    def run(self,
+            n_steps,
+            freq,
+            save_dir='./results',
+            save_snaps=False,
+            snapshot_format='txt',
+            async_output=False,
+            backpressure='block',
+            output_queue_size=64):
         """
         Execute the MC simulation and trigger other output related functionality.
 
         Parameters
         ----------
         n_steps : int
-            The number of steps for this simulation.
+            The number of steps for this simulation, or of sweeps if schedule is 'sweep'.
         freq : int
-            The frequency to update log file and generate in-screen check message.
+            The frequency, in steps or sweeps, to update log file and generate in-screen check message.
         save_dir : str
             The file path to store the result. default = './results'
         save_snaps : bool
             Whether to output snapshot.
+        snapshot_format : str, one of 'txt', 'binary', 'xyz', 'pdb' or 'dcd', default to 'txt'
+            With 'txt', every snapshot is saved to its own text file snap_<step>.txt. With 'binary', the snapshots
+            are appended as frames to save_dir/trajectory.bin, readable with trajectory.TrajectoryReader, in the
+            precision of the coordinates. With 'xyz', 'pdb' or 'dcd', they are appended to save_dir/trajectory.xyz,
+            trajectory.pdb or trajectory.dcd, see the writers of the formats module. Binary and DCD frames have a
+            fixed size, so they cannot follow a changing number of particles.
+        async_output : bool, default to False
+            Whether the log lines, console messages and snapshots of the run are written by a background thread
+            (see output.AsyncWriter), so that slow storage does not stall the simulation. The run loop only hands
+            over copies of the data, and all the pending output is written before run returns or raises.
+        backpressure : str, either 'block' or 'drop', default to 'block'
+            What the run loop does when output_queue_size outputs are already waiting with async_output. With
+            'block' it waits for the writer, with 'drop' the output is skipped and counted.
+        output_queue_size : int, default to 64
+            Largest number of outputs waiting to be written with async_output.
 
         Returns
         -------
@@ -216,65 +978,167 @@ class MC:
         """
 
         self.freq = freq
+        trajectory_writers = {'xyz': XYZWriter, 'pdb': PDBWriter, 'dcd': DCDWriter}
+        if snapshot_format not in ('txt', 'binary') and snapshot_format not in trajectory_writers:
+            raise ValueError("snapshot_format must be one of 'txt', 'binary', 'xyz', 'pdb' or 'dcd'")
         if (not os.path.exists(save_dir)):
-            os.mkdir(save_dir)
+            os.makedirs(save_dir)
+        with contextlib.ExitStack() as stack:
+            trajectory = None
+            if save_snaps and snapshot_format == 'binary':
+                trajectory = TrajectoryWriter(os.path.join(save_dir, 'trajectory.bin'),
+                                              self._Geom.num_particles,
+                                              self._Geom.box_length,
+                                              precision='single' if self._Geom.precision == 'mixed' else 'double',
+                                              append=True)
+            elif save_snaps and snapshot_format in trajectory_writers:
+                trajectory_file = os.path.join(save_dir, 'trajectory.' + snapshot_format)
+                trajectory = trajectory_writers[snapshot_format](trajectory_file, append=True)
+            if trajectory is not None:
+                stack.callback(trajectory.close)
 
-        if (not os.path.exists(save_dir + "/results.log")):
-            log = open("./results/results.log", "w+")
-            log.write('Starting MC!\n')
-            log.write('Step' + '    |    ' + 'Energy\n')
-            log.write('-------------------\n')
-        else:
-            log = open(save_dir + "/results.log", "a")
-            log.write(f'\nStarting from step {self.current_step}\n')
+            if (not os.path.exists(save_dir + "/results.log")):
+                log = open(save_dir + "/results.log", "w+")
+                log.write('Starting MC!\n')
+                log.write('Step' + '    |    ' + 'Energy' + '    |    ' + 'Pressure\n')
+                log.write('-------------------\n')
+            else:
+                log = open(save_dir + "/results.log", "a")
+                log.write(f'\nStarting from step {self.current_step}\n')
+            stack.callback(log.close)
 
-        tail_correction = self._Energy.calculate_tail_correction()
-        total_pair_energy = self._Energy.calculate_total_pair_energy()
-        if self.current_step == 0:
-            self._energy_array = np.append(self._energy_array, np.zeros(n_steps + 1))
-            self._energy_array[0] = total_pair_energy
-        else:
-            self._energy_array = np.append(self._energy_array, np.zeros(n_steps))
+            tail_correction, pressure_tail_correction, ideal_pressure, virial_factor = self._density_terms()
+            volume = self._Geom.volume
+            num_particles = self._Geom.num_particles
+            self._Energy.initialize_particle_energies()
+            total_pair_energy = self._Energy.get_total_pair_energy()
+            total_virial = self._Energy.get_total_virial()
+            if self.current_step == 0:
+                self._energy_array = np.append(self._energy_array, np.zeros(n_steps + 1))
+                self._energy_array[0] = total_pair_energy
+                self._pressure_array = np.append(self._pressure_array, np.zeros(n_steps + 1))
+                self._pressure_array[0] = ideal_pressure + virial_factor * total_virial + pressure_tail_correction
+                self._volume_array = np.append(self._volume_array, np.zeros(n_steps + 1))
+                self._volume_array[0] = volume
+                self._num_particles_array = np.append(self._num_particles_array, np.zeros(n_steps + 1, dtype=np.intp))
+                self._num_particles_array[0] = num_particles
+            else:
+                self._energy_array = np.append(self._energy_array, np.zeros(n_steps))
+                self._pressure_array = np.append(self._pressure_array, np.zeros(n_steps))
+                self._volume_array = np.append(self._volume_array, np.zeros(n_steps))
+                self._num_particles_array = np.append(self._num_particles_array, np.zeros(n_steps, dtype=np.intp))
 
-        start = time.time()
-        for i_step in range(1, n_steps + 1):
-            self.current_step += 1
-            self._n_trials += 1
+            writer = AsyncWriter(output_queue_size, backpressure) if async_output else SyncWriter()
+            unit = 'sweep' if self.schedule == 'sweep' else 'step'
+            n_rebuilds = self._Energy.get_n_rebuilds()
+            start = time.time()
+            # the writer is closed once, after the loop and before the summary lines, whether the loop fails or not
+            with writer:
+                for i_step in range(1, n_steps + 1):
+                    self.current_step += 1
 
-            i_particle = np.random.randint(self._Geom.num_particles)
-            random_displacement = (2.0 * np.random.rand(3) - 1.0) * self.max_displacement
+                    if self.schedule == 'sweep':
+                        n_accept = 0
+                        sweep_delta_e = 0.0
+                        sweep_delta_w = 0.0
+                        for i_particle in self._rng.permutation(int(self._Geom.num_particles)):
+                            accept, delta_e, delta_w = self._next_move(i_particle)
+                            if accept:
+                                sweep_delta_e += delta_e
+                                sweep_delta_w += delta_w
+                                n_accept += 1
+                        total_pair_energy += sweep_delta_e
+                        total_virial += sweep_delta_w
+                        self._n_trials += self._Geom.num_particles
+                        self._n_accept += n_accept
+                        if self.reduced_pressure is not None:
+                            accept, delta_e, delta_w = self._attempt_volume_move(total_pair_energy, total_virial)
+                            if accept:
+                                total_pair_energy += delta_e
+                                total_virial += delta_w
+                        if self.chemical_potential is not None:
+                            for _ in range(max(1, int(round(self.exchange_probability * self._Geom.num_particles)))):
+                                accept, delta_e, delta_w = self._attempt_exchange_move()
+                                if accept:
+                                    total_pair_energy += delta_e
+                                    total_virial += delta_w
+                    elif self.chemical_potential is not None and self._rng.uniform() < self.exchange_probability:
+                        accept, delta_e, delta_w = self._attempt_exchange_move()
+                        if accept:
+                            total_pair_energy += delta_e
+                            total_virial += delta_w
+                    elif self.reduced_pressure is not None and self._rng.uniform() * self._Geom.num_particles < 1.0:
+                        accept, delta_e, delta_w = self._attempt_volume_move(total_pair_energy, total_virial)
+                        if accept:
+                            total_pair_energy += delta_e
+                            total_virial += delta_w
+                    elif self._Geom.num_particles > 0:
+                        self._n_trials += 1
+                        accept, delta_e, delta_w = self._next_move(self._rng.particle_index(self._Geom.num_particles))
+                        if accept:
+                            total_pair_energy += delta_e
+                            total_virial += delta_w
+                            self._n_accept += 1
 
-            current_energy = self._Energy.get_particle_energy(i_particle, self._Geom.coordinates)
-            old_coordinate = self._Geom.coordinates[i_particle, :].copy()
-            proposed_coordinate = self._Geom.wrap(old_coordinate + random_displacement)
-            self._Geom.coordinates[i_particle, :] = proposed_coordinate
+                    if self.widom_interval is not None and np.mod(self.current_step, self.widom_interval) == 0:
+                        self._sample_widom()
 
-            proposed_energy = self._Energy.get_particle_energy(i_particle, self._Geom.coordinates)
-            delta_e = proposed_energy - current_energy
-            accept = self._accept_or_reject(delta_e)
+                    if self._Geom.volume != volume or self._Geom.num_particles != num_particles:
+                        (tail_correction, pressure_tail_correction, ideal_pressure,
+                         virial_factor) = self._density_terms()
+                        volume = self._Geom.volume
+                        num_particles = self._Geom.num_particles
+                    total_energy = (total_pair_energy + tail_correction) / max(num_particles, 1)
+                    self._energy_array[self.current_step] = total_energy
+                    self._pressure_array[self.current_step] = (ideal_pressure + virial_factor * total_virial +
+                                                               pressure_tail_correction)
+                    self._volume_array[self.current_step] = volume
+                    self._num_particles_array[self.current_step] = num_particles
 
-            if accept:
-                total_pair_energy += delta_e
-                self._n_accept += 1
-            else:
-                self._Geom.coordinates[i_particle, :] = old_coordinate
-
-            total_energy = (total_pair_energy + tail_correction) / self._Geom.num_particles
-            self._energy_array[self.current_step] = total_energy
-
-            if np.mod(i_step + 1, freq) == 0:
-                log.write(str(self.current_step + 1) + '    |    ' + str(self._energy_array[self.current_step]))
-                log.write('\n')
-                print(f"Step: {self.current_step + 1} | Energy: {round(self._energy_array[self.current_step],5)}")
-                if save_snaps:
-                    self.save_snapshot('%s/snap_%d.txt' % (save_dir, i_step + 1))
-                if self.tune_displacement:
-                    self._adjust_displacement()
-        self.performance = (time.time() - start) / n_steps
-        print(f"Performance: {round(1000*self.performance, 5)} seconds / 1000 steps")
-        log.write('--------------------------------------------\n')
-        log.write(f"Performance: {1000*self.performance} seconds / 1000 steps")
-        log.close()
+                    if np.mod(i_step + 1, freq) == 0:
+                        writer.submit(log.write, str(self.current_step + 1) + '    |    ' +
+                                      str(self._energy_array[self.current_step]) + '    |    ' +
+                                      str(self._pressure_array[self.current_step]) + '\n')
+                        writer.submit(print, f"{unit.capitalize()}: {self.current_step + 1} | "
+                                      f"Energy: {round(self._energy_array[self.current_step],5)}"
+                                      f" | Pressure: {round(self._pressure_array[self.current_step],5)}")
+                        if trajectory is not None:
+                            writer.submit(trajectory.write, self._Geom.coordinates.copy(), self._Geom.box_length)
+                        elif save_snaps:
+                            snapshot = copy.copy(self._Geom)
+                            snapshot.coordinates = self._Geom.coordinates.copy()
+                            writer.submit(snapshot.save_state, '%s/snap_%d.txt' % (save_dir, i_step + 1))
+                        if self.tune_displacement:
+                            self._adjust_displacement()
+                self.performance = (time.time() - start) / n_steps
+            print(f"Performance: {round(1000*self.performance, 5)} seconds / 1000 {unit}s")
+            log.write('--------------------------------------------\n')
+            log.write(f"Performance: {1000*self.performance} seconds / 1000 {unit}s")
+            if writer.n_dropped > 0:
+                dropped_message = f"Outputs dropped by the full output queue: {writer.n_dropped}"
+                print(dropped_message)
+                log.write('\n' + dropped_message)
+            if self._n_collective_trials > 0:
+                collective_message = (f"Collective moves accepted: {self._n_collective_accept} / "
+                                      f"{self._n_collective_trials}")
+                print(collective_message)
+                log.write('\n' + collective_message)
+            if self._n_volume_trials > 0:
+                volume_message = f"Volume moves accepted: {self._n_volume_accept} / {self._n_volume_trials}"
+                print(volume_message)
+                log.write('\n' + volume_message)
+            if self._n_exchange_trials > 0:
+                exchange_message = (f"Exchange moves accepted: {self._n_exchange_accept} / "
+                                    f"{self._n_exchange_trials}")
+                print(exchange_message)
+                log.write('\n' + exchange_message)
+            if self._Energy.neighbor_method == 'verlet':
+                n_rebuilds = self._Energy.get_n_rebuilds() - n_rebuilds
+                rebuild_message = f"Neighbor list rebuilds: {n_rebuilds}"
+                if n_rebuilds > 0:
+                    rebuild_message += f" (every {n_steps / n_rebuilds:.1f} {unit}s)"
+                print(rebuild_message)
+                log.write('\n' + rebuild_message)
 
     def plot(self, energy_plot=True, save_plot=False):
         """
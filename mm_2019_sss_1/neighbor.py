@@ -0,0 +1,630 @@
+import itertools
+import numpy as np
+
+
+class CellList:
+    """
+    A spatial index binning particles of a periodic cubic box into cells.
+
+    Every cell is at least cell_width long in each dimension, so all the particles within cell_width of a
+    position are found in the (up to) 27 cells surrounding the cell holding that position.
+
+    Attributes
+    ----------
+        box_length : integer or float
+            Length of the periodic box.
+        cell_width : integer or float
+            Minimum length of a cell the list was built for.
+        n_cells_side : integer
+            Number of cells along each box dimension.
+        cell_length : float
+            Length of a single cell.
+        n_cells : integer
+            Total number of cells in the box.
+        neighbor_cells : numpy array (n_cells x k)
+            Indices of the distinct cells surrounding each cell (itself included), nearest first: the cell itself,
+            then the cells sharing a face, an edge and a corner with it.
+        cells : numpy array (n_cells x capacity)
+            Particle indices stored in each cell, padded with -1.
+        counts : numpy array (n_cells)
+            Number of particles stored in each cell.
+
+    Methods
+    -------
+        build :
+            Bin all the particles into cells from scratch.
+        restore :
+            Rebuild the cells from the cell and slot of every particle, keeping the order of the slots.
+        cell_index :
+            Get the cell index of one or more positions.
+        move :
+            Move a particle to the cell of its new position.
+        insert :
+            Add a new particle at the end of the particle indices.
+        delete :
+            Remove a particle, relabelling the last particle with its index.
+        get_neighbors :
+            Get the indices of all the particles in the cells surrounding one or more positions.
+    """
+    def __init__(self, coordinates, box_length, cell_width):
+        """
+        The constructor for CellList class.
+
+        Parameters
+        ----------
+            coordinates : numpy array (N x 3)
+                Coordinates of the particles to be indexed.
+            box_length : integer or float
+                Length of the periodic box.
+            cell_width : integer or float
+                Minimum length of a cell, usually the cutoff distance of the potential.
+        """
+
+        self.box_length = box_length
+        self.cell_width = cell_width
+        self.n_cells_side = max(1, int(np.floor(box_length / cell_width)))
+        self.cell_length = box_length / self.n_cells_side
+        self.n_cells = self.n_cells_side**3
+        self.neighbor_cells = self._build_neighbor_table()
+        self.build(coordinates)
+
+    def _build_neighbor_table(self):
+        """
+        Build the table of distinct cells surrounding each cell, with periodic wrapping.
+
+        For boxes less than three cells wide the wrapped offsets point to the same cell more than once, so only
+        the distinct offsets along each dimension are kept. The surrounding cells are sorted by the number of
+        dimensions along which they are shifted, so the nearest cells come first.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        neighbor_cells : numpy array (n_cells x k)
+            Indices of the distinct cells surrounding each cell, nearest first.
+        """
+
+        n = self.n_cells_side
+        offsets = np.unique(np.array([-1, 0, 1]) % n)
+        shifts = np.array(list(itertools.product(offsets, repeat=3)))
+        shifts = shifts[np.argsort(np.count_nonzero(shifts, axis=1), kind='stable')]
+        grid = np.array(list(itertools.product(range(n), repeat=3)))
+        neighbors = (grid[:, None, :] + shifts[None, :, :]) % n
+        return (neighbors[..., 0] * n + neighbors[..., 1]) * n + neighbors[..., 2]
+
+    def cell_index(self, positions):
+        """
+        Get the cell index of one or more positions.
+
+        Parameters
+        ----------
+        positions : numpy array (3) or (M x 3)
+            Positions to locate. They do not need to be wrapped into the box.
+
+        Returns
+        -------
+        index : integer or numpy array (M)
+            Index of the cell holding each position.
+        """
+
+        n = self.n_cells_side
+        ijk = np.floor(positions / self.cell_length).astype(np.intp) % n
+        return (ijk[..., 0] * n + ijk[..., 1]) * n + ijk[..., 2]
+
+    def build(self, coordinates):
+        """
+        Bin all the particles into cells from scratch.
+
+        Parameters
+        ----------
+        coordinates : numpy array (N x 3)
+            Coordinates of the particles to be indexed.
+
+        Returns
+        -------
+        None
+        """
+
+        num_particles = len(coordinates)
+        self.cell_of = self.cell_index(coordinates)
+        self.counts = np.bincount(self.cell_of, minlength=self.n_cells)
+        capacity = 2 * max(int(self.counts.max()), 1)
+        order = np.argsort(self.cell_of, kind='stable')
+        starts = np.cumsum(self.counts) - self.counts
+        self.slot_of = np.empty(num_particles, dtype=np.intp)
+        self.slot_of[order] = np.arange(num_particles) - starts[self.cell_of[order]]
+        self.cells = np.full((self.n_cells, capacity), -1, dtype=np.intp)
+        self.cells[self.cell_of, self.slot_of] = np.arange(num_particles)
+
+    def restore(self, counts, cell_of, slot_of):
+        """
+        Rebuild the cells from the cell and slot of every particle, keeping the order of the slots.
+
+        Unlike build, which orders the particles of a cell by index, this reproduces the exact layout of a saved
+        list, so the particles are visited in the same order as before it was saved.
+
+        Parameters
+        ----------
+        counts : numpy array (n_cells)
+            Number of particles stored in each cell.
+        cell_of : numpy array
+            Cell of every particle, possibly followed by unused capacity.
+        slot_of : numpy array
+            Slot of every particle in its cell, possibly followed by unused capacity.
+
+        Returns
+        -------
+        None
+        """
+
+        num_particles = int(counts.sum())
+        self.counts = np.array(counts, dtype=np.intp)
+        self.cell_of = np.array(cell_of, dtype=np.intp)
+        self.slot_of = np.array(slot_of, dtype=np.intp)
+        capacity = 2 * max(int(self.counts.max()), 1)
+        self.cells = np.full((self.n_cells, capacity), -1, dtype=np.intp)
+        self.cells[self.cell_of[:num_particles], self.slot_of[:num_particles]] = np.arange(num_particles)
+
+    def _remove(self, i_particle):
+        """
+        Remove a particle from its cell, filling its slot with the last particle of that cell.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle to remove.
+
+        Returns
+        -------
+        None
+        """
+
+        cell = self.cell_of[i_particle]
+        slot = self.slot_of[i_particle]
+        last = self.counts[cell] - 1
+        moved = self.cells[cell, last]
+        self.cells[cell, slot] = moved
+        self.slot_of[moved] = slot
+        self.cells[cell, last] = -1
+        self.counts[cell] = last
+
+    def _add(self, i_particle, cell):
+        """
+        Append a particle to a cell, doubling the capacity of all cells if it is full.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle to add.
+        cell : integer
+            Index of the cell receiving the particle.
+
+        Returns
+        -------
+        None
+        """
+
+        slot = self.counts[cell]
+        if slot == self.cells.shape[1]:
+            grown = np.full((self.n_cells, 2 * self.cells.shape[1]), -1, dtype=np.intp)
+            grown[:, :self.cells.shape[1]] = self.cells
+            self.cells = grown
+        self.cells[cell, slot] = i_particle
+        self.cell_of[i_particle] = cell
+        self.slot_of[i_particle] = slot
+        self.counts[cell] = slot + 1
+
+    def move(self, i_particle, position):
+        """
+        Move a particle to the cell of its new position.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle that moved.
+        position : numpy array (3)
+            New position of the particle.
+
+        Returns
+        -------
+        None
+        """
+
+        cell = self.cell_index(position)
+        if cell == self.cell_of[i_particle]:
+            return
+        self._remove(i_particle)
+        self._add(i_particle, cell)
+
+    def insert(self, i_particle, position):
+        """
+        Add a new particle at the end of the particle indices.
+
+        The per-particle arrays double their capacity when full, so an insertion does not reallocate them.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the new particle, equal to the number of particles before the insertion.
+        position : numpy array (3)
+            Position of the new particle.
+
+        Returns
+        -------
+        None
+        """
+
+        if i_particle == len(self.cell_of):
+            capacity = max(2 * len(self.cell_of), 1)
+            self.cell_of = np.resize(self.cell_of, capacity)
+            self.slot_of = np.resize(self.slot_of, capacity)
+        self._add(i_particle, self.cell_index(position))
+
+    def delete(self, i_particle, last):
+        """
+        Remove a particle, relabelling the last particle with its index.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle to remove.
+        last : integer
+            Index of the last particle, which takes the index i_particle.
+
+        Returns
+        -------
+        None
+        """
+
+        self._remove(i_particle)
+        if last != i_particle:
+            cell = self.cell_of[last]
+            slot = self.slot_of[last]
+            self.cells[cell, slot] = i_particle
+            self.cell_of[i_particle] = cell
+            self.slot_of[i_particle] = slot
+
+    def get_neighbors(self, position):
+        """
+        Get the indices of all the particles in the cells surrounding one or more positions.
+
+        Parameters
+        ----------
+        position : numpy array (3) or (M x 3)
+            Position(s) around which particles are searched.
+
+        Returns
+        -------
+        neighbors : numpy array
+            Indices of every particle that may lie within cell_width of any of the positions, each listed once.
+        """
+
+        cell = self.cell_index(position)
+        if position.ndim == 1:
+            cells = self.neighbor_cells[cell]
+        elif np.all(cell == cell[0]):
+            cells = self.neighbor_cells[cell[0]]
+        else:
+            cells = np.unique(self.neighbor_cells[cell])
+        candidates = self.cells[cells]
+        return candidates[candidates >= 0]
+
+
+class VerletList:
+    """
+    Verlet neighbor lists holding, for every particle, the partners within cutoff + skin.
+
+    The lists stay valid until some particle has moved more than half the skin since they were built, which is
+    tracked from the displacements of accepted moves.
+
+    Attributes
+    ----------
+        Geom : class
+            Class for operations regarding simulation geometry and configuration. See 'class Geom help' for details.
+        cutoff : integer or float
+            Cutoff distance for the potential.
+        skin : integer or float
+            Extra distance added to the cutoff when building the lists.
+        n_builds : integer
+            Number of times the lists have been built.
+        max_displacement : float
+            Largest displacement of a particle since the lists were last built.
+
+    Methods
+    -------
+        build :
+            Build the neighbor lists of all the particles.
+        get_neighbors :
+            Get the listed partners of a particle placed at a position.
+        update :
+            Record the displacement of a particle after an accepted move.
+        needs_rebuild :
+            Check whether some particle has moved more than half the skin since the last build.
+    """
+    def __init__(self, Geom, cutoff, skin):
+        """
+        The constructor for VerletList class.
+
+        Parameters
+        ----------
+            Geom : class
+                Class for operations regarding simulation geometry and configuration. See 'class Geom help' for
+                details.
+            cutoff : integer or float
+                Cutoff distance for the potential.
+            skin : integer or float
+                Extra distance added to the cutoff when building the lists.
+        """
+
+        self.Geom = Geom
+        self.cutoff = cutoff
+        self.skin = skin
+        self.n_builds = 0
+        self.build()
+
+    def build(self):
+        """
+        Build the neighbor lists of all the particles.
+
+        Candidate pairs come from a cell list at least cutoff + skin wide, one cell at a time, and are stored in
+        compressed form: the partners of particle i are partners[offsets[i]:offsets[i + 1]].
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        coordinates = self.Geom.coordinates
+        num_particles = len(coordinates)
+        list_cutoff2 = (self.cutoff + self.skin)**2
+        cells = CellList(coordinates, self.Geom.box_length, self.cutoff + self.skin)
+
+        pairs_i = []
+        pairs_j = []
+        for cell in np.flatnonzero(cells.counts):
+            members = cells.cells[cell, :cells.counts[cell]]
+            candidates = cells.cells[cells.neighbor_cells[cell]]
+            candidates = candidates[candidates >= 0]
+            rij = coordinates[members, None, :] - coordinates[None, candidates, :]
+            rij = rij - self.Geom.box_length * np.round(rij / self.Geom.box_length)
+            rij2 = np.sum(rij**2, axis=-1)
+            close = (rij2 < list_cutoff2) & (members[:, None] != candidates[None, :])
+            i_index, j_index = np.nonzero(close)
+            pairs_i.append(members[i_index])
+            pairs_j.append(candidates[j_index])
+
+        pairs_i = np.concatenate(pairs_i) if pairs_i else np.array([], dtype=np.intp)
+        pairs_j = np.concatenate(pairs_j) if pairs_j else np.array([], dtype=np.intp)
+        order = np.argsort(pairs_i, kind='stable')
+        self.partners = pairs_j[order]
+        self.offsets = np.zeros(num_particles + 1, dtype=np.intp)
+        np.cumsum(np.bincount(pairs_i, minlength=num_particles), out=self.offsets[1:])
+
+        self.reference = coordinates.copy()
+        self.max_displacement = 0.0
+        self.n_builds += 1
+
+    def _displacement(self, i_particle, position):
+        """
+        Distance between a position and the position of a particle when the lists were built.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle.
+        position : numpy array (3)
+            Current or trial position of the particle.
+
+        Returns
+        -------
+        displacement : float
+            Minimum image distance from the reference position.
+        """
+
+        return np.sqrt(self.Geom.minimum_image_distance(position, self.reference[i_particle]))
+
+    def get_neighbors(self, i_particle, position):
+        """
+        Get the listed partners of a particle placed at a position.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle.
+        position : numpy array (3)
+            Current or trial position of the particle.
+
+        Returns
+        -------
+        neighbors : numpy array or None
+            Indices of the partners of the particle, or None if the list may be missing partners. This happens when
+            the displacement of the position from the reference position, added to the largest displacement of any
+            particle since the last build, exceeds the skin.
+        """
+
+        if self._displacement(i_particle, position) + self.max_displacement > self.skin:
+            return None
+        return self.partners[self.offsets[i_particle]:self.offsets[i_particle + 1]]
+
+    def update(self, i_particle, position):
+        """
+        Record the displacement of a particle after an accepted move.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle that moved.
+        position : numpy array (3)
+            New position of the particle.
+
+        Returns
+        -------
+        None
+        """
+
+        self.max_displacement = max(self.max_displacement, self._displacement(i_particle, position))
+
+    def needs_rebuild(self):
+        """
+        Check whether some particle has moved more than half the skin since the last build.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        rebuild : Boolean
+            True if the lists have to be built again.
+        """
+
+        return self.max_displacement > 0.5 * self.skin
+
+
+class ShellList:
+    """
+    A list of the pairs whose distance lies within skin of the cutoff, used to find the pairs crossing the cutoff
+    when the box and all the coordinates are scaled.
+
+    The distances are tracked in units of the box length, which a uniform scaling of the box leaves unchanged, so
+    the list stays valid across accepted volume moves. A pair missing from the list cannot cross the cutoff as long
+    as the scaled cutoff stays more than twice the largest displacement of a particle away from the ends of the
+    shell.
+
+    Attributes
+    ----------
+        Geom : class
+            Class for operations regarding simulation geometry and configuration. See 'class Geom help' for details.
+        cutoff : integer or float
+            Cutoff distance for the potential.
+        skin : integer or float
+            Half width of the shell around the cutoff.
+        n_builds : integer
+            Number of times the list has been built.
+        max_displacement : float
+            Largest displacement of a particle since the list was last built, in units of the box length.
+
+    Methods
+    -------
+        build :
+            Build the list of the pairs within skin of the cutoff.
+        update :
+            Record the displacement of a particle after an accepted move.
+        get_crossing_pairs :
+            Get the current squared distances of the listed pairs, if they hold every pair that may cross the
+            cutoff when the box is scaled to a new length.
+    """
+    def __init__(self, Geom, cutoff, skin):
+        """
+        The constructor for ShellList class.
+
+        Parameters
+        ----------
+            Geom : class
+                Class for operations regarding simulation geometry and configuration. See 'class Geom help' for
+                details.
+            cutoff : integer or float
+                Cutoff distance for the potential.
+            skin : integer or float
+                Half width of the shell around the cutoff.
+        """
+
+        self.Geom = Geom
+        self.cutoff = cutoff
+        self.skin = skin
+        self.n_builds = 0
+        self.build()
+
+    def build(self):
+        """
+        Build the list of the pairs within skin of the cutoff.
+
+        Candidate pairs come from a cell list at least cutoff + skin wide, one cell at a time, and every pair is
+        stored once, with pairs_i < pairs_j.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        coordinates = self.Geom.coordinates
+        box_length = self.Geom.box_length
+        inner = max(self.cutoff - self.skin, 0.0)
+        outer = self.cutoff + self.skin
+        cells = CellList(coordinates, box_length, outer)
+
+        pairs_i = []
+        pairs_j = []
+        for cell in np.flatnonzero(cells.counts):
+            members = cells.cells[cell, :cells.counts[cell]]
+            candidates = cells.cells[cells.neighbor_cells[cell]]
+            candidates = candidates[candidates >= 0]
+            rij2 = self.Geom.minimum_image_distance(coordinates[members, None, :], coordinates[None, candidates, :])
+            in_shell = (rij2 >= inner**2) & (rij2 < outer**2) & (members[:, None] < candidates[None, :])
+            i_index, j_index = np.nonzero(in_shell)
+            pairs_i.append(members[i_index])
+            pairs_j.append(candidates[j_index])
+
+        self.pairs_i = np.concatenate(pairs_i) if pairs_i else np.array([], dtype=np.intp)
+        self.pairs_j = np.concatenate(pairs_j) if pairs_j else np.array([], dtype=np.intp)
+        self._inner = inner / box_length
+        self._outer = outer / box_length
+        self.reference = coordinates / box_length
+        self.max_displacement = 0.0
+        self.n_builds += 1
+
+    def update(self, i_particle, position):
+        """
+        Record the displacement of a particle after an accepted move.
+
+        Parameters
+        ----------
+        i_particle : integer
+            Index of the particle that moved.
+        position : numpy array (3)
+            New position of the particle.
+
+        Returns
+        -------
+        None
+        """
+
+        displacement = position / self.Geom.box_length - self.reference[i_particle]
+        displacement -= np.round(displacement)
+        self.max_displacement = max(self.max_displacement, float(np.sqrt(np.sum(displacement**2))))
+
+    def get_crossing_pairs(self, box_length):
+        """
+        Get the current squared distances of the listed pairs, if they hold every pair that may cross the cutoff
+        when the box is scaled to a new length.
+
+        Parameters
+        ----------
+        box_length : float
+            Proposed length of the box.
+
+        Returns
+        -------
+        pairs : tuple or None
+            None if some pair missing from the list may cross the cutoff, otherwise (pairs_i, pairs_j, rij2): the
+            listed pairs and their current squared distances.
+        """
+
+        current = self.cutoff / self.Geom.box_length
+        proposed = self.cutoff / box_length
+        margin = 2.0 * self.max_displacement
+        if min(current, proposed) < self._inner + margin or max(current, proposed) >= self._outer - margin:
+            return None
+        coordinates = self.Geom.coordinates
+        rij2 = self.Geom.minimum_image_distance(coordinates[self.pairs_i], coordinates[self.pairs_j])
+        return self.pairs_i, self.pairs_j, rij2
@@ -0,0 +1,233 @@
+import queue
+import threading
+
+
+class AsyncWriter:
+    """
+    A background thread running output tasks, such as log writes, prints and snapshots, handed over through a
+    bounded queue.
+
+    Tasks run in the order they were submitted. When the queue is full, submit either waits for a free slot or
+    drops the task, depending on the backpressure policy, so slow storage can be kept from setting the pace of
+    the caller. The arguments of a task are used when it runs, so mutable data such as coordinates has to be
+    copied before it is submitted.
+
+    Attributes
+    ----------
+        backpressure : string, either 'block' or 'drop'
+            What submit does when the queue is full.
+        n_dropped : integer
+            Number of tasks dropped because the queue was full.
+
+    Methods
+    -------
+        submit :
+            Hand a task over to the writer thread.
+        flush :
+            Wait until every submitted task has run.
+        close :
+            Run the remaining tasks and stop the writer thread.
+    """
+    def __init__(self, max_queue=64, backpressure='block'):
+        """
+        The constructor for AsyncWriter class.
+
+        Parameters
+        ----------
+            max_queue : integer, default to 64
+                Largest number of tasks waiting in the queue.
+            backpressure : string, either 'block' or 'drop', default to 'block'
+                With 'block', submit waits for a free slot when the queue is full. With 'drop', the task is
+                discarded and counted in n_dropped.
+        """
+
+        if backpressure not in ('block', 'drop'):
+            raise ValueError("backpressure must be either 'block' or 'drop'")
+        self.backpressure = backpressure
+        self.n_dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._error = None
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def _work(self):
+        """
+        Run the tasks of the queue until the stop sentinel None is received.
+
+        The first exception raised by a task is kept and raised again by close, and the following tasks still run.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                function, args = task
+                function(*args)
+            except Exception as error:
+                if self._error is None:
+                    self._error = error
+            finally:
+                self._queue.task_done()
+
+    def submit(self, function, *args):
+        """
+        Hand a task over to the writer thread.
+
+        Parameters
+        ----------
+        function : callable
+            Function to call in the writer thread.
+        *args :
+            Arguments of the function.
+
+        Returns
+        -------
+        queued : Boolean
+            False if the task was dropped because the queue was full.
+        """
+
+        if self._thread is None:
+            raise ValueError("The writer is closed.")
+        if self.backpressure == 'drop':
+            try:
+                self._queue.put_nowait((function, args))
+            except queue.Full:
+                self.n_dropped += 1
+                return False
+        else:
+            self._queue.put((function, args))
+        return True
+
+    def flush(self):
+        """
+        Wait until every submitted task has run.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self._queue.join()
+
+    def close(self):
+        """
+        Run the remaining tasks and stop the writer thread. Closing a closed writer does nothing.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SyncWriter:
+    """
+    A writer running every task immediately in the calling thread, with the interface of AsyncWriter.
+
+    Attributes
+    ----------
+        n_dropped : integer
+            Always 0, since no task is dropped.
+
+    Methods
+    -------
+        submit :
+            Run a task.
+        flush :
+            Do nothing, since every task has already run.
+        close :
+            Do nothing, since every task has already run.
+    """
+    def __init__(self):
+        """
+        The constructor for SyncWriter class.
+        """
+
+        self.n_dropped = 0
+
+    def submit(self, function, *args):
+        """
+        Run a task.
+
+        Parameters
+        ----------
+        function : callable
+            Function to call.
+        *args :
+            Arguments of the function.
+
+        Returns
+        -------
+        queued : Boolean
+            Always True.
+        """
+
+        function(*args)
+        return True
+
+    def flush(self):
+        """
+        Do nothing, since every task has already run.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        pass
+
+    def close(self):
+        """
+        Do nothing, since every task has already run.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,432 @@
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from .energy import Energy
+from .geom import Geom
+from .rng import RandomStream
+
+_shared = {}
+
+
+def _attach_shared_coordinates(name, shape, dtype):
+    """
+    Attach a worker process to the shared-memory coordinates of a CheckerboardMC.
+
+    Parameters
+    ----------
+    name : string
+        Name of the shared memory block.
+    shape : tuple
+        Shape of the coordinate array.
+    dtype : numpy dtype
+        Data type of the coordinate array.
+
+    Returns
+    -------
+    None
+    """
+
+    block = shared_memory.SharedMemory(name=name)
+    _shared['block'] = block
+    _shared['coordinates'] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _domain_sweep(coordinates, members, candidates, lower, width, box_length, n_moves, max_displacement, beta,
+                  potential, seed, sweep):
+    """
+    Run Metropolis moves on the particles of one domain while every other particle stays fixed.
+
+    Moves taking a particle out of its domain are rejected, so the particles of the domain only ever interact with
+    each other and with the halo, the fixed particles within the cutoff of the domain, which are picked out of the
+    candidates first. The energies of the old and new positions of a move are calculated by
+    Energy.calculate_position_energies.
+
+    Parameters
+    ----------
+    coordinates : numpy array (N x 3) or None
+        Coordinates of all the particles, updated in place. None in worker processes, which use the shared
+        coordinates they attached to.
+    members : numpy array
+        Indices of the particles of the domain.
+    candidates : numpy array
+        Indices of the particles of the domains surrounding the domain, which hold its halo.
+    lower : numpy array (3)
+        Lower corner of the domain.
+    width : float
+        Length of the domain.
+    box_length : float
+        Length of the periodic box.
+    n_moves : int
+        Number of trial moves.
+    max_displacement : float
+        Maximum trial move displacement in each dimension.
+    beta : float
+        Inverse reduced temperature.
+    potential : PairPotential
+        Pair potential of the system.
+    seed : numpy SeedSequence
+        Seed of the random numbers of this domain, spawned once when the decomposition is built.
+    sweep : int
+        Index of the sweep, the number of jumps of the generator seeded by seed, so every sweep of the domain draws
+        an independent stream.
+
+    Returns
+    -------
+    n_accept : int
+        Number of accepted moves.
+    delta_e : float
+        Energy change of the domain over all the accepted moves.
+    """
+
+    if coordinates is None:
+        coordinates = _shared['coordinates']
+    relative = np.mod(coordinates[candidates] - lower, box_length)
+    outside = np.where(relative < width, 0.0, np.minimum(relative - width, box_length - relative))
+    halo = candidates[np.sum(outside**2, axis=1) < potential.cutoff2]
+    n_members = len(members)
+    local = coordinates[np.concatenate([members, halo])].astype(float)
+    uniforms = np.random.Generator(np.random.PCG64(seed).jumped(sweep)).random((n_moves, 5))
+    energy = Energy(None, potential.cutoff, potential=potential)
+    exclude = np.zeros(1, dtype=np.intp)
+    n_accept = 0
+    delta_e = 0.0
+
+    for k_move in range(n_moves):
+        k_particle = int(uniforms[k_move, 0] * n_members)
+        old_coordinate = local[k_particle]
+        new_coordinate = old_coordinate + (2.0 * uniforms[k_move, 1:4] - 1.0) * max_displacement
+        if np.any(np.mod(new_coordinate - lower, box_length) >= width):
+            continue
+        new_coordinate -= box_length * np.round(new_coordinate / box_length)
+
+        exclude[0] = k_particle
+        positions = np.stack([old_coordinate, new_coordinate])[None]
+        e_old, e_new = energy.calculate_position_energies(positions, coordinates=local[None], box_length=box_length,
+                                                          exclude=exclude)[0]
+        if uniforms[k_move, 4] < np.exp(-beta * max(e_new - e_old, 0.0)):
+            local[k_particle] = new_coordinate
+            delta_e += e_new - e_old
+            n_accept += 1
+
+    coordinates[members] = local[:n_members]
+    return n_accept, delta_e
+
+
+class CheckerboardMC:
+    """
+    A domain-decomposed Monte Carlo simulation running same-colour domains in parallel.
+
+    The periodic box is split into an even number of cubic domains per side, each at least one cutoff wide, and the
+    domains are coloured in a 2 x 2 x 2 checkerboard. Two domains of the same colour are separated by at least one
+    domain, so when particles are kept inside their domain, moves in same-colour domains never interact and run
+    concurrently on a process pool over shared-memory coordinates. The origin of the domain grid is shifted at
+    random every sweep, and the colours are visited in random order, which preserves detailed balance. Every
+    particle is binned into its domain once per sweep, and the halo of a domain is picked by its worker out of the
+    particles of the surrounding domains, so the serial work of a sweep grows as N rather than N times the number
+    of domains.
+
+    Attributes
+    ----------
+        reduced_temp : float
+            Reduced temperature of the simulation.
+        max_displacement : float
+            Magnitude of particle displacement for Monte Carlo steps.
+        n_domains_side : int
+            Number of domains along each box dimension.
+        domain_length : float
+            Length of a domain.
+        n_workers : int
+            Number of worker threads or processes.
+        executor : string, either 'thread' or 'process'
+            Kind of worker pool.
+        performance : float
+            Performance of simulation in seconds / per sweep
+
+    Methods
+    -------
+        run :
+            Execute a number of sweeps, each attempting one move per particle.
+        get_energy :
+            Get the energy trace, one value per sweep.
+        get_snapshot :
+            Obtain the current snapshot stored as a Geom object.
+        close :
+            Shut down the worker pool and release the shared memory.
+    """
+    def __init__(self,
+                 method,
+                 reduced_temp,
+                 max_displacement,
+                 cutoff,
+                 num_particles=None,
+                 file_name=None,
+                 reduced_den=None,
+                 n_workers=None,
+                 executor='process',
+                 tune_displacement=True,
+                 potential='lj',
+                 potential_params=None,
+                 seed=None):
+        """
+        Initialize a checkerboard parallel MC simulation.
+
+        Parameters
+        ----------
+        method : string, either 'random' or 'file'
+            Method to initialize system.
+        reduced_temp : float
+            Reduced temperature at which the simulation will run.
+        max_displacement : float
+            Maximum trial move displacement in each dimension.
+        cutoff : float
+            Cutoff distance for energy calculation. The box must be at least two cutoffs wide.
+        num_particles : int, required if method is 'random'
+            Number of particles in the system.
+        file_name : string, required if method is 'file'
+            Name of file from which initial configuration will be read and generated.
+        reduced_den : float, required if method is 'random'
+            Reduced density of the system.
+        n_workers : int, optional
+            Number of worker threads or processes, default to the number of domains of one colour.
+        executor : string, either 'thread' or 'process', default to 'process'
+            Kind of worker pool. Processes work on coordinates stored in shared memory. The domain sweeps are Python
+            loops holding the global interpreter lock, so threads run them one at a time, which is only useful for
+            debugging or very small systems.
+        tune_displacement : Boolean, default to True
+            Whether to tune the maximum displacement after every sweep based on its acceptance rate.
+        potential : string or PairPotential, default to 'lj'
+            Pair potential, either a registered name or a PairPotential instance.
+        potential_params : dict, optional
+            Parameters of the registered potential, for example {'epsilon': 1.0, 'sigma': 1.0}.
+        seed : integer, numpy SeedSequence or None, default to None
+            Seed of the random numbers of the simulation.
+
+        Returns
+        -------
+        None
+        """
+
+        if executor not in ('thread', 'process'):
+            raise ValueError("executor must be either 'thread' or 'process'")
+        self.reduced_temp = reduced_temp
+        self.beta = 1. / float(reduced_temp)
+        self.max_displacement = max_displacement
+        self.tune_displacement = tune_displacement
+        self.executor = executor
+        self._rng = RandomStream(seed)
+        self._energy_array = np.array([])
+        self.current_step = 0
+
+        self._Geom = Geom(method,
+                          num_particles=num_particles,
+                          reduced_den=reduced_den,
+                          file_name=file_name,
+                          rng=self._rng.generator)
+        self._Energy = Energy(self._Geom, cutoff, potential=potential, potential_params=potential_params)
+        self.potential = self._Energy.potential
+
+        self.n_domains_side = 2 * int(self._Geom.box_length / (2.0 * self.potential.cutoff))
+        if self.n_domains_side < 2:
+            raise ValueError("The box must be at least two cutoffs wide for a checkerboard decomposition.")
+        self.domain_length = self._Geom.box_length / self.n_domains_side
+        n_side = self.n_domains_side
+        self._colours = [[
+            np.array(domain)
+            for domain in itertools.product(range(parity[0], n_side, 2), range(parity[1], n_side, 2),
+                                            range(parity[2], n_side, 2))
+        ] for parity in itertools.product(range(2), repeat=3)]
+        # distinct domains surrounding each domain, itself excluded, with periodic wrapping
+        shifts = [shift for shift in itertools.product(np.unique(np.array([-1, 0, 1]) % n_side), repeat=3)
+                  if any(shift)]
+        grid = np.array(list(itertools.product(range(n_side), repeat=3)))
+        neighbors = (grid[:, None, :] + np.array(shifts)[None, :, :]) % n_side
+        self._neighbor_domains = (neighbors[..., 0] * n_side + neighbors[..., 1]) * n_side + neighbors[..., 2]
+        self.n_workers = n_workers or len(self._colours[0])
+        # one independent seed per domain, jumped ahead by the sweep index rather than spawned again every sweep
+        self._domain_seeds = self._rng.seed_sequence.spawn(n_side**3)
+
+        self._block = None
+        if executor == 'process':
+            coordinates = self._Geom.coordinates
+            self._block = shared_memory.SharedMemory(create=True, size=coordinates.nbytes)
+            self._Geom.coordinates = np.ndarray(coordinates.shape, dtype=coordinates.dtype, buffer=self._block.buf)
+            self._Geom.coordinates[:] = coordinates
+            self._pool = ProcessPoolExecutor(self.n_workers,
+                                             initializer=_attach_shared_coordinates,
+                                             initargs=(self._block.name, coordinates.shape, coordinates.dtype))
+        else:
+            self._pool = ThreadPoolExecutor(self.n_workers)
+
+    def _bin_domains(self, origin):
+        """
+        Bin every particle into the domain holding it, for a domain grid starting at origin.
+
+        Parameters
+        ----------
+        origin : numpy array (3)
+            Lower corner of the first domain.
+
+        Returns
+        -------
+        order : numpy array (N)
+            Particle indices sorted by domain.
+        starts : numpy array (n_domains + 1)
+            The particles of domain d are order[starts[d]:starts[d + 1]].
+        """
+
+        n_side = self.n_domains_side
+        relative = np.mod(self._Geom.coordinates - origin, self._Geom.box_length)
+        ijk = np.minimum((relative / self.domain_length).astype(np.intp), n_side - 1)
+        domain_of = (ijk[:, 0] * n_side + ijk[:, 1]) * n_side + ijk[:, 2]
+        order = np.argsort(domain_of, kind='stable')
+        starts = np.searchsorted(domain_of[order], np.arange(n_side**3 + 1))
+        return order, starts
+
+    def _sweep(self):
+        """
+        Attempt one move per particle, visiting the colours in random order with a randomly shifted domain grid.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        n_accept : int
+            Number of accepted moves.
+        delta_e : float
+            Energy change over the sweep.
+        """
+
+        origin = self._rng.generator.random(3) * self.domain_length
+        coordinates = None if self.executor == 'process' else self._Geom.coordinates
+        n_side = self.n_domains_side
+        # particles never leave their domain during a sweep, so a single binning holds for every colour
+        order, starts = self._bin_domains(origin)
+        n_accept = 0
+        delta_e = 0.0
+        for colour in self._rng.generator.permutation(len(self._colours)):
+            futures = []
+            for domain in self._colours[colour]:
+                index = (domain[0] * n_side + domain[1]) * n_side + domain[2]
+                members = order[starts[index]:starts[index + 1]]
+                if len(members) == 0:
+                    continue
+                candidates = np.concatenate(
+                    [order[starts[neighbor]:starts[neighbor + 1]] for neighbor in self._neighbor_domains[index]])
+                lower = origin + domain * self.domain_length
+                futures.append(
+                    self._pool.submit(_domain_sweep, coordinates, members, candidates, lower, self.domain_length,
+                                      self._Geom.box_length, len(members), self.max_displacement, self.beta,
+                                      self.potential, self._domain_seeds[index], self.current_step))
+            for future in futures:
+                accepted, delta = future.result()
+                n_accept += accepted
+                delta_e += delta
+        return n_accept, delta_e
+
+    def run(self, n_sweeps, freq):
+        """
+        Execute a number of sweeps, each attempting one move per particle.
+
+        Parameters
+        ----------
+        n_sweeps : int
+            The number of sweeps for this simulation.
+        freq : int
+            The frequency, in sweeps, of the in-screen check message.
+
+        Returns
+        -------
+        None
+        """
+
+        num_particles = self._Geom.num_particles
+        tail_correction = self._Energy.calculate_tail_correction()
+        total_pair_energy = self._Energy.calculate_total_pair_energy()
+        if self.current_step == 0:
+            self._energy_array = np.append(self._energy_array, np.zeros(n_sweeps + 1))
+            self._energy_array[0] = (total_pair_energy + tail_correction) / num_particles
+        else:
+            self._energy_array = np.append(self._energy_array, np.zeros(n_sweeps))
+
+        start = time.time()
+        for i_sweep in range(1, n_sweeps + 1):
+            self.current_step += 1
+            n_accept, delta_e = self._sweep()
+            total_pair_energy += delta_e
+            self._energy_array[self.current_step] = (total_pair_energy + tail_correction) / num_particles
+
+            if self.tune_displacement:
+                acc_rate = n_accept / num_particles
+                if (acc_rate < 0.38):
+                    self.max_displacement *= 0.8
+                elif (acc_rate > 0.42):
+                    self.max_displacement *= 1.2
+            if np.mod(i_sweep, freq) == 0:
+                print(f"Sweep: {self.current_step} | Energy: {round(self._energy_array[self.current_step],5)}")
+        self.performance = (time.time() - start) / n_sweeps
+        print(f"Performance: {round(self.performance, 5)} seconds / sweep")
+
+    def get_energy(self):
+        """
+        Get the energy trace, one value per sweep.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        1d Numpy array of current energy trace.
+        """
+
+        if (len(self._energy_array) == 0):
+            raise ValueError("Simulation has not started running!")
+        return self._energy_array
+
+    def get_snapshot(self):
+        """
+        Obtain the current snapshot stored as a Geom object.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        self._Geom : object
+            Geom object instance.
+        """
+
+        return self._Geom
+
+    def close(self):
+        """
+        Shut down the worker pool and release the shared memory.
+
+        The coordinates are copied out of the shared memory first, so the snapshot stays usable.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self._pool.shutdown()
+        if self._block is not None:
+            self._Geom.coordinates = self._Geom.coordinates.copy()
+            self._block.close()
+            self._block.unlink()
+            self._block = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,979 @@
+"""
+Registry of pair potentials usable by Energy.
+
+Every potential is evaluated from the squares of the pair distances, with a vectorised NumPy kernel and an
+optional compiled scalar kernel for the 'numba' backend, and knows its own analytic tail corrections. The pair
+virial w(r) = -r du/dr is computed alongside the energy for the pressure.
+"""
+
+import numpy as np
+from . import kernels
+
+
+class PairPotential:
+    """
+    Base class for pair potentials truncated at a cutoff distance.
+
+    Attributes
+    ----------
+        name : string
+            Name of the potential in the registry.
+        parameter_names : tuple of strings
+            Names of the constructor parameters, besides the cutoff, stored as attributes of the same name.
+        cutoff : integer or float
+            Cutoff distance of the potential.
+        cutoff2 : integer or float
+            Square of the cutoff distance.
+
+    Methods
+    -------
+        energy :
+            Calculate the pair energies from the squares of the pair distances.
+        virial :
+            Calculate the pair virials -r du/dr from the squares of the pair distances.
+        energy_and_virial :
+            Calculate the pair energies and virials in a single pass.
+        tail_correction :
+            Calculate the tail correction of the energy for a homogeneous system.
+        pressure_tail_correction :
+            Calculate the tail correction of the pressure for a homogeneous system.
+        energy_minimum :
+            Get a lower bound of the pair energy within the cutoff and the distance where it is reached.
+        power_terms :
+            Get the inverse-power terms of the potential, if it is a sum of two of them.
+        numba_kernel :
+            Get a compiled scalar version of energy_and_virial for the 'numba' backend.
+        get_parameters :
+            Get the parameters rebuilding the potential with get_potential.
+    """
+
+    name = None
+    parameter_names = ()
+
+    def __init__(self, cutoff):
+        """
+        The constructor for PairPotential class.
+
+        Parameters
+        ----------
+            cutoff : integer or float
+                Cutoff distance of the potential.
+        """
+
+        self.cutoff = cutoff
+        self.cutoff2 = cutoff**2
+
+    def energy(self, rij2):
+        """
+        Calculate the pair energies from the squares of the pair distances.
+
+        Parameters
+        ----------
+        rij2 : float or numpy array
+            The square of the distance between particles i and j.
+
+        Returns
+        -------
+        energy : float or numpy array
+            Pair energy of every distance.
+        """
+
+        raise NotImplementedError
+
+    def virial(self, rij2):
+        """
+        Calculate the pair virials -r du/dr from the squares of the pair distances.
+
+        Parameters
+        ----------
+        rij2 : float or numpy array
+            The square of the distance between particles i and j.
+
+        Returns
+        -------
+        virial : float or numpy array
+            Pair virial of every distance.
+        """
+
+        raise NotImplementedError
+
+    def energy_and_virial(self, rij2):
+        """
+        Calculate the pair energies and virials in a single pass.
+
+        Parameters
+        ----------
+        rij2 : float or numpy array
+            The square of the distance between particles i and j.
+
+        Returns
+        -------
+        energy : float or numpy array
+            Pair energy of every distance.
+        virial : float or numpy array
+            Pair virial of every distance.
+        """
+
+        return self.energy(rij2), self.virial(rij2)
+
+    def tail_correction(self, num_particles, volume):
+        """
+        Calculate the tail correction of the energy for a homogeneous system.
+
+        Parameters
+        ----------
+        num_particles : integer
+            Number of particles in system.
+        volume : integer or float
+            Volume of box in simulation.
+
+        Returns
+        -------
+        e_correction : float
+            Energy of the pairs beyond the cutoff, assuming a uniform pair distribution there.
+        """
+
+        return 0.0
+
+    def pressure_tail_correction(self, num_particles, volume):
+        """
+        Calculate the tail correction of the pressure for a homogeneous system.
+
+        Parameters
+        ----------
+        num_particles : integer
+            Number of particles in system.
+        volume : integer or float
+            Volume of box in simulation.
+
+        Returns
+        -------
+        p_correction : float
+            Pressure contribution of the pairs beyond the cutoff, assuming a uniform pair distribution there.
+        """
+
+        return 0.0
+
+    def energy_minimum(self):
+        """
+        Get a lower bound of the pair energy within the cutoff and the distance where it is reached.
+
+        Pairs closer than the minimum are on the repulsive side of the potential, which is where strong overlaps
+        come from, while every pair within the cutoff has an energy of at least the returned bound.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        rij2_min : float
+            Square of the distance of the minimum.
+        e_min : float
+            Lower bound of the pair energy within the cutoff, -inf if no finite bound is known.
+        """
+
+        return 0.0, -np.inf
+
+    def power_terms(self):
+        """
+        Get the inverse-power terms of the potential, if it is a sum of two of them.
+
+        For u(r) = c1 r^-p1 + c2 r^-p2, scaling every distance by s scales the two sums of the terms over the pairs
+        in range by s^-p1 and s^-p2, and both sums can be recovered from the total energy and virial.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        terms : list of tuples or None
+            The (coefficient, exponent) pairs of the two terms, or None if the potential has another form.
+        """
+
+        return None
+
+    def _scalar_terms(self):
+        """
+        Build the scalar pair energy and virial as a plain function of rij2 closing over the parameters.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        terms : function
+            Function of the square of a single pair distance returning its energy and virial.
+        """
+
+        raise NotImplementedError
+
+    def numba_kernel(self):
+        """
+        Get a compiled scalar version of energy_and_virial for the 'numba' backend.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        kernel : compiled function
+            Pair energy and virial of a single squared distance, compiled once per potential.
+        """
+
+        if not hasattr(self, '_numba_kernel'):
+            self._numba_kernel = kernels.numba.njit(self._scalar_terms())
+        return self._numba_kernel
+
+    def get_parameters(self):
+        """
+        Get the parameters rebuilding the potential with get_potential.
+
+        get_potential(potential.name, potential.cutoff, **potential.get_parameters()) gives the same potential, and
+        the parameters only hold numbers and strings, so they can be stored as JSON.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        params : dict
+            Parameters of the potential, besides the cutoff.
+        """
+
+        if POTENTIALS.get(self.name) is not type(self):
+            raise ValueError(f"{type(self).__name__} is not a registered potential, it cannot be rebuilt by name.")
+        return {name: float(getattr(self, name)) for name in self.parameter_names}
+
+    def __getstate__(self):
+        # compiled kernels cannot be pickled, they are compiled again when first needed
+        state = self.__dict__.copy()
+        state.pop('_numba_kernel', None)
+        return state
+
+
+class LennardJones(PairPotential):
+    """
+    Truncated Lennard-Jones potential, 4 epsilon [(sigma/r)^12 - (sigma/r)^6] within the cutoff.
+    """
+
+    name = 'lj'
+    parameter_names = ('epsilon', 'sigma')
+
+    def __init__(self, cutoff, epsilon=1.0, sigma=1.0):
+        """
+        The constructor for LennardJones class.
+
+        Parameters
+        ----------
+            cutoff : integer or float
+                Cutoff distance of the potential.
+            epsilon : float, default to 1.0
+                Depth of the potential well.
+            sigma : float, default to 1.0
+                Distance at which the potential is zero.
+        """
+
+        super().__init__(cutoff)
+        self.epsilon = epsilon
+        self.sigma = sigma
+
+    def energy(self, rij2):
+        sig_by_r6 = np.power(self.sigma**2 / rij2, 3)
+        sig_by_r12 = np.power(sig_by_r6, 2)
+        return 4.0 * self.epsilon * (sig_by_r12 - sig_by_r6)
+
+    def virial(self, rij2):
+        sig_by_r6 = np.power(self.sigma**2 / rij2, 3)
+        sig_by_r12 = np.power(sig_by_r6, 2)
+        return 24.0 * self.epsilon * (2.0 * sig_by_r12 - sig_by_r6)
+
+    def energy_and_virial(self, rij2):
+        sig_by_r6 = np.power(self.sigma**2 / rij2, 3)
+        sig_by_r12 = np.power(sig_by_r6, 2)
+        return 4.0 * self.epsilon * (sig_by_r12 - sig_by_r6), 24.0 * self.epsilon * (2.0 * sig_by_r12 - sig_by_r6)
+
+    def tail_correction(self, num_particles, volume):
+        sig_by_cutoff3 = np.power(self.sigma / self.cutoff, 3)
+        sig_by_cutoff9 = np.power(sig_by_cutoff3, 3)
+        e_correction = sig_by_cutoff9 - 3.0 * sig_by_cutoff3
+        e_correction *= 8.0 / 9.0 * np.pi * self.epsilon * self.sigma**3 * num_particles / volume * num_particles
+        return e_correction
+
+    def pressure_tail_correction(self, num_particles, volume):
+        sig_by_cutoff3 = np.power(self.sigma / self.cutoff, 3)
+        sig_by_cutoff9 = np.power(sig_by_cutoff3, 3)
+        p_correction = 2.0 / 3.0 * sig_by_cutoff9 - sig_by_cutoff3
+        p_correction *= 16.0 / 3.0 * np.pi * self.epsilon * self.sigma**3 * (num_particles / volume)**2
+        return p_correction
+
+    def energy_minimum(self):
+        rij2_min = 2.0**(1.0 / 3.0) * self.sigma**2
+        if rij2_min < self.cutoff2:
+            return rij2_min, -float(self.epsilon)
+        return float(self.cutoff2), float(LennardJones.energy(self, self.cutoff2))
+
+    def power_terms(self):
+        return [(4.0 * self.epsilon * self.sigma**12, 12.0), (-4.0 * self.epsilon * self.sigma**6, 6.0)]
+
+    def _scalar_terms(self):
+        epsilon = self.epsilon
+        sigma2 = self.sigma**2
+
+        def terms(rij2):
+            sig_by_r6 = (sigma2 / rij2)**3
+            sig_by_r12 = sig_by_r6 * sig_by_r6
+            return 4.0 * epsilon * (sig_by_r12 - sig_by_r6), 24.0 * epsilon * (2.0 * sig_by_r12 - sig_by_r6)
+
+        return terms
+
+
+class ShiftedLennardJones(LennardJones):
+    """
+    Truncated and shifted Lennard-Jones potential, which goes to zero at the cutoff.
+
+    The shifted potential is the model itself, so it has no tail correction.
+    """
+
+    name = 'lj_shifted'
+
+    def __init__(self, cutoff, epsilon=1.0, sigma=1.0):
+        super().__init__(cutoff, epsilon=epsilon, sigma=sigma)
+        self.shift = float(LennardJones.energy(self, self.cutoff2))
+
+    def energy(self, rij2):
+        return super().energy(rij2) - self.shift
+
+    def energy_and_virial(self, rij2):
+        energy, virial = super().energy_and_virial(rij2)
+        return energy - self.shift, virial
+
+    def tail_correction(self, num_particles, volume):
+        return 0.0
+
+    def pressure_tail_correction(self, num_particles, volume):
+        return 0.0
+
+    def energy_minimum(self):
+        rij2_min, e_min = super().energy_minimum()
+        return rij2_min, e_min - self.shift
+
+    def power_terms(self):
+        return None
+
+    def _scalar_terms(self):
+        epsilon = self.epsilon
+        sigma2 = self.sigma**2
+        shift = self.shift
+
+        def terms(rij2):
+            sig_by_r6 = (sigma2 / rij2)**3
+            sig_by_r12 = sig_by_r6 * sig_by_r6
+            return 4.0 * epsilon * (sig_by_r12 - sig_by_r6) - shift, 24.0 * epsilon * (2.0 * sig_by_r12 - sig_by_r6)
+
+        return terms
+
+
+class ShiftedForceLennardJones(LennardJones):
+    """
+    Shifted-force Lennard-Jones potential, whose energy and force both go to zero at the cutoff.
+
+    U(r) = U_LJ(r) - U_LJ(rc) - (r - rc) U_LJ'(rc). It has no tail correction.
+    """
+
+    name = 'lj_shifted_force'
+
+    def __init__(self, cutoff, epsilon=1.0, sigma=1.0):
+        super().__init__(cutoff, epsilon=epsilon, sigma=sigma)
+        self.shift = float(LennardJones.energy(self, self.cutoff2))
+        sig_by_rc6 = (self.sigma / self.cutoff)**6
+        self.slope = float(-24.0 * self.epsilon / self.cutoff * (2.0 * sig_by_rc6**2 - sig_by_rc6))
+
+    def energy(self, rij2):
+        return super().energy(rij2) - self.shift - (np.sqrt(rij2) - self.cutoff) * self.slope
+
+    def virial(self, rij2):
+        return super().virial(rij2) + np.sqrt(rij2) * self.slope
+
+    def energy_and_virial(self, rij2):
+        energy, virial = super().energy_and_virial(rij2)
+        r = np.sqrt(rij2)
+        return energy - self.shift - (r - self.cutoff) * self.slope, virial + r * self.slope
+
+    def tail_correction(self, num_particles, volume):
+        return 0.0
+
+    def pressure_tail_correction(self, num_particles, volume):
+        return 0.0
+
+    def energy_minimum(self):
+        # the force shift -(r - rc) slope is at least min(0, rc slope) within the cutoff
+        rij2_min, e_min = super().energy_minimum()
+        return rij2_min, e_min - self.shift + min(0.0, self.cutoff * self.slope)
+
+    def power_terms(self):
+        return None
+
+    def _scalar_terms(self):
+        epsilon = self.epsilon
+        sigma2 = self.sigma**2
+        shift = self.shift
+        slope = self.slope
+        cutoff = self.cutoff
+
+        def terms(rij2):
+            sig_by_r6 = (sigma2 / rij2)**3
+            sig_by_r12 = sig_by_r6 * sig_by_r6
+            r = np.sqrt(rij2)
+            energy = 4.0 * epsilon * (sig_by_r12 - sig_by_r6) - shift - (r - cutoff) * slope
+            return energy, 24.0 * epsilon * (2.0 * sig_by_r12 - sig_by_r6) + r * slope
+
+        return terms
+
+
+class WCA(LennardJones):
+    """
+    Weeks-Chandler-Andersen potential, the purely repulsive Lennard-Jones core shifted up by epsilon.
+
+    The cutoff is always 2^(1/6) sigma, the minimum of the Lennard-Jones potential, whatever cutoff is requested.
+    """
+
+    name = 'wca'
+
+    def __init__(self, cutoff=None, epsilon=1.0, sigma=1.0):
+        super().__init__(2.0**(1.0 / 6.0) * sigma, epsilon=epsilon, sigma=sigma)
+
+    def energy(self, rij2):
+        return super().energy(rij2) + self.epsilon
+
+    def energy_and_virial(self, rij2):
+        energy, virial = super().energy_and_virial(rij2)
+        return energy + self.epsilon, virial
+
+    def tail_correction(self, num_particles, volume):
+        return 0.0
+
+    def pressure_tail_correction(self, num_particles, volume):
+        return 0.0
+
+    def energy_minimum(self):
+        rij2_min, e_min = super().energy_minimum()
+        return rij2_min, e_min + self.epsilon
+
+    def power_terms(self):
+        return None
+
+    def _scalar_terms(self):
+        epsilon = self.epsilon
+        sigma2 = self.sigma**2
+
+        def terms(rij2):
+            sig_by_r6 = (sigma2 / rij2)**3
+            sig_by_r12 = sig_by_r6 * sig_by_r6
+            return 4.0 * epsilon * (sig_by_r12 - sig_by_r6) + epsilon, 24.0 * epsilon * (2.0 * sig_by_r12 - sig_by_r6)
+
+        return terms
+
+
+class Mie(PairPotential):
+    """
+    Truncated Mie n-m potential, C epsilon [(sigma/r)^n - (sigma/r)^m] with C = n/(n-m) (n/m)^(m/(n-m)).
+
+    The 12-6 potential is the Lennard-Jones potential. The tail correction requires m > 3.
+    """
+
+    name = 'mie'
+    parameter_names = ('n', 'm', 'epsilon', 'sigma')
+
+    def __init__(self, cutoff, n=12.0, m=6.0, epsilon=1.0, sigma=1.0):
+        """
+        The constructor for Mie class.
+
+        Parameters
+        ----------
+            cutoff : integer or float
+                Cutoff distance of the potential.
+            n : float, default to 12.0
+                Exponent of the repulsive term.
+            m : float, default to 6.0
+                Exponent of the attractive term.
+            epsilon : float, default to 1.0
+                Depth of the potential well.
+            sigma : float, default to 1.0
+                Distance at which the potential is zero.
+        """
+
+        if n <= m:
+            raise ValueError("The repulsive exponent n must be larger than the attractive exponent m.")
+        super().__init__(cutoff)
+        self.n = float(n)
+        self.m = float(m)
+        self.epsilon = epsilon
+        self.sigma = sigma
+        self.prefactor = self.n / (self.n - self.m) * (self.n / self.m)**(self.m / (self.n - self.m))
+
+    def energy(self, rij2):
+        sig_by_r2 = self.sigma**2 / rij2
+        return self.prefactor * self.epsilon * (np.power(sig_by_r2, 0.5 * self.n) - np.power(sig_by_r2, 0.5 * self.m))
+
+    def virial(self, rij2):
+        return self.energy_and_virial(rij2)[1]
+
+    def energy_and_virial(self, rij2):
+        sig_by_r2 = self.sigma**2 / rij2
+        sig_by_rn = np.power(sig_by_r2, 0.5 * self.n)
+        sig_by_rm = np.power(sig_by_r2, 0.5 * self.m)
+        factor = self.prefactor * self.epsilon
+        return factor * (sig_by_rn - sig_by_rm), factor * (self.n * sig_by_rn - self.m * sig_by_rm)
+
+    def tail_correction(self, num_particles, volume):
+        if self.m <= 3.0:
+            raise ValueError("The tail correction of the Mie potential diverges for m <= 3.")
+        sig_by_cutoff = self.sigma / self.cutoff
+        integral = (sig_by_cutoff**(self.n - 3.0) / (self.n - 3.0) - sig_by_cutoff**(self.m - 3.0) / (self.m - 3.0))
+        integral *= self.prefactor * self.epsilon * self.sigma**3
+        return 2.0 * np.pi * num_particles / volume * num_particles * integral
+
+    def pressure_tail_correction(self, num_particles, volume):
+        if self.m <= 3.0:
+            raise ValueError("The tail correction of the Mie potential diverges for m <= 3.")
+        sig_by_cutoff = self.sigma / self.cutoff
+        integral = (self.n * sig_by_cutoff**(self.n - 3.0) / (self.n - 3.0) -
+                    self.m * sig_by_cutoff**(self.m - 3.0) / (self.m - 3.0))
+        integral *= self.prefactor * self.epsilon * self.sigma**3
+        return 2.0 / 3.0 * np.pi * (num_particles / volume)**2 * integral
+
+    def energy_minimum(self):
+        rij2_min = self.sigma**2 * (self.n / self.m)**(2.0 / (self.n - self.m))
+        if rij2_min < self.cutoff2:
+            return rij2_min, -float(self.epsilon)
+        return float(self.cutoff2), float(self.energy(self.cutoff2))
+
+    def power_terms(self):
+        factor = self.prefactor * self.epsilon
+        return [(factor * self.sigma**self.n, self.n), (-factor * self.sigma**self.m, self.m)]
+
+    def _scalar_terms(self):
+        factor = self.prefactor * self.epsilon
+        sigma2 = self.sigma**2
+        n = self.n
+        m = self.m
+
+        def terms(rij2):
+            sig_by_r2 = sigma2 / rij2
+            sig_by_rn = sig_by_r2**(0.5 * n)
+            sig_by_rm = sig_by_r2**(0.5 * m)
+            return factor * (sig_by_rn - sig_by_rm), factor * (n * sig_by_rn - m * sig_by_rm)
+
+        return terms
+
+
+class Yukawa(PairPotential):
+    """
+    Truncated Yukawa (screened Coulomb) potential, epsilon exp(-kappa r) / r.
+    """
+
+    name = 'yukawa'
+    parameter_names = ('epsilon', 'kappa')
+
+    def __init__(self, cutoff, epsilon=1.0, kappa=1.0):
+        """
+        The constructor for Yukawa class.
+
+        Parameters
+        ----------
+            cutoff : integer or float
+                Cutoff distance of the potential.
+            epsilon : float, default to 1.0
+                Strength of the interaction.
+            kappa : float, default to 1.0
+                Inverse screening length.
+        """
+
+        super().__init__(cutoff)
+        self.epsilon = epsilon
+        self.kappa = kappa
+
+    def energy(self, rij2):
+        r = np.sqrt(rij2)
+        return self.epsilon * np.exp(-self.kappa * r) / r
+
+    def virial(self, rij2):
+        return self.energy_and_virial(rij2)[1]
+
+    def energy_and_virial(self, rij2):
+        r = np.sqrt(rij2)
+        energy = self.epsilon * np.exp(-self.kappa * r) / r
+        return energy, energy * (self.kappa * r + 1.0)
+
+    def tail_correction(self, num_particles, volume):
+        kappa_rc = self.kappa * self.cutoff
+        integral = self.epsilon * np.exp(-kappa_rc) * (kappa_rc + 1.0) / self.kappa**2
+        return 2.0 * np.pi * num_particles / volume * num_particles * integral
+
+    def pressure_tail_correction(self, num_particles, volume):
+        kappa_rc = self.kappa * self.cutoff
+        integral = self.epsilon * np.exp(-kappa_rc) * (kappa_rc**2 + 3.0 * kappa_rc + 3.0) / self.kappa**2
+        return 2.0 / 3.0 * np.pi * (num_particles / volume)**2 * integral
+
+    def energy_minimum(self):
+        if self.epsilon < 0.0:
+            return super().energy_minimum()
+        return float(self.cutoff2), float(self.energy(self.cutoff2))
+
+    def _scalar_terms(self):
+        epsilon = self.epsilon
+        kappa = self.kappa
+
+        def terms(rij2):
+            r = np.sqrt(rij2)
+            energy = epsilon * np.exp(-kappa * r) / r
+            return energy, energy * (kappa * r + 1.0)
+
+        return terms
+
+
+class TabulatedPotential(PairPotential):
+    """
+    Pair potential sampled once on a grid of squared distances and evaluated by table lookup.
+
+    The table spans r_min^2 to cutoff^2 with evenly spaced points, and is interpolated either linearly or with cubic
+    Hermite polynomials, so each pair costs a gather plus a few multiply-adds whatever the closed form of the
+    potential. The pair virial is tabulated the same way. Distances below r_min, which only occur for strong
+    overlaps, are evaluated with the base potential.
+
+    Attributes
+    ----------
+        base : PairPotential or function
+            Potential being tabulated.
+        kind : string, either 'linear' or 'cubic'
+            Interpolation between the table points.
+        n_points : integer
+            Number of table points.
+        r_min : float
+            Smallest tabulated distance.
+        error_bound : float
+            Largest absolute interpolation error found when checking the table against the base potential.
+    """
+
+    name = 'tabulated'
+
+    def __init__(self, cutoff, base='lj', base_params=None, n_points=1000, kind='linear', r_min=0.8,
+                 tolerance=None, max_points=2**22):
+        """
+        The constructor for TabulatedPotential class.
+
+        Parameters
+        ----------
+            cutoff : integer or float
+                Cutoff distance of the potential. A base PairPotential keeps its own cutoff.
+            base : string, PairPotential or function, default to 'lj'
+                Potential to tabulate: a registered name, a PairPotential, or any function of the squared distance
+                accepting NumPy arrays.
+            base_params : dict, optional
+                Parameters of the base potential if it is given by name.
+            n_points : integer, default to 1000
+                Number of table points.
+            kind : string, either 'linear' or 'cubic', default to 'linear'
+                Interpolation between the table points.
+            r_min : float, default to 0.8
+                Smallest tabulated distance.
+            tolerance : float, optional
+                If set, the number of points is doubled, starting from n_points, until error_bound is below it.
+            max_points : integer, default to 2**22
+                Largest table allowed when refining it to reach the tolerance.
+        """
+
+        if isinstance(base, str):
+            base = get_potential(base, cutoff, **(base_params or {}))
+        if isinstance(base, PairPotential):
+            cutoff = base.cutoff
+        if kind not in ('linear', 'cubic'):
+            raise ValueError("kind must be either 'linear' or 'cubic'")
+        super().__init__(cutoff)
+        self.base = base
+        self.kind = kind
+        self.r_min = r_min
+        self.r2_min = r_min**2
+
+        self._build(n_points)
+        while tolerance is not None and self.error_bound > tolerance:
+            if 2 * self.n_points > max_points:
+                raise ValueError(f"Could not reach a tolerance of {tolerance} with {max_points} table points.")
+            self._build(2 * self.n_points)
+
+    def _base_energy(self, rij2):
+        """
+        Evaluate the base potential.
+
+        Parameters
+        ----------
+        rij2 : numpy array
+            The square of the distance between particles i and j.
+
+        Returns
+        -------
+        energy : numpy array
+            Pair energy of the base potential at every distance.
+        """
+
+        if isinstance(self.base, PairPotential):
+            return self.base.energy(rij2)
+        return self.base(rij2)
+
+    def _base_virial(self, rij2):
+        """
+        Evaluate the pair virial of the base potential.
+
+        A base given as a plain function is differentiated numerically with central differences in rij2, using
+        w = -2 rij2 du/d(rij2).
+
+        Parameters
+        ----------
+        rij2 : numpy array
+            The square of the distance between particles i and j.
+
+        Returns
+        -------
+        virial : numpy array
+            Pair virial of the base potential at every distance.
+        """
+
+        if isinstance(self.base, PairPotential):
+            return self.base.virial(rij2)
+        step = 1e-6 * rij2
+        return -rij2 * (self.base(rij2 + step) - self.base(rij2 - step)) / step
+
+    def _coefficients(self, values):
+        """
+        Interpolation coefficients of every interval of a table.
+
+        Parameters
+        ----------
+        values : numpy array (n_points)
+            Tabulated values on the grid.
+
+        Returns
+        -------
+        coefficients : tuple of numpy arrays
+            Coefficients a, b, c, d of the polynomial a + t (b + t (c + t d)) of every interval.
+        """
+
+        n_intervals = len(values) - 1
+        if self.kind == 'linear':
+            return values[:-1].copy(), np.diff(values), np.zeros(n_intervals), np.zeros(n_intervals)
+        slopes = np.gradient(values, edge_order=2)
+        return (values[:-1].copy(), slopes[:-1].copy(), 3.0 * np.diff(values) - 2.0 * slopes[:-1] - slopes[1:],
+                -2.0 * np.diff(values) + slopes[:-1] + slopes[1:])
+
+    def _build(self, n_points):
+        """
+        Sample the base potential and store the interpolation coefficients of every interval.
+
+        For each interval the energy is a + t (b + t (c + t d)) with t in [0, 1) the position within the interval,
+        and the virial is interpolated the same way from its own table. The error bound of the energy is measured
+        at the quarter points of every interval.
+
+        Parameters
+        ----------
+        n_points : integer
+            Number of table points.
+
+        Returns
+        -------
+        None
+        """
+
+        self.n_points = n_points
+        self.dr2 = (self.cutoff2 - self.r2_min) / (n_points - 1)
+        grid = self.r2_min + self.dr2 * np.arange(n_points)
+        self._a, self._b, self._c, self._d = self._coefficients(self._base_energy(grid))
+        self._virial_table = self._coefficients(self._base_virial(grid))
+
+        check = self.r2_min + self.dr2 * np.arange(0.25, n_points - 1, 0.25)
+        self.error_bound = np.abs(self.energy(check) - self._base_energy(check)).max()
+
+    def _locate(self, rij2):
+        """
+        Find the table interval of every distance and the position within it.
+
+        Parameters
+        ----------
+        rij2 : numpy array
+            The square of the distance between particles i and j.
+
+        Returns
+        -------
+        k : numpy array
+            Index of the interval of every distance.
+        t : numpy array
+            Position of every distance within its interval, in [0, 1) inside the table.
+        """
+
+        x = (rij2 - self.r2_min) * (1.0 / self.dr2)
+        k = x.astype(np.intp)
+        np.clip(k, 0, self.n_points - 2, out=k)
+        return k, x - k
+
+    def _interpolate(self, coefficients, k, t):
+        """
+        Evaluate the interpolation polynomials of a table.
+
+        Parameters
+        ----------
+        coefficients : tuple of numpy arrays
+            Coefficients a, b, c, d of every interval.
+        k : numpy array
+            Index of the interval of every distance.
+        t : numpy array
+            Position of every distance within its interval.
+
+        Returns
+        -------
+        values : numpy array
+            Interpolated values.
+        """
+
+        a, b, c, d = coefficients
+        if self.kind == 'linear':
+            values = b.take(k)
+        else:
+            values = d.take(k)
+            values *= t
+            values += c.take(k)
+            values *= t
+            values += b.take(k)
+        values *= t
+        values += a.take(k)
+        return values
+
+    def energy(self, rij2):
+        return self.energy_and_virial(rij2, virial=False)
+
+    def virial(self, rij2):
+        scalar = np.ndim(rij2) == 0
+        rij2 = np.atleast_1d(rij2)
+        k, t = self._locate(rij2)
+        virial = self._interpolate(self._virial_table, k, t)
+        if rij2.size > 0 and rij2.min() < self.r2_min:
+            below = rij2 < self.r2_min
+            virial[below] = self._base_virial(rij2[below])
+        return virial[0] if scalar else virial
+
+    def energy_and_virial(self, rij2, virial=True):
+        """
+        Calculate the pair energies, and optionally the virials, sharing the table lookup.
+
+        Parameters
+        ----------
+        rij2 : float or numpy array
+            The square of the distance between particles i and j.
+        virial : Boolean, default to True
+            If False only the energies are calculated.
+
+        Returns
+        -------
+        energy : float or numpy array
+            Pair energy of every distance.
+        virial : float or numpy array
+            Pair virial of every distance, only returned if virial is True.
+        """
+
+        scalar = np.ndim(rij2) == 0
+        rij2 = np.atleast_1d(rij2)
+        k, t = self._locate(rij2)
+        energy = self._interpolate((self._a, self._b, self._c, self._d), k, t)
+        if virial:
+            pair_virial = self._interpolate(self._virial_table, k, t)
+        if rij2.size > 0 and rij2.min() < self.r2_min:
+            below = rij2 < self.r2_min
+            energy[below] = self._base_energy(rij2[below])
+            if virial:
+                pair_virial[below] = self._base_virial(rij2[below])
+        if not virial:
+            return energy[0] if scalar else energy
+        return (energy[0], pair_virial[0]) if scalar else (energy, pair_virial)
+
+    def tail_correction(self, num_particles, volume):
+        if isinstance(self.base, PairPotential):
+            return self.base.tail_correction(num_particles, volume)
+        return 0.0
+
+    def pressure_tail_correction(self, num_particles, volume):
+        if isinstance(self.base, PairPotential):
+            return self.base.pressure_tail_correction(num_particles, volume)
+        return 0.0
+
+    def energy_minimum(self):
+        if self.kind != 'linear':
+            return super().energy_minimum()
+        # a linear interpolant never goes below its lowest table point, and distances below r_min, evaluated
+        # with the base potential, are always closer than that point
+        values = np.append(self._a, self._a[-1] + self._b[-1])
+        k = int(np.argmin(values))
+        return self.r2_min + k * self.dr2, float(values[k])
+
+    def _scalar_terms(self):
+        if not isinstance(self.base, PairPotential):
+            raise ValueError("The 'numba' backend can only tabulate registered potentials.")
+        base_kernel = self.base.numba_kernel()
+        a, b, c, d = self._a, self._b, self._c, self._d
+        wa, wb, wc, wd = self._virial_table
+        r2_min = self.r2_min
+        inv_dr2 = 1.0 / self.dr2
+        last = self.n_points - 2
+
+        def terms(rij2):
+            if rij2 < r2_min:
+                return base_kernel(rij2)
+            x = (rij2 - r2_min) * inv_dr2
+            k = min(int(x), last)
+            t = x - k
+            return a[k] + t * (b[k] + t * (c[k] + t * d[k])), wa[k] + t * (wb[k] + t * (wc[k] + t * wd[k]))
+
+        return terms
+
+    def get_parameters(self):
+        if not isinstance(self.base, PairPotential):
+            raise ValueError("A potential tabulating a plain function cannot be rebuilt by name.")
+        # the table is sampled again from the base potential, at the final number of points of a refined one
+        return {'base': self.base.name, 'base_params': self.base.get_parameters(), 'n_points': int(self.n_points),
+                'kind': self.kind, 'r_min': float(self.r_min)}
+
+
+POTENTIALS = {
+    potential.name: potential
+    for potential in (LennardJones, ShiftedLennardJones, ShiftedForceLennardJones, WCA, Mie, Yukawa,
+                      TabulatedPotential)
+}
+
+
+def get_potential(potential, cutoff, **params):
+    """
+    Get a pair potential from the registry.
+
+    Parameters
+    ----------
+    potential : string or PairPotential
+        Name of a registered potential ('lj', 'lj_shifted', 'lj_shifted_force', 'wca', 'mie', 'yukawa' or
+        'tabulated'), or an already built PairPotential, which is returned unchanged.
+    cutoff : integer or float
+        Cutoff distance of the potential.
+    **params :
+        Parameters of the potential, for example epsilon and sigma.
+
+    Returns
+    -------
+    potential : PairPotential
+        The pair potential.
+    """
+
+    if isinstance(potential, PairPotential):
+        return potential
+    if potential not in POTENTIALS:
+        raise ValueError(f"Unknown potential '{potential}', must be one of {sorted(POTENTIALS)}")
+    return POTENTIALS[potential](cutoff, **params)
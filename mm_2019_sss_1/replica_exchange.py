@@ -0,0 +1,339 @@
+import multiprocessing
+import os
+import traceback
+import numpy as np
+from .mc import MC
+from .rng import RandomStream
+
+
+def _replica_worker(connection, reduced_temp, seed, mc_kwargs):
+    """
+    Run one MC simulation in a worker process, driven by commands received through a pipe.
+
+    The commands are ('run', (n_steps, freq, save_dir)), answered with the current total energy of the replica,
+    ('set_temperature', reduced_temp), ('get_energy', None), answered with the energy trace, and ('stop', None).
+    Answers are sent as ('ok', value). If the simulation raises, the traceback is sent as ('error', traceback)
+    in place of the next answer and the worker exits.
+
+    Parameters
+    ----------
+    connection : multiprocessing Connection
+        Worker end of the pipe to the driver.
+    reduced_temp : float
+        Initial reduced temperature of the replica.
+    seed : numpy SeedSequence
+        Seed of the random number stream of the replica.
+    mc_kwargs : dict
+        Remaining arguments of MC.
+
+    Returns
+    -------
+    None
+    """
+
+    try:
+        sim = MC(reduced_temp=reduced_temp, seed=seed, **mc_kwargs)
+        while True:
+            command, argument = connection.recv()
+            if command == 'run':
+                sim.run(*argument)
+                connection.send(('ok', sim.get_energy()[-1] * sim.get_snapshot().num_particles))
+            elif command == 'set_temperature':
+                sim.beta = 1. / float(argument)
+            elif command == 'get_energy':
+                connection.send(('ok', sim.get_energy()))
+            elif command == 'stop':
+                return
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+class ReplicaExchange:
+    """
+    A parallel tempering driver running one MC simulation per temperature in worker processes.
+
+    The replicas run independently between exchanges. At each exchange, swaps are attempted between neighbouring
+    temperatures, alternating between the even and the odd pairs, from the current total energies of the replicas.
+    An accepted swap exchanges the temperatures of the two replicas, so no coordinates leave their process.
+
+    Attributes
+    ----------
+        temperatures : numpy array
+            Reduced temperatures of the ladder, in increasing order.
+        replica_of : numpy array
+            Index of the replica currently running at each temperature.
+        n_exchanges : int
+            Number of exchange rounds done so far.
+
+    Methods
+    -------
+        run :
+            Alternate between running all the replicas and attempting temperature swaps.
+        get_energy :
+            Get the total energies recorded at each temperature after every exchange round.
+        get_acceptance_rates :
+            Get the swap acceptance rate of every pair of neighbouring temperatures.
+        get_replica_energy :
+            Get the full energy trace of one replica.
+        close :
+            Stop the worker processes.
+    """
+    def __init__(self, temperatures, seed=None, save_dir='./results', **mc_kwargs):
+        """
+        Initialize a replica exchange simulation, starting one worker process per temperature.
+
+        Parameters
+        ----------
+        temperatures : list of float
+            Reduced temperatures of the ladder.
+        seed : integer, numpy SeedSequence or None, default to None
+            Seed of the swap decisions. The random number streams of the replicas are spawned from it.
+        save_dir : str, default to './results'
+            The file path to store the results, one sub-directory per replica.
+        **mc_kwargs :
+            Arguments of MC shared by all the replicas, for example method, num_particles, reduced_den,
+            max_displacement and cutoff.
+
+        Returns
+        -------
+        None
+        """
+
+        self.temperatures = np.sort(np.asarray(temperatures, dtype=float))
+        if np.any(self.temperatures <= 0.0):
+            raise ValueError("reduced temperatures must be greater than zero.")
+        n_temps = len(self.temperatures)
+        self.save_dir = save_dir
+        self.replica_of = np.arange(n_temps)
+        self.n_exchanges = 0
+        self._rng = RandomStream(seed)
+        self._n_attempts = np.zeros(n_temps - 1, dtype=np.intp)
+        self._n_swaps = np.zeros(n_temps - 1, dtype=np.intp)
+        self._energy_array = np.zeros((n_temps, 0))
+
+        self._connections = []
+        self._workers = []
+        for temperature, child_seed in zip(self.temperatures, self._rng.seed_sequence.spawn(n_temps)):
+            connection, worker_connection = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_replica_worker,
+                                             args=(worker_connection, temperature, child_seed, mc_kwargs),
+                                             daemon=True)
+            worker.start()
+            # only the worker holds its end, so the driver sees the pipe close if the worker dies
+            worker_connection.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+    def _send(self, replica, command):
+        """
+        Send a command to a replica.
+
+        Parameters
+        ----------
+        replica : int
+            Index of the replica.
+        command : tuple
+            Command and its argument.
+
+        Returns
+        -------
+        None
+        """
+
+        try:
+            self._connections[replica].send(command)
+        except OSError:
+            # the worker has exited, its error is still waiting in the pipe
+            self._receive(replica)
+            raise
+
+    def _receive(self, replica):
+        """
+        Receive the answer of a replica to its last command.
+
+        Parameters
+        ----------
+        replica : int
+            Index of the replica.
+
+        Returns
+        -------
+        value :
+            Answer of the replica.
+        """
+
+        try:
+            status, value = self._connections[replica].recv()
+        except EOFError:
+            raise RuntimeError(f"Replica {replica} exited without answering.") from None
+        if status == 'error':
+            raise RuntimeError(f"Replica {replica} failed:\n{value}")
+        return value
+
+    def _attempt_swaps(self, energies, first):
+        """
+        Attempt temperature swaps between the pairs of neighbouring temperatures (first, first + 1), (first + 2,
+        first + 3), ...
+
+        A swap between temperatures i and j is accepted with probability min(1, exp((beta_i - beta_j) (E_i - E_j))).
+
+        Parameters
+        ----------
+        energies : numpy array
+            Current total energy of every replica, indexed by replica.
+        first : int
+            Index of the lowest temperature of the first pair, 0 or 1.
+
+        Returns
+        -------
+        None
+        """
+
+        betas = 1. / self.temperatures
+        for i_temp in range(first, len(self.temperatures) - 1, 2):
+            replica_i = self.replica_of[i_temp]
+            replica_j = self.replica_of[i_temp + 1]
+            delta = (betas[i_temp] - betas[i_temp + 1]) * (energies[replica_i] - energies[replica_j])
+            self._n_attempts[i_temp] += 1
+            if delta >= 0.0 or self._rng.uniform() < np.exp(delta):
+                self._n_swaps[i_temp] += 1
+                self.replica_of[i_temp], self.replica_of[i_temp + 1] = replica_j, replica_i
+                self._send(replica_i, ('set_temperature', self.temperatures[i_temp + 1]))
+                self._send(replica_j, ('set_temperature', self.temperatures[i_temp]))
+
+    def run(self, n_exchanges, steps_per_exchange, freq=None):
+        """
+        Alternate between running all the replicas and attempting temperature swaps.
+
+        Parameters
+        ----------
+        n_exchanges : int
+            Number of exchange rounds.
+        steps_per_exchange : int
+            Number of MC steps run by every replica between exchanges.
+        freq : int, optional
+            Frequency of the log and displacement tuning of the replicas, default to steps_per_exchange.
+
+        Returns
+        -------
+        None
+        """
+
+        freq = steps_per_exchange if freq is None else freq
+        energy_array = np.zeros((len(self.temperatures), n_exchanges))
+        try:
+            for i_exchange in range(n_exchanges):
+                for replica in range(len(self._connections)):
+                    save_dir = os.path.join(self.save_dir, f'replica_{replica}')
+                    self._send(replica, ('run', (steps_per_exchange, freq, save_dir)))
+                energies = np.array([self._receive(replica) for replica in range(len(self._connections))])
+                energy_array[:, i_exchange] = energies[self.replica_of]
+                self._attempt_swaps(energies, self.n_exchanges % 2)
+                self.n_exchanges += 1
+        except BaseException:
+            # the other replicas may still be running, and cannot be resumed consistently
+            self._terminate()
+            raise
+        self._energy_array = np.concatenate([self._energy_array, energy_array], axis=1)
+
+    def get_energy(self):
+        """
+        Get the total energies recorded at each temperature after every exchange round.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        2d Numpy array (temperatures x exchanges) of total energies, before the swaps of each round.
+        """
+
+        if (self.n_exchanges == 0):
+            raise ValueError("Simulation has not started running!")
+        return self._energy_array
+
+    def get_acceptance_rates(self):
+        """
+        Get the swap acceptance rate of every pair of neighbouring temperatures.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        1d Numpy array of acceptance rates, the i-th for the swaps between temperatures i and i + 1.
+        """
+
+        return self._n_swaps / np.maximum(self._n_attempts, 1)
+
+    def get_replica_energy(self, replica):
+        """
+        Get the full energy trace of one replica.
+
+        Parameters
+        ----------
+        replica : int
+            Index of the replica, which started at temperatures[replica].
+
+        Returns
+        -------
+        1d Numpy array of the energy per particle of the replica at every step.
+        """
+
+        self._send(replica, ('get_energy', None))
+        return self._receive(replica)
+
+    def _terminate(self):
+        """
+        Terminate the worker processes still running and close the pipes.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        for connection, worker in zip(self._connections, self._workers):
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+            connection.close()
+        self._workers = []
+        self._connections = []
+
+    def close(self):
+        """
+        Stop the worker processes, terminating those that do not stop.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        try:
+            for connection, worker in zip(self._connections, self._workers):
+                if worker.is_alive():
+                    try:
+                        connection.send(('stop', None))
+                    except OSError:
+                        continue
+                    worker.join(timeout=10.0)
+        finally:
+            self._terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
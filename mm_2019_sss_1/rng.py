@@ -0,0 +1,159 @@
+import numpy as np
+
+
+class RandomStream:
+    """
+    A seeded random number stream for the Monte Carlo loop, drawing its numbers in large blocks.
+
+    Particle indices, displacement vectors and acceptance uniforms are each pre-drawn from a numpy Generator in
+    blocks of block_size and refilled lazily once used up, so a step costs a few array reads instead of several
+    calls into the random number generator. Two streams built from the same seed produce the same numbers.
+
+    Attributes
+    ----------
+        seed_sequence : numpy SeedSequence
+            Seed of the stream, also used to spawn independent streams.
+        generator : numpy Generator
+            Generator the blocks are drawn from.
+        block_size : integer
+            Number of values drawn at once for each kind of random number.
+
+    Methods
+    -------
+        particle_index :
+            Draw the index of a particle.
+        displacement :
+            Draw a displacement vector with components uniform in [-1, 1).
+        uniform :
+            Draw a uniform number in [0, 1), used for the acceptance tests.
+        permutation :
+            Draw a random order of the particles.
+        spawn :
+            Create independent streams, for example one per worker of a parallel run.
+    """
+    def __init__(self, seed=None, block_size=4096):
+        """
+        The constructor for RandomStream class.
+
+        Parameters
+        ----------
+            seed : integer, numpy SeedSequence or None, default to None
+                Seed of the stream. If None, fresh entropy is taken from the operating system.
+            block_size : integer, default to 4096
+                Number of values drawn at once for each kind of random number.
+        """
+
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        self.generator = np.random.Generator(np.random.PCG64(self.seed_sequence))
+        self.block_size = block_size
+
+        self._index_uniforms = np.empty(0)
+        self._displacements = np.empty((0, 3))
+        self._uniforms = np.empty(0)
+        self._next_index = 0
+        self._next_displacement = 0
+        self._next_uniform = 0
+
+    def particle_index(self, num_particles):
+        """
+        Draw the index of a particle.
+
+        The indices are stored as uniforms and scaled on use, so the number of particles may change between draws.
+
+        Parameters
+        ----------
+        num_particles : integer
+            Number of particles to choose from.
+
+        Returns
+        -------
+        i_particle : integer
+            Index uniformly distributed over 0, ..., num_particles - 1.
+        """
+
+        if self._next_index == len(self._index_uniforms):
+            self._index_uniforms = self.generator.random(self.block_size)
+            self._next_index = 0
+        i_particle = int(self._index_uniforms[self._next_index] * num_particles)
+        self._next_index += 1
+        return i_particle
+
+    def displacement(self):
+        """
+        Draw a displacement vector with components uniform in [-1, 1).
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        displacement : numpy array (3)
+            Displacement vector, to be scaled by the maximum displacement.
+        """
+
+        if self._next_displacement == len(self._displacements):
+            self._displacements = 2.0 * self.generator.random((self.block_size, 3)) - 1.0
+            self._next_displacement = 0
+        displacement = self._displacements[self._next_displacement]
+        self._next_displacement += 1
+        return displacement
+
+    def uniform(self):
+        """
+        Draw a uniform number in [0, 1), used for the acceptance tests.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        random_number : float
+            Uniform random number.
+        """
+
+        if self._next_uniform == len(self._uniforms):
+            self._uniforms = self.generator.random(self.block_size)
+            self._next_uniform = 0
+        random_number = self._uniforms[self._next_uniform]
+        self._next_uniform += 1
+        return random_number
+
+    def permutation(self, num_particles):
+        """
+        Draw a random order of the particles.
+
+        Parameters
+        ----------
+        num_particles : integer
+            Number of particles.
+
+        Returns
+        -------
+        order : numpy array (num_particles)
+            Random permutation of 0, ..., num_particles - 1.
+        """
+
+        return self.generator.permutation(num_particles)
+
+    def spawn(self, n_streams):
+        """
+        Create independent streams, for example one per worker of a parallel run.
+
+        Parameters
+        ----------
+        n_streams : integer
+            Number of streams to create.
+
+        Returns
+        -------
+        streams : list of RandomStream
+            Streams seeded from children of seed_sequence, statistically independent of this stream and of each
+            other.
+        """
+
+        return [RandomStream(child, self.block_size) for child in self.seed_sequence.spawn(n_streams)]
@@ -11,6 +11,9 @@ import numpy as np
 import glob
 import shutil
 
+# np.trapz was renamed np.trapezoid in NumPy 2.0
+trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
 
 @pytest.fixture()
 def trial_sim():
@@ -32,6 +35,18 @@ def trial_sim():
     return _get_trial_sim
 
 
+def assert_consistent_energy(sim, cutoff, **energy_kwargs):
+    """
+    Check the last energy of a run against a fresh calculation on its final snapshot, and return that calculation.
+    """
+
+    G = sim.get_snapshot()
+    E = mm.energy.Energy(G, cutoff=cutoff, **energy_kwargs)
+    expected = (E.calculate_total_pair_energy() + E.calculate_tail_correction()) / G.num_particles
+    assert np.isclose(sim.get_energy()[-1], expected)
+    return E
+
+
 def test_mm_2019_sss_1_imported():
     """Sample test, will always pass so long as import statement worked"""
     assert "mm_2019_sss_1" in sys.modules
@@ -150,3 +165,943 @@ def test_run():
     sim.run(n_steps=5000, freq=100, save_snaps=True)
     sim.plot(energy_plot=True)
     shutil.rmtree("./results", ignore_errors=True)
+
+
+def test_cell_list_particle_energy():
+    """
+    Check the cell-list particle energy matches the all-pairs scan, also after particles are moved.
+    """
+
+    G = mm.geom.Geom(method='random', num_particles=500, reduced_den=0.9)
+    E_all = mm.energy.Energy(G, cutoff=2.5)
+    E_cell = mm.energy.Energy(G, cutoff=2.5, neighbor_method='cell')
+    assert G.cell_list.n_cells_side == 3
+
+    for i_particle in range(0, 500, 7):
+        G.move_particle(i_particle, G.wrap(G.coordinates[i_particle] + 0.9))
+    for i_particle in range(0, 500, 11):
+        expected = E_all.get_particle_energy(i_particle, G.coordinates)
+        calculated = E_cell.get_particle_energy(i_particle, G.coordinates)
+        assert np.isclose(calculated, expected)
+    assert G.cell_list.counts.sum() == 500
+
+
+def test_verlet_list_particle_energy():
+    """
+    Check the Verlet-list particle energy matches the all-pairs scan and that the lists are rebuilt after large moves.
+    """
+
+    G = mm.geom.Geom(method='random', num_particles=500, reduced_den=0.9)
+    E_all = mm.energy.Energy(G, cutoff=2.5)
+    E_verlet = mm.energy.Energy(G, cutoff=2.5, neighbor_method='verlet', skin=0.4)
+    assert E_verlet.get_n_rebuilds() == 1
+
+    for i_particle in range(0, 500, 7):
+        E_verlet.update_particle(i_particle, G.wrap(G.coordinates[i_particle] + 0.1))
+    assert E_verlet.get_n_rebuilds() == 1
+    E_verlet.update_particle(0, G.wrap(G.coordinates[0] + 0.3))
+    assert E_verlet.get_n_rebuilds() == 2
+
+    for i_particle in range(0, 500, 11):
+        expected = E_all.get_particle_energy(i_particle, G.coordinates)
+        calculated = E_verlet.get_particle_energy(i_particle, G.coordinates)
+        assert np.isclose(calculated, expected)
+
+
+@pytest.mark.parametrize("neighbor_method", ['all', 'cell', 'verlet'])
+def test_get_delta_energy(neighbor_method):
+    """
+    Check the single-pass energy change of a trial move matches two particle energy evaluations.
+    """
+
+    G = mm.geom.Geom(method='random', num_particles=500, reduced_den=0.9)
+    E = mm.energy.Energy(G, cutoff=2.5, neighbor_method=neighbor_method)
+
+    for i_particle in range(0, 500, 13):
+        old_coordinate = G.coordinates[i_particle].copy()
+        new_coordinate = G.wrap(old_coordinate + np.array([0.2, -0.15, 0.1]))
+        calculated = E.get_delta_energy(i_particle, old_coordinate, new_coordinate)
+        assert np.array_equal(G.coordinates[i_particle], old_coordinate)
+
+        old_energy = E.get_particle_energy(i_particle, G.coordinates)
+        E.update_particle(i_particle, new_coordinate)
+        expected = E.get_particle_energy(i_particle, G.coordinates) - old_energy
+        assert np.isclose(calculated, expected)
+
+
+@pytest.mark.parametrize("neighbor_method", ['all', 'cell', 'verlet'])
+def test_particle_energy_cache(neighbor_method):
+    """
+    Check the maintained per-particle energies stay equal to a fresh calculation after accepted moves, up to the
+    round-off left by the largest energy the cache has held, since random configurations may start with overlaps.
+    """
+
+    G = mm.geom.Geom(method='random', num_particles=300, reduced_den=0.8, rng=np.random.default_rng(4))
+    E = mm.energy.Energy(G, cutoff=2.5, neighbor_method=neighbor_method)
+    E.initialize_particle_energies()
+
+    largest_energy = np.abs(E.particle_energies).max()
+    for i_particle in range(0, 300, 3):
+        old_coordinate = G.coordinates[i_particle]
+        new_coordinate = G.wrap(old_coordinate + np.array([0.25, -0.2, 0.3]))
+        expected_delta = E.get_particle_energy(i_particle, G.coordinates)
+        calculated_delta = E.get_delta_energy(i_particle, old_coordinate, new_coordinate)
+        E.update_particle(i_particle, new_coordinate)
+        largest_energy = max(largest_energy, np.abs(E.particle_energies).max())
+        expected_delta = E.get_particle_energy(i_particle, G.coordinates) - expected_delta
+        assert np.isclose(calculated_delta, expected_delta)
+
+    round_off = 300 * np.finfo(float).eps * largest_energy
+    expected = np.array([E.get_particle_energy(i_particle, G.coordinates) for i_particle in range(300)])
+    assert np.allclose(E.particle_energies, expected, atol=round_off)
+    assert np.isclose(E.get_total_pair_energy(), E.calculate_total_pair_energy(), atol=300 * round_off)
+
+
+def test_blocked_total_pair_energy():
+    """
+    Check the blocked total pair energy does not depend on the memory ceiling and matches the per-particle sum.
+    """
+
+    G = mm.geom.Geom(method='random', num_particles=400, reduced_den=0.8)
+    E = mm.energy.Energy(G, cutoff=2.5)
+    expected = 0.5 * sum(E.get_particle_energy(i_particle, G.coordinates) for i_particle in range(400))
+
+    E_small = mm.energy.Energy(G, cutoff=2.5, block_memory=10000)
+    assert np.isclose(E.calculate_total_pair_energy(), expected)
+    assert np.isclose(E_small.calculate_total_pair_energy(), expected)
+    particle_energies = E_small.initialize_particle_energies()
+    assert np.isclose(E_small.get_total_pair_energy(), expected)
+    assert np.isclose(particle_energies[17], E.get_particle_energy(17, G.coordinates))
+
+
+@pytest.mark.parametrize("neighbor_method", ['all', 'cell'])
+def test_numba_backend(neighbor_method):
+    """
+    Check the compiled backend gives the same energies as the NumPy backend.
+    """
+
+    pytest.importorskip("numba")
+    G = mm.geom.Geom(method='random', num_particles=300, reduced_den=0.8)
+    E_numpy = mm.energy.Energy(G, cutoff=2.5, neighbor_method=neighbor_method)
+    E_numba = mm.energy.Energy(G, cutoff=2.5, neighbor_method=neighbor_method, backend='numba')
+
+    assert np.isclose(E_numba.pair_energy(2.0), E_numpy.pair_energy(2.0))
+    assert np.isclose(E_numba.calculate_total_pair_energy(), E_numpy.calculate_total_pair_energy())
+    assert np.isclose(E_numba.get_particle_energy(5, G.coordinates), E_numpy.get_particle_energy(5, G.coordinates))
+    new_coordinate = G.wrap(G.coordinates[5] + 0.3)
+    assert np.isclose(E_numba.get_delta_energy(5, G.coordinates[5], new_coordinate),
+                      E_numpy.get_delta_energy(5, G.coordinates[5], new_coordinate))
+    E_numba.initialize_particle_energies()
+    E_numba.get_delta_energy(5, G.coordinates[5], new_coordinate)
+    E_numba.update_particle(5, new_coordinate)
+    assert np.allclose(E_numba.particle_energies, E_numpy.initialize_particle_energies())
+
+
+def test_numba_backend_fallback(monkeypatch):
+    """
+    Check the NumPy backend is used with a warning if Numba is not available.
+    """
+
+    monkeypatch.setattr(mm.kernels, 'numba_available', False)
+    G = mm.geom.Geom(method='random', num_particles=10, reduced_den=0.8)
+    with pytest.warns(UserWarning):
+        E = mm.energy.Energy(G, cutoff=2.5, backend='numba')
+    assert E.backend == 'numpy'
+
+
+def test_potential_registry():
+    """
+    Check the registered potentials against their closed forms and the tail corrections against numerical integrals.
+    """
+
+    rij2 = np.array([0.9, 1.5, 4.0])
+    r = np.sqrt(rij2)
+    lj = 4.0 * (r**-12 - r**-6)
+    lj_rc = 4.0 * (2.5**-12 - 2.5**-6)
+
+    potential = mm.potentials.get_potential('lj', 2.5)
+    assert np.allclose(potential.energy(rij2), lj)
+    potential = mm.potentials.get_potential('lj_shifted', 2.5)
+    assert np.allclose(potential.energy(rij2), lj - lj_rc)
+    assert np.isclose(potential.energy(2.5**2), 0.0)
+    potential = mm.potentials.get_potential('lj_shifted_force', 2.5)
+    assert np.isclose(potential.energy(2.5**2), 0.0)
+    assert np.isclose(potential.energy(2.5**2 - 1e-6), 0.0)
+    potential = mm.potentials.get_potential('wca', 3.0)
+    assert np.isclose(potential.cutoff, 2.0**(1.0 / 6.0))
+    assert np.isclose(potential.energy(potential.cutoff2), 0.0)
+    potential = mm.potentials.get_potential('mie', 2.5, n=12, m=6)
+    assert np.allclose(potential.energy(rij2), lj)
+
+    # 2 pi N rho integral from rc to infinity of r^2 u(r), with rho = N / V = 1
+    r_grid = np.linspace(2.5, 200.0, 400001)
+    for name, params in [('lj', {}), ('mie', {'n': 9, 'm': 6}), ('yukawa', {'kappa': 0.5})]:
+        potential = mm.potentials.get_potential(name, 2.5, **params)
+        expected = 2.0 * np.pi * 10 * trapezoid(r_grid**2 * potential.energy(r_grid**2), r_grid)
+        assert np.isclose(potential.tail_correction(10, 10), expected, rtol=1e-4)
+
+    for name, params in [('lj_shifted_force', {'sigma': 1.1}), ('wca', {}), ('mie', {'n': 9, 'm': 6}),
+                         ('yukawa', {'kappa': 0.5})]:
+        potential = mm.potentials.get_potential(name, 2.5, **params)
+        rebuilt = mm.potentials.get_potential(potential.name, potential.cutoff, **potential.get_parameters())
+        assert type(rebuilt) is type(potential)
+        assert np.array_equal(rebuilt.energy(rij2), potential.energy(rij2))
+
+    G = mm.geom.Geom(method='random', num_particles=1000, reduced_den=1)
+    E = mm.energy.Energy(G, cutoff=3.0, potential='wca')
+    assert np.isclose(E.cutoff, 2.0**(1.0 / 6.0))
+    assert E.calculate_tail_correction() == 0.0
+    E = mm.energy.Energy(G, cutoff=2.5, potential='mie', potential_params={'n': 9, 'm': 6})
+    assert np.allclose(E.pair_energy(rij2), E.potential.energy(rij2))
+    assert not np.allclose(E.pair_energy(rij2), lj)
+    assert np.array_equal(E.lennard_jones_potential(rij2), E.pair_energy(rij2))
+
+
+@pytest.mark.parametrize("kind", ['linear', 'cubic'])
+def test_tabulated_potential(kind):
+    """
+    Check the tabulated potential reaches the requested error bound, including for a custom pair function.
+    """
+
+    potential = mm.potentials.get_potential('tabulated', 2.5, kind=kind, tolerance=1e-5)
+    assert potential.error_bound < 1e-5
+    rij2 = np.random.default_rng(3).uniform(0.5, 2.5**2, 1000)
+    assert np.allclose(potential.energy(rij2), potential.base.energy(rij2), rtol=0, atol=1e-5)
+    assert np.isclose(potential.tail_correction(100, 100), potential.base.tail_correction(100, 100))
+    rebuilt = mm.potentials.get_potential('tabulated', potential.cutoff, **potential.get_parameters())
+    assert rebuilt.n_points == potential.n_points
+    assert np.array_equal(rebuilt.energy(rij2), potential.energy(rij2))
+
+    def soft(rij2):
+        return np.exp(-rij2) * np.cos(rij2)
+
+    potential = mm.potentials.TabulatedPotential(2.5, base=soft, n_points=4000, kind=kind)
+    assert np.allclose(potential.energy(rij2), soft(rij2), rtol=0, atol=potential.error_bound * 1.5)
+    assert np.isclose(potential.energy(1.5), soft(1.5), rtol=0, atol=potential.error_bound * 1.5)
+    with pytest.raises(ValueError):
+        potential.get_parameters()
+
+    G = mm.geom.Geom(method='random', num_particles=200, reduced_den=0.8)
+    E = mm.energy.Energy(G, cutoff=2.5)
+    E_table = mm.energy.Energy(G, cutoff=2.5, potential='tabulated',
+                               potential_params={'kind': kind, 'tolerance': 1e-7})
+    assert np.isclose(E_table.calculate_total_pair_energy(), E.calculate_total_pair_energy())
+
+
+def test_mixed_precision_energy():
+    """
+    Validate the mixed-precision energies against the float64 path on the NIST sample configurations.
+    """
+
+    samples = glob.glob('mm_2019_sss_1/tests/lj_sample_configurations/*.txt')
+    samples.sort()
+
+    for sample in samples:
+        geom = mm.geom.Geom(method='file', file_name=sample)
+        geom_mixed = mm.geom.Geom(method='file', file_name=sample, precision='mixed')
+        assert geom_mixed.coordinates.dtype == np.float32
+
+        energy = mm.energy.Energy(geom, 3.0)
+        energy_mixed = mm.energy.Energy(geom_mixed, 3.0, neighbor_method='cell')
+        E_total = energy.calculate_total_pair_energy()
+        E_mixed = energy_mixed.calculate_total_pair_energy()
+        assert isinstance(E_mixed, float)
+        assert np.isclose(E_mixed, E_total, rtol=1e-5)
+
+        particle_energies = energy_mixed.initialize_particle_energies()
+        assert particle_energies.dtype == np.float64
+        assert np.isclose(energy_mixed.get_particle_energy(3, geom_mixed.coordinates),
+                          energy.get_particle_energy(3, geom.coordinates),
+                          rtol=1e-4)
+
+
+def test_virial_pressure(tmpdir):
+    """
+    Check the pair virials against numerical derivatives, the pressure tail corrections against numerical integrals,
+    and the incrementally updated pressure of a run against a fresh calculation and its energy trace.
+    """
+
+    rij2 = np.array([0.9, 1.5, 4.0])
+    step = 1e-6
+    for name, params in [('lj', {}), ('lj_shifted_force', {}), ('mie', {'n': 9, 'm': 6}), ('yukawa', {}),
+                         ('tabulated', {'kind': 'cubic', 'n_points': 20000})]:
+        potential = mm.potentials.get_potential(name, 2.5, **params)
+        du_dr2 = (potential.energy(rij2 + step) - potential.energy(rij2 - step)) / (2.0 * step)
+        assert np.allclose(potential.virial(rij2), -2.0 * rij2 * du_dr2, rtol=1e-4)
+        energy, virial = potential.energy_and_virial(rij2)
+        assert np.allclose(energy, potential.energy(rij2))
+        assert np.allclose(virial, potential.virial(rij2))
+
+    # -(2/3) pi rho^2 integral from rc to infinity of r^3 du/dr, with rho = N / V = 1
+    r_grid = np.linspace(2.5, 200.0, 400001)
+    for name, params in [('lj', {}), ('mie', {'n': 9, 'm': 6}), ('yukawa', {'kappa': 0.5})]:
+        potential = mm.potentials.get_potential(name, 2.5, **params)
+        expected = 2.0 / 3.0 * np.pi * trapezoid(r_grid**2 * potential.virial(r_grid**2), r_grid)
+        assert np.isclose(potential.pressure_tail_correction(10, 10), expected, rtol=1e-4)
+
+    sim = mm.MC(method='random',
+                num_particles=100,
+                reduced_den=0.9,
+                reduced_temp=0.9,
+                max_displacement=0.1,
+                cutoff=3.0,
+                neighbor_method='cell',
+                seed=10)
+    sim.run(n_steps=500, freq=100, save_dir=str(tmpdir.join('results')))
+    pressure = sim.get_pressure()
+    assert len(pressure) == len(sim.get_energy())
+    # at constant volume the pressure only changes with the virial, which every accepted move changes
+    assert np.array_equal(np.diff(pressure) != 0.0, np.diff(sim.get_energy()) != 0.0)
+    E = assert_consistent_energy(sim, 3.0)
+    G = E.Geom
+    expected = (G.num_particles / G.volume * 0.9 + E.calculate_total_virial() / (3.0 * G.volume) +
+                E.calculate_pressure_tail_correction())
+    assert np.isclose(pressure[-1], expected)
+
+
+def test_seeded_random_stream(tmpdir):
+    """
+    Check seeded streams and runs are reproducible, other seeds give other runs, and spawned streams are
+    independent.
+    """
+
+    stream = mm.rng.RandomStream(seed=42, block_size=16)
+    indices = [stream.particle_index(10) for _ in range(100)]
+    assert min(indices) >= 0 and max(indices) < 10
+    displacements = np.array([stream.displacement() for _ in range(100)])
+    assert np.all(np.abs(displacements) <= 1.0)
+    # the blocks are refilled from the same generator, so a stream continues exactly across block boundaries
+    replay = mm.rng.RandomStream(seed=42, block_size=16)
+    assert [replay.particle_index(10) for _ in range(100)] == indices
+    assert np.array_equal([replay.displacement() for _ in range(100)], displacements)
+    children = stream.spawn(2)
+    assert children[0].uniform() != children[1].uniform()
+
+    energies = []
+    for seed in [7, 7, 8]:
+        sim = mm.MC(method='random',
+                    num_particles=50,
+                    reduced_den=0.9,
+                    reduced_temp=0.9,
+                    max_displacement=0.1,
+                    cutoff=3.0,
+                    seed=seed)
+        sim.run(n_steps=300, freq=100, save_dir=str(tmpdir.join('results')))
+        energies.append(sim.get_energy())
+    assert np.array_equal(energies[0], energies[1])
+    assert not np.array_equal(energies[0], energies[2])
+
+
+@pytest.mark.parametrize("neighbor_method", ['all', 'cell'])
+def test_early_rejection(tmpdir, neighbor_method):
+    """
+    Check the bounded energy evaluation only stops early for moves that would be rejected, and otherwise returns
+    the exact energy change.
+    """
+
+    G = mm.geom.Geom(method='random', num_particles=300, reduced_den=0.9, rng=np.random.default_rng(12))
+    E = mm.energy.Energy(G, cutoff=2.5, neighbor_method=neighbor_method)
+    E.initialize_particle_energies()
+
+    n_early = 0
+    for i_particle in range(100):
+        new_coordinate = G.wrap(G.coordinates[i_particle] + np.array([0.3, -0.2, 0.25]))
+        for max_delta_e in [0.0, 1.0, 50.0]:
+            bounded = E.get_delta_energy(i_particle, G.coordinates[i_particle], new_coordinate,
+                                         max_delta_e=max_delta_e)
+            exact = E.get_delta_energy(i_particle, G.coordinates[i_particle], new_coordinate)
+            if np.isinf(bounded):
+                assert exact >= max_delta_e
+                n_early += 1
+            else:
+                assert np.isclose(bounded, exact)
+    assert n_early > 0
+
+    # a move onto another particle is rejected from the pairs nearest to it, before every candidate is visited
+    backends = ['numpy', 'numba'] if mm.kernels.numba_available else ['numpy']
+    for backend in backends:
+        E = mm.energy.Energy(G, cutoff=2.5, neighbor_method=neighbor_method, backend=backend)
+        E.initialize_particle_energies()
+        new_coordinate = G.wrap(G.coordinates[1] + 0.05)
+        assert np.isinf(E.get_delta_energy(0, G.coordinates[0], new_coordinate, max_delta_e=1.0))
+        n_candidates = G.num_particles - 1 if neighbor_method == 'all' else len(E._get_partners(0, new_coordinate))
+        if neighbor_method == 'cell' or backend == 'numba':
+            assert E.n_pairs_visited < n_candidates
+        else:
+            assert E.n_pairs_visited == n_candidates
+
+    sim = mm.MC(method='random',
+                num_particles=100,
+                reduced_den=0.9,
+                reduced_temp=0.9,
+                max_displacement=0.1,
+                cutoff=3.0,
+                neighbor_method=neighbor_method,
+                early_rejection=True,
+                tune_displacement=False,
+                seed=3)
+    sim.run(n_steps=500, freq=100, save_dir=str(tmpdir.join('results')))
+    E = mm.energy.Energy(sim.get_snapshot(), cutoff=3.0)
+    assert np.allclose(sim.get_particle_energies(), E.initialize_particle_energies())
+    # the energy trace only moves on accepted moves, whether or not their evaluation stopped early; the first
+    # step of a run is left out, since a run starts from a fresh total energy
+    n_accept = sim._n_accept
+    sim.run(n_steps=200, freq=100, save_dir=str(tmpdir.join('results')))
+    assert sim._n_trials == 700
+    assert 0 < sim._n_accept - n_accept < 200
+    n_changes = np.count_nonzero(np.diff(sim.get_energy()[-200:]))
+    assert sim._n_accept - n_accept - 1 <= n_changes <= sim._n_accept - n_accept
+
+
+def test_ensemble():
+    """
+    Check the replicas of an ensemble run independently, with their own acceptance counts, and keep their energy
+    traces consistent.
+    """
+
+    ensemble = mm.MCEnsemble(n_replicas=4,
+                             reduced_temp=0.9,
+                             max_displacement=0.1,
+                             cutoff=3.0,
+                             num_particles=100,
+                             reduced_den=0.9,
+                             block_memory=100000,
+                             seed=11)
+    ensemble.run(n_steps=500, freq=100)
+    n_accept = ensemble._n_accept_total.copy()
+    ensemble.run(n_steps=100, freq=100)
+    energy = ensemble.get_energy()
+    assert energy.shape == (4, 601)
+    assert not np.allclose(energy[0], energy[1])
+    assert np.all(ensemble.get_acceptance_rate() > 0.0)
+    # every replica keeps its own acceptance count, and its trace only moves on its accepted moves
+    assert np.array_equal(np.count_nonzero(np.diff(energy[:, :501], axis=1), axis=1), n_accept)
+
+    tail_correction = ensemble.potential.tail_correction(100, ensemble.volume)
+    expected = (ensemble._calculate_total_pair_energies() + tail_correction) / 100
+    assert np.allclose(energy[:, -1], expected)
+    G = mm.geom.Geom(method='random', num_particles=100, reduced_den=0.9)
+    G.coordinates = ensemble.coordinates[2]
+    E = mm.energy.Energy(G, cutoff=3.0)
+    assert np.isclose(E.calculate_total_pair_energy(), expected[2] * 100 - tail_correction)
+
+    # blocks smaller than a replica still give the energies of every replica, and of every particle in it
+    E_small = mm.energy.Energy(None, cutoff=3.0, block_memory=1000)
+    total, particle_energies = E_small._calculate_pair_energy_blocks(per_particle=True,
+                                                                     coordinates=ensemble.coordinates,
+                                                                     box_length=ensemble.box_length)
+    assert np.allclose(total, expected * 100 - tail_correction)
+    positions = ensemble.coordinates[:, [3]]
+    energies = E_small.calculate_position_energies(positions, coordinates=ensemble.coordinates,
+                                                   box_length=ensemble.box_length, exclude=np.full(4, 3))
+    assert np.allclose(energies[:, 0], particle_energies[:, 3])
+
+
+def test_replica_exchange(tmpdir):
+    """
+    Check replica exchange keeps every temperature occupied by exactly one replica, records the energies, follows
+    the Metropolis rule for swaps, and reports the failure of a replica instead of waiting for it.
+    """
+
+    with mm.ReplicaExchange([0.9, 1.2, 1.6],
+                            seed=5,
+                            save_dir=str(tmpdir.join('results')),
+                            method='random',
+                            num_particles=50,
+                            reduced_den=0.8,
+                            max_displacement=0.1,
+                            cutoff=2.5) as exchange:
+        exchange.run(n_exchanges=4, steps_per_exchange=100)
+        assert exchange.get_energy().shape == (3, 4)
+        assert sorted(exchange.replica_of) == [0, 1, 2]
+        assert np.all(exchange.get_acceptance_rates() <= 1.0)
+        assert len(exchange.get_replica_energy(0)) == 401
+
+        # a swap is always accepted when the colder temperature gets the lower energy, and a swap raising the
+        # energy of the colder temperature by many kT is never accepted
+        n_swaps = exchange._n_swaps.copy()
+        cold, warm = exchange.replica_of[:2]
+        exchange._attempt_swaps(np.where(np.arange(3) == cold, 100.0, 0.0), 0)
+        assert list(exchange.replica_of[:2]) == [warm, cold]
+        exchange._attempt_swaps(np.where(np.arange(3) == cold, 1e4, 0.0), 0)
+        assert list(exchange.replica_of[:2]) == [warm, cold]
+        assert np.array_equal(exchange._n_swaps - n_swaps, [1, 0])
+        exchange.run(n_exchanges=1, steps_per_exchange=10)
+
+    exchange = mm.ReplicaExchange([0.9, 1.2], save_dir=str(tmpdir.join('failed')), method='unknown', cutoff=2.5,
+                                  max_displacement=0.1)
+    workers = exchange._workers
+    with pytest.raises(RuntimeError, match="Method must be either"):
+        exchange.run(n_exchanges=1, steps_per_exchange=10)
+    assert not any(worker.is_alive() for worker in workers)
+    exchange.close()
+
+
+@pytest.mark.parametrize("executor", ['thread', 'process'])
+def test_checkerboard_mc(executor):
+    """
+    Check the energy accumulated by the parallel domain sweeps matches a fresh calculation, and the same seed
+    gives the same sweeps whatever the executor.
+    """
+
+    with mm.CheckerboardMC(method='random',
+                           reduced_temp=0.9,
+                           max_displacement=0.1,
+                           cutoff=2.5,
+                           num_particles=800,
+                           reduced_den=0.5,
+                           n_workers=2,
+                           executor=executor,
+                           seed=2) as sim:
+        assert sim.n_domains_side == 4
+        sim.run(n_sweeps=2, freq=1)
+        G = sim.get_snapshot()
+        E = mm.energy.Energy(G, cutoff=2.5)
+        expected = (E.calculate_total_pair_energy() + E.calculate_tail_correction()) / G.num_particles
+        assert np.isclose(sim.get_energy()[-1], expected)
+    assert np.all(np.abs(G.coordinates) <= 0.5 * G.box_length)
+
+    with mm.CheckerboardMC(method='random',
+                           reduced_temp=0.9,
+                           max_displacement=0.1,
+                           cutoff=2.5,
+                           num_particles=800,
+                           reduced_den=0.5,
+                           n_workers=1,
+                           executor='thread',
+                           seed=2) as serial:
+        serial.run(n_sweeps=2, freq=1)
+        assert np.allclose(serial.get_energy(), sim.get_energy())
+        assert np.allclose(serial.get_snapshot().coordinates, G.coordinates)
+
+
+def test_sweep_schedule(tmpdir):
+    """
+    Check a sweep run attempts one move per particle in every sweep, records one trace value per sweep and keeps
+    the energy consistent.
+    """
+
+    sim = mm.MC(method='random',
+                num_particles=100,
+                reduced_den=0.9,
+                reduced_temp=0.9,
+                max_displacement=0.1,
+                cutoff=3.0,
+                schedule='sweep',
+                tune_displacement=False,
+                seed=4)
+    sim.run(n_steps=5, freq=2, save_dir=str(tmpdir.join('results')))
+    assert len(sim.get_energy()) == 6
+    # every sweep attempts one move per particle
+    assert sim._n_trials == 500
+    assert 0 < sim._n_accept < sim._n_trials
+    assert_consistent_energy(sim, 3.0)
+
+
+@pytest.mark.parametrize("neighbor_method", ['all', 'cell'])
+def test_collective_moves(tmpdir, neighbor_method):
+    """
+    Check the collective energy change against a full recalculation, and a run mixing collective moves.
+    """
+
+    G = mm.geom.Geom(method='random', num_particles=200, reduced_den=0.5, rng=np.random.default_rng(8))
+    E = mm.energy.Energy(G, cutoff=2.5, neighbor_method=neighbor_method)
+    E.initialize_particle_energies()
+    indices = np.array([3, 17, 18, 150])
+    old_coordinates = G.coordinates[indices]
+    new_coordinates = G.wrap(old_coordinates + np.array([[0.2, 0.1, -0.3], [0.1, 0.0, 0.2], [-0.2, 0.3, 0.1],
+                                                         [0.05, -0.1, 0.2]]))
+    e_old = E.calculate_total_pair_energy()
+    w_old = E.calculate_total_virial()
+    delta_e, delta_w = E.get_delta_energy_collective(indices, old_coordinates, new_coordinates, virial=True)
+    E.update_particles(indices, new_coordinates)
+    assert np.isclose(delta_e, E.calculate_total_pair_energy() - e_old)
+    assert np.isclose(delta_w, E.calculate_total_virial() - w_old)
+    assert np.isclose(E.get_total_pair_energy(), E.calculate_total_pair_energy())
+
+    sim = mm.MC(method='random',
+                num_particles=100,
+                reduced_den=0.9,
+                reduced_temp=0.9,
+                max_displacement=0.1,
+                cutoff=3.0,
+                neighbor_method=neighbor_method,
+                move_mix={'single': 0.6, 'cluster': 0.2, 'subset': 0.2},
+                seed=9)
+    sim.run(n_steps=300, freq=100, save_dir=str(tmpdir.join('results')))
+    # 40 percent of the 300 moves are collective, and some but not all of them are accepted
+    assert 90 < sim._n_collective_trials < 150
+    assert 0 < sim._n_collective_accept < sim._n_collective_trials
+    assert_consistent_energy(sim, 3.0)
+
+
+@pytest.mark.parametrize("potential", ['lj', 'lj_shifted'])
+def test_volume_moves(tmpdir, potential):
+    """
+    Check the energy change of scaling the box against a full recalculation, and an isothermal-isobaric run.
+    """
+
+    G = mm.geom.Geom(method='random', num_particles=200, reduced_den=0.5, rng=np.random.default_rng(2))
+    E = mm.energy.Energy(G, cutoff=2.5, neighbor_method='cell', potential=potential)
+    E.initialize_particle_energies()
+    for scale in [1.004, 0.995]:
+        e_old = E.get_total_pair_energy()
+        w_old = E.get_total_virial()
+        box_length = G.box_length * scale
+        delta_e, delta_w = E.get_volume_delta_energy(box_length, e_old, w_old)
+        E.scale_volume(box_length)
+        assert np.isclose(G.box_length, box_length)
+        assert np.isclose(delta_e, E.calculate_total_pair_energy() - e_old)
+        assert np.isclose(delta_w, E.calculate_total_virial() - w_old)
+        particle_energies = E.particle_energies.copy()
+        assert np.allclose(particle_energies, E.initialize_particle_energies())
+
+    sim = mm.MC(method='random',
+                num_particles=100,
+                reduced_den=0.7,
+                reduced_temp=1.2,
+                max_displacement=0.2,
+                cutoff=2.5,
+                potential=potential,
+                max_volume_change=0.05,
+                seed=3)
+    # relax the overlaps of the random start at constant volume first
+    save_dir = str(tmpdir.join('results'))
+    sim.run(n_steps=1000, freq=500, save_dir=save_dir)
+    sim.reduced_pressure = 1.0
+    sim.run(n_steps=1000, freq=500, save_dir=save_dir)
+    volume = sim.get_volume()
+    assert len(np.unique(volume)) > 1
+    assert np.isclose(sim.get_snapshot().volume, volume[-1])
+    # about one volume move per N steps, and the volume only changes on the accepted ones
+    assert 0 < sim._n_volume_accept < sim._n_volume_trials < 30
+    assert np.count_nonzero(np.diff(volume)) == sim._n_volume_accept
+    assert_consistent_energy(sim, 2.5, potential=potential)
+
+
+@pytest.mark.parametrize("neighbor_method", ['all', 'cell'])
+def test_grand_canonical(tmpdir, neighbor_method):
+    """
+    Check insertions and deletions against a full recalculation, and a grand canonical run.
+    """
+
+    G = mm.geom.Geom(method='random', num_particles=100, reduced_den=0.3, rng=np.random.default_rng(6))
+    E = mm.energy.Energy(G, cutoff=2.5, neighbor_method=neighbor_method)
+    E.initialize_particle_energies()
+    e_old = E.calculate_total_pair_energy()
+    delta_e, _ = E.get_insertion_energy(np.array([0.1, -0.2, 0.3]))
+    assert E.insert_particle(np.array([0.1, -0.2, 0.3])) == 100
+    assert np.isclose(delta_e, E.calculate_total_pair_energy() - e_old)
+    e_old = E.calculate_total_pair_energy()
+    delta_e, _ = E.get_deletion_energy(7)
+    E.remove_particle(7)
+    assert G.num_particles == len(G.coordinates) == 100
+    assert np.allclose(G.coordinates[7], [0.1, -0.2, 0.3])
+    assert np.isclose(delta_e, E.calculate_total_pair_energy() - e_old)
+    assert np.allclose(E.particle_energies, E._calculate_pair_energy_blocks(per_particle=True)[1])
+
+    sim = mm.MC(method='random',
+                num_particles=60,
+                reduced_den=0.3,
+                reduced_temp=1.5,
+                max_displacement=0.3,
+                cutoff=2.5,
+                neighbor_method=neighbor_method,
+                chemical_potential=-2.0,
+                exchange_probability=0.2,
+                seed=5)
+    sim.run(n_steps=2000, freq=1000, save_dir=str(tmpdir.join('results')))
+    num_particles = sim.get_num_particles()
+    assert len(np.unique(num_particles)) > 1
+    # a fifth of the steps are exchanges, each accepted one adding or removing a single particle
+    assert 300 < sim._n_exchange_trials < 500
+    assert np.all(np.abs(np.diff(num_particles)) <= 1)
+    assert np.count_nonzero(np.diff(num_particles)) == sim._n_exchange_accept
+    G = sim.get_snapshot()
+    assert G.num_particles == len(G.coordinates) == num_particles[-1]
+    assert_consistent_energy(sim, 2.5)
+
+    with pytest.raises(ValueError):
+        mm.MC(method='random', num_particles=10, reduced_den=0.3, reduced_temp=1.5, max_displacement=0.3,
+              cutoff=2.5, neighbor_method='verlet', chemical_potential=-2.0)
+
+
+@pytest.mark.parametrize("neighbor_method", ['all', 'cell'])
+def test_widom_insertion(tmpdir, neighbor_method):
+    """
+    Check the batched insertion energies against single insertions, and the Widom estimate of a run.
+    """
+
+    G = mm.geom.Geom(method='random', num_particles=300, reduced_den=0.6, rng=np.random.default_rng(1))
+    E = mm.energy.Energy(G, cutoff=2.5, neighbor_method=neighbor_method, block_memory=2**14)
+    positions = (np.random.default_rng(2).random((200, 3)) - 0.5) * G.box_length
+    energies = E.get_insertion_energies(positions)
+    expected = [E.get_insertion_energy(position)[0] for position in positions]
+    assert np.allclose(energies, expected)
+
+    sim = mm.MC(method='random',
+                num_particles=100,
+                reduced_den=0.1,
+                reduced_temp=2.0,
+                max_displacement=0.3,
+                cutoff=2.5,
+                neighbor_method=neighbor_method,
+                widom_interval=100,
+                widom_insertions=500,
+                seed=1)
+    with pytest.raises(ValueError):
+        sim.get_chemical_potential()
+    sim.run(n_steps=1000, freq=500, save_dir=str(tmpdir.join('results')))
+    assert len(sim._widom_array) == 10
+    # the excess chemical potential of a dilute gas is close to 2 rho B2 kT, about -0.4 with B2 = -1.0 at T = 2
+    assert -1.0 < sim.get_chemical_potential() < 0.0
+
+
+def test_binary_trajectory(tmpdir):
+    """
+    Check binary trajectory frames round trip, and a run saving its snapshots to a trajectory.
+    """
+
+    file_name = str(tmpdir.join('test.bin'))
+    frames = np.random.default_rng(0).random((3, 10, 3))
+    with mm.TrajectoryWriter(file_name, 10, 5.0, precision='single') as writer:
+        for i_frame, frame in enumerate(frames):
+            writer.write(frame, box_length=5.0 + i_frame)
+    with mm.TrajectoryWriter(file_name, 10, 5.0, precision='single', append=True) as writer:
+        writer.write(frames[0])
+        with pytest.raises(ValueError):
+            writer.write(frames[0, :5])
+    reader = mm.TrajectoryReader(file_name)
+    assert len(reader) == 4
+    assert reader.coordinates.shape == (4, 10, 3)
+    assert reader.coordinates.dtype == np.float32
+    assert np.allclose(reader[:3], frames.astype(np.float32))
+    assert np.array_equal(reader.box_lengths, [5.0, 6.0, 7.0, 5.0])
+
+    with open(file_name, 'ab') as stray:
+        stray.write(b'\x00' * 7)
+    assert len(mm.TrajectoryReader(file_name)) == 4
+    with mm.TrajectoryWriter(file_name, 10, 5.0, precision='single', append=True) as writer:
+        writer.write(frames[1], box_length=8.0)
+    reader = mm.TrajectoryReader(file_name)
+    assert len(reader) == 5
+    assert np.allclose(reader[-1], frames[1].astype(np.float32))
+    assert np.array_equal(reader.box_lengths, [5.0, 6.0, 7.0, 5.0, 8.0])
+
+    sim = mm.MC(method='random',
+                num_particles=50,
+                reduced_den=0.5,
+                reduced_temp=1.0,
+                max_displacement=0.1,
+                cutoff=2.5,
+                seed=2)
+    save_dir = str(tmpdir.join('results'))
+    sim.run(n_steps=100, freq=20, save_dir=save_dir, save_snaps=True, snapshot_format='binary')
+    reader = mm.TrajectoryReader(save_dir + '/trajectory.bin')
+    assert len(reader) == 5
+    assert np.array_equal(reader[-1], sim.get_snapshot().coordinates)
+
+
+def test_async_output(tmpdir, monkeypatch):
+    """
+    Check the background writer keeps the order of the outputs, drops them when asked, and reports errors, and a run
+    writing its output in the background, which closes its files when it fails and chains its own error to the
+    error of its output.
+    """
+
+    import threading
+    from mm_2019_sss_1.output import AsyncWriter
+
+    written = []
+    with AsyncWriter(max_queue=4) as writer:
+        for i in range(20):
+            writer.submit(written.append, i)
+    assert written == list(range(20))
+
+    release = threading.Event()
+    writer = AsyncWriter(max_queue=2, backpressure='drop')
+    writer.submit(release.wait)
+    queued = [writer.submit(written.append, i) for i in range(10)]
+    release.set()
+    writer.close()
+    assert writer.n_dropped == queued.count(False) > 0
+
+    writer = AsyncWriter()
+    writer.submit(int, 'not a number')
+    with pytest.raises(ValueError):
+        writer.close()
+
+    sim = mm.MC(method='random',
+                num_particles=50,
+                reduced_den=0.5,
+                reduced_temp=1.0,
+                max_displacement=0.1,
+                cutoff=2.5,
+                seed=2)
+    save_dir = str(tmpdir.join('results'))
+    sim.run(n_steps=100, freq=20, save_dir=save_dir, save_snaps=True, snapshot_format='binary', async_output=True)
+    reader = mm.TrajectoryReader(save_dir + '/trajectory.bin')
+    assert len(reader) == 5
+    assert np.array_equal(reader[-1], sim.get_snapshot().coordinates)
+    with open(save_dir + '/results.log') as log:
+        assert len([line for line in log if line.startswith('100 ')]) == 1
+
+    def failing_write(self, *args):
+        raise OSError("disk full")
+
+    def failing_step(self):
+        raise RuntimeError("failed step")
+
+    closed = []
+    original_close = mm.TrajectoryWriter.close
+
+    def recording_close(self):
+        closed.append(True)
+        original_close(self)
+
+    monkeypatch.setattr(mm.TrajectoryWriter, 'write', failing_write)
+    monkeypatch.setattr(mm.TrajectoryWriter, 'close', recording_close)
+    with pytest.raises(OSError, match="disk full"):
+        sim.run(n_steps=5, freq=1, save_dir=save_dir, save_snaps=True, snapshot_format='binary', async_output=True)
+    assert closed == [True]
+    monkeypatch.setattr(mm.MC, '_adjust_displacement', failing_step)
+    with pytest.raises(OSError, match="disk full") as error:
+        sim.run(n_steps=5, freq=1, save_dir=save_dir, save_snaps=True, snapshot_format='binary', async_output=True)
+    assert isinstance(error.value.__context__, RuntimeError)
+    assert str(error.value.__context__) == "failed step"
+    assert closed == [True, True]
+
+
+@pytest.mark.parametrize("neighbor_method", ['all', 'cell', 'verlet'])
+def test_checkpoint_restart(tmpdir, neighbor_method):
+    """
+    Check a simulation restored from a checkpoint continues exactly like an uninterrupted one.
+    """
+
+    save_dir = str(tmpdir.join('results'))
+    settings = dict(method='random',
+                    num_particles=100,
+                    reduced_den=0.7,
+                    reduced_temp=1.0,
+                    max_displacement=0.1,
+                    cutoff=2.5,
+                    neighbor_method=neighbor_method,
+                    seed=7)
+    uninterrupted = mm.MC(**settings)
+    uninterrupted.run(n_steps=300, freq=100, save_dir=save_dir)
+    uninterrupted.run(n_steps=300, freq=100, save_dir=save_dir)
+
+    sim = mm.MC(**settings)
+    sim.run(n_steps=300, freq=100, save_dir=save_dir)
+    path = str(tmpdir.join('checkpoint.npz'))
+    sim.checkpoint(path)
+    restarted = mm.MC.from_checkpoint(path)
+    assert restarted.current_step == 300
+    if neighbor_method == 'cell':
+        saved, restored = sim.get_snapshot().cell_list, restarted.get_snapshot().cell_list
+        capacity = saved.counts.max()
+        assert np.array_equal(restored.cells[:, :capacity], saved.cells[:, :capacity])
+    restarted.run(n_steps=300, freq=100, save_dir=save_dir)
+
+    assert np.array_equal(restarted.get_energy(), uninterrupted.get_energy())
+    assert np.array_equal(restarted.get_pressure(), uninterrupted.get_pressure())
+    assert np.array_equal(restarted.get_snapshot().coordinates, uninterrupted.get_snapshot().coordinates)
+    assert restarted.max_displacement == uninterrupted.max_displacement
+
+    # potentials are stored by name and parameters, never pickled
+    sim = mm.MC(potential='tabulated', potential_params={'base': 'mie', 'base_params': {'n': 9}, 'kind': 'cubic'},
+                **settings)
+    sim.checkpoint(path)
+    with np.load(path, allow_pickle=False) as data:
+        assert all(data[key].dtype != object for key in data.files)
+    restarted = mm.MC.from_checkpoint(path)
+    assert restarted._Energy.potential.get_parameters() == sim._Energy.potential.get_parameters()
+    assert restarted._Energy.calculate_total_pair_energy() == sim._Energy.calculate_total_pair_energy()
+
+
+def test_configuration_loader(tmpdir):
+    """
+    Check the streaming loader reads text configurations in small chunks, the files written by save_state, binary
+    trajectories and checkpoints to the same coordinates.
+    """
+
+    sample = 'mm_2019_sss_1/tests/lj_sample_configurations/lj_sample_config_periodic1.txt'
+    reference = np.loadtxt(sample, skiprows=2, usecols=(1, 2, 3))
+    coordinates, box_length = mm.formats.read_configuration(sample, chunk_size=7)
+    assert box_length == 10.0
+    assert np.array_equal(coordinates, reference)
+    geom = mm.geom.Geom(method='file', file_name=sample)
+    assert type(geom.num_particles) is int and geom.num_particles == 800
+    assert geom.box_length == 10.0
+
+    saved = str(tmpdir.join('saved.txt'))
+    geom.save_state(saved)
+    assert np.array_equal(mm.geom.Geom(method='file', file_name=saved).coordinates, reference)
+
+    truncated = str(tmpdir.join('truncated.txt'))
+    with open(sample) as f, open(truncated, 'w') as g:
+        g.writelines(f.readlines()[:-1])
+    with pytest.raises(ValueError):
+        mm.geom.Geom(method='file', file_name=truncated)
+
+    trajectory = str(tmpdir.join('test.bin'))
+    with mm.TrajectoryWriter(trajectory, 800, 10.0) as writer:
+        writer.write(reference + 1.0)
+        writer.write(reference, box_length=9.0)
+    geom = mm.geom.Geom(method='file', file_name=trajectory)
+    assert geom.box_length == 9.0
+    assert np.array_equal(geom.coordinates, reference)
+    assert np.array_equal(mm.geom.Geom(method='file', file_name=trajectory, frame=0).coordinates, reference + 1.0)
+
+    sim = mm.MC(method='file', file_name=sample, reduced_temp=0.9, max_displacement=0.1, cutoff=3.0, seed=0)
+    sim.run(n_steps=100, freq=100, save_dir=str(tmpdir.join('results')))
+    checkpoint = str(tmpdir.join('state.npz'))
+    sim.checkpoint(checkpoint)
+    geom = mm.geom.Geom(method='file', file_name=checkpoint, precision='mixed')
+    assert geom.coordinates.dtype == np.float32
+    assert np.array_equal(geom.coordinates, sim.get_snapshot().coordinates.astype(np.float32))
+
+
+@pytest.mark.parametrize("snapshot_format, tolerance", [('xyz', 1e-9), ('pdb', 1e-3), ('dcd', 1e-5)])
+def test_trajectory_formats(tmpdir, snapshot_format, tolerance):
+    """
+    Check XYZ, PDB and DCD frames round trip through their streaming readers, and a run saving its snapshots in
+    these formats and restarting from the last frame.
+    """
+
+    writers = {'xyz': mm.XYZWriter, 'pdb': mm.PDBWriter, 'dcd': mm.DCDWriter}
+    readers = {'xyz': mm.XYZReader, 'pdb': mm.PDBReader, 'dcd': mm.DCDReader}
+    file_name = str(tmpdir.join('test.' + snapshot_format))
+    frames = 10.0 * np.random.default_rng(0).random((3, 20, 3)) - 5.0
+    with writers[snapshot_format](file_name, box_length=10.0) as writer:
+        writer.write(frames[0])
+        writer.write(frames[1], box_length=11.0)
+    with writers[snapshot_format](file_name, append=True) as writer:
+        writer.write(frames[2], box_length=12.0)
+
+    buffers = set()
+    box_lengths = []
+    for i_frame, (coordinates, box_length) in enumerate(readers[snapshot_format](file_name)):
+        assert np.allclose(coordinates, frames[i_frame], atol=tolerance)
+        buffers.add(coordinates.__array_interface__['data'][0])
+        box_lengths.append(box_length)
+    assert box_lengths == [10.0, 11.0, 12.0]
+    assert len(buffers) == 1
+    coordinates, box_length = mm.formats.read_configuration(file_name, frame=1)
+    assert box_length == 11.0 and np.allclose(coordinates, frames[1], atol=tolerance)
+
+    sim = mm.MC(method='random',
+                num_particles=50,
+                reduced_den=0.5,
+                reduced_temp=1.0,
+                max_displacement=0.1,
+                cutoff=2.5,
+                seed=2)
+    save_dir = str(tmpdir.join('results'))
+    sim.run(n_steps=100, freq=20, save_dir=save_dir, save_snaps=True, snapshot_format=snapshot_format)
+    trajectory = save_dir + '/trajectory.' + snapshot_format
+    assert sum(1 for frame in readers[snapshot_format](trajectory)) == 5
+    geom = mm.geom.Geom(method='file', file_name=trajectory)
+    assert geom.num_particles == 50
+    assert np.isclose(geom.box_length, sim.get_snapshot().box_length, atol=tolerance)
+    assert np.allclose(geom.coordinates, sim.get_snapshot().coordinates, atol=tolerance)
@@ -0,0 +1,207 @@
+import os
+import struct
+import numpy as np
+
+# magic string, format version, bytes per coordinate, number of particles and initial box length
+HEADER = struct.Struct('<8sIIqd')
+MAGIC = b'MMTRAJ\x00\x00'
+VERSION = 1
+
+
+def _frame_dtype(num_particles, itemsize):
+    """
+    Build the record type of a single frame, its box length followed by the coordinates of all the particles.
+
+    Parameters
+    ----------
+    num_particles : integer
+        Number of particles of every frame.
+    itemsize : integer
+        Bytes per coordinate, 4 for float32 or 8 for float64.
+
+    Returns
+    -------
+    frame_dtype : numpy dtype
+        Structured little-endian record type with fields 'box_length' and 'coordinates'.
+    """
+
+    return np.dtype([('box_length', '<f8'), ('coordinates', f'<f{itemsize}', (num_particles, 3))])
+
+
+class TrajectoryWriter:
+    """
+    A writer appending fixed-size binary frames to a single trajectory file.
+
+    The file starts with a header holding the number of particles, the initial box length and the precision of the
+    coordinates, followed by one record per frame: the box length of the frame as a float64 and the N x 3
+    coordinates in float32 or float64. Frames are written as raw bytes, with no text formatting.
+
+    Attributes
+    ----------
+        file_name : string
+            Name of the trajectory file.
+        num_particles : integer
+            Number of particles of every frame.
+        box_length : float
+            Box length written in the header.
+        dtype : numpy dtype
+            Data type of the stored coordinates.
+        n_frames : integer
+            Number of frames in the file.
+
+    Methods
+    -------
+        write :
+            Append a frame to the file.
+        close :
+            Close the file.
+    """
+    def __init__(self, file_name, num_particles, box_length, precision='double', append=False):
+        """
+        The constructor for TrajectoryWriter class.
+
+        Parameters
+        ----------
+            file_name : string
+                Name of the trajectory file.
+            num_particles : integer
+                Number of particles of every frame.
+            box_length : integer or float
+                Box length written in the header.
+            precision : string, either 'double' or 'single', default to 'double'
+                Precision of the stored coordinates, float64 for 'double' and float32 for 'single'.
+            append : Boolean, default to False
+                If True and the file exists, frames are appended to it after checking that its header matches and
+                dropping an incomplete last frame, otherwise the file is created, or overwritten if it exists.
+        """
+
+        if precision == 'double':
+            self.dtype = np.dtype('<f8')
+        elif precision == 'single':
+            self.dtype = np.dtype('<f4')
+        else:
+            raise ValueError("precision must be either 'double' or 'single'")
+        self.file_name = file_name
+        self.num_particles = int(num_particles)
+        self.box_length = float(box_length)
+        self._frame_dtype = _frame_dtype(self.num_particles, self.dtype.itemsize)
+
+        if append and os.path.exists(file_name):
+            reader = TrajectoryReader(file_name)
+            if reader.num_particles != self.num_particles or reader.dtype != self.dtype:
+                raise ValueError("The existing trajectory has a different number of particles or precision.")
+            self.box_length = reader.box_length
+            self.n_frames = reader.n_frames
+            self._file = open(file_name, 'r+b')
+            self._file.truncate(HEADER.size + self.n_frames * self._frame_dtype.itemsize)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self.n_frames = 0
+            self._file = open(file_name, 'wb')
+            self._file.write(HEADER.pack(MAGIC, VERSION, self.dtype.itemsize, self.num_particles, self.box_length))
+
+    def write(self, coordinates, box_length=None):
+        """
+        Append a frame to the file.
+
+        Parameters
+        ----------
+        coordinates : numpy array (N x 3)
+            Coordinates of the particles.
+        box_length : float, optional
+            Box length of the frame, default to the box length of the header.
+
+        Returns
+        -------
+        None
+        """
+
+        if len(coordinates) != self.num_particles:
+            raise ValueError(f"Frames must hold {self.num_particles} particles, got {len(coordinates)}.")
+        frame = np.empty((), dtype=self._frame_dtype)
+        frame['box_length'] = self.box_length if box_length is None else box_length
+        frame['coordinates'] = coordinates
+        self._file.write(frame.tobytes())
+        self.n_frames += 1
+
+    def close(self):
+        """
+        Close the file.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class TrajectoryReader:
+    """
+    A reader exposing a binary trajectory file as memory-mapped arrays, without copying the frames.
+
+    Attributes
+    ----------
+        file_name : string
+            Name of the trajectory file.
+        num_particles : integer
+            Number of particles of every frame.
+        box_length : float
+            Box length written in the header.
+        dtype : numpy dtype
+            Data type of the stored coordinates.
+        n_frames : integer
+            Number of complete frames in the file.
+        coordinates : numpy memmap (frames x N x 3)
+            Coordinates of every frame.
+        box_lengths : numpy memmap (frames)
+            Box length of every frame.
+    """
+    def __init__(self, file_name):
+        """
+        The constructor for TrajectoryReader class.
+
+        Parameters
+        ----------
+            file_name : string
+                Name of the trajectory file, written by TrajectoryWriter.
+        """
+
+        self.file_name = file_name
+        with open(file_name, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{file_name} is too short to be a trajectory file.")
+        magic, version, itemsize, num_particles, box_length = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION or itemsize not in (4, 8):
+            raise ValueError(f"{file_name} is not a trajectory file written by TrajectoryWriter.")
+        self.num_particles = num_particles
+        self.box_length = box_length
+        self.dtype = np.dtype(f'<f{itemsize}')
+
+        frame_dtype = _frame_dtype(num_particles, itemsize)
+        # an interrupted write may leave an incomplete last frame, which is ignored
+        self.n_frames = (os.path.getsize(file_name) - HEADER.size) // frame_dtype.itemsize
+        if self.n_frames > 0:
+            frames = np.memmap(file_name, dtype=frame_dtype, mode='r', offset=HEADER.size, shape=(self.n_frames,))
+            self.coordinates = frames['coordinates']
+            self.box_lengths = frames['box_length']
+        else:
+            self.coordinates = np.empty((0, num_particles, 3), dtype=self.dtype)
+            self.box_lengths = np.empty(0)
+
+    def __len__(self):
+        return self.n_frames
+
+    def __getitem__(self, index):
+        return self.coordinates[index]